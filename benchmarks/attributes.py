@@ -0,0 +1,107 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time to process a user attribute with a value of each of
+the common scalar types, and the time per span to generate span events
+for a transaction with 2,000 function segments each carrying two user
+attributes and an agent attribute, when the destinations of attributes
+are resolved once for the transaction and for every span.
+
+    python benchmarks/attributes.py
+
+"""
+
+from __future__ import print_function
+
+import time
+import timeit
+
+from newrelic.core.attribute import AttributeDestinationCache, process_user_attribute
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+
+NUMBER = 100000
+SEGMENTS = 2000
+REPEATS = 10
+
+VALUES = (
+    ("str", "/api/v1/orders/12345?include=customer"),
+    ("int", 12345),
+    ("float", 0.25),
+    ("bool", True),
+)
+
+
+def function_node(index):
+    return FunctionNode(
+        group="Function",
+        name="app.models:Order.customer",
+        children=(),
+        start_time=1.0 + index * 0.001,
+        end_time=1.0 + index * 0.001 + 0.0005,
+        duration=0.0005,
+        exclusive=0.0005,
+        label=None,
+        params=None,
+        rollup=None,
+        guid="%016x" % index,
+        agent_attributes={"db.instance": "orders"},
+        user_attributes={"order.id": index, "customer.tier": "gold"},
+    )
+
+
+def root_node():
+    return RootNode(
+        name="Function/app.views:orders",
+        children=[function_node(i) for i in range(SEGMENTS)],
+        start_time=1.0,
+        end_time=4.0,
+        exclusive=0.1,
+        duration=3.0,
+        guid="%016x" % SEGMENTS,
+        agent_attributes={},
+        user_attributes={},
+        path="WebTransaction/Function/app.views:orders",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+
+def span_events(settings, shared):
+    root = root_node()
+    start = time.time()
+    for _ in range(REPEATS):
+        attribute_filter = shared and AttributeDestinationCache(settings.attribute_filter) or None
+        for _ in root.span_events(settings, attribute_filter=attribute_filter):
+            pass
+    return (time.time() - start) / (REPEATS * (SEGMENTS + 1))
+
+
+def main():
+    print("%-10s %14s" % ("value", "process (us)"))
+    for name, value in VALUES:
+        elapsed = timeit.timeit(lambda: process_user_attribute("attribute", value), number=NUMBER)
+        print("%-10s %14.2f" % (name, elapsed / NUMBER * 1e6))
+    print()
+
+    settings = finalize_application_settings()
+
+    print("%-12s %14s" % ("resolved", "per span (us)"))
+    for name, shared in (("per span", False), ("transaction", True)):
+        print("%-12s %14.2f" % (name, span_events(settings, shared) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time to extract the code level metrics of different kinds
+of callable after the first extraction, as happens for each function trace
+given a source.
+
+    python benchmarks/code_level_metrics.py
+
+"""
+
+from __future__ import print_function
+
+import functools
+import sqlite3
+import time
+import timeit
+
+from newrelic.core.code_level_metrics import extract_code_from_callable
+
+NUMBER = 20000
+
+
+def function():
+    pass
+
+
+class Class(object):
+    def method(self):
+        pass
+
+
+class SlotsCallable(object):
+    __slots__ = ("__weakref__",)
+
+    def __call__(self):
+        pass
+
+
+INSTANCE = Class()
+SLOTS_CALLABLE = SlotsCallable()
+CONNECTION = sqlite3.Connection(":memory:")
+
+CALLABLES = (
+    ("function", lambda: function),
+    ("method", lambda: INSTANCE.method),
+    ("partial", lambda: functools.partial(function)),
+    ("builtin", lambda: time.sleep),
+    ("builtin method", lambda: CONNECTION.__enter__),
+    ("slots callable", lambda: SLOTS_CALLABLE),
+)
+
+
+def main():
+    print("%-16s %10s" % ("callable", "time (us)"))
+    for name, factory in CALLABLES:
+        extract_code_from_callable(factory())
+        overhead = timeit.timeit(factory, number=NUMBER)
+        elapsed = timeit.timeit(lambda: extract_code_from_callable(factory()), number=NUMBER)
+        print("%-16s %10.2f" % (name, (elapsed - overhead) / NUMBER * 1e6))
+
+
+if __name__ == "__main__":
+    main()
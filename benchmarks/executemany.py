@@ -0,0 +1,81 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken and the peak memory allocated by executemany()
+on an instrumented SQLite connection when inserting 500,000 rows yielded
+by a generator, as done by bulk loaders, within a background task. The
+agent is run in developer mode so no data is sent to the data collector.
+
+    python benchmarks/executemany.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import sqlite3
+import time
+import tracemalloc
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.background_task import BackgroundTask  # noqa: E402
+from newrelic.hooks.database_sqlite import (  # noqa: E402
+    ConnectionFactory,
+    instrument_sqlite3_dbapi2,
+)
+
+ROWS = 500000
+
+
+def rows():
+    for i in range(ROWS):
+        yield (i, "order-%d" % i, i * 0.5)
+
+
+def executemany(application, connect):
+    connection = connect(":memory:")
+    connection.execute("create table orders (id, name, total)")
+
+    with BackgroundTask(application, "executemany"):
+        connection.executemany("insert into orders values (?, ?, ?)", rows())
+
+    connection.close()
+
+
+def main():
+    newrelic.agent.initialize()
+    application = newrelic.agent.register_application(timeout=10.0)
+
+    instrument_sqlite3_dbapi2(sqlite3.dbapi2)
+    connect = ConnectionFactory(sqlite3.connect, sqlite3.dbapi2)
+
+    start = time.time()
+    executemany(application, connect)
+    elapsed = time.time() - start
+
+    tracemalloc.start()
+    executemany(application, connect)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("rows: %d" % ROWS)
+    print("%-16s %10.1f" % ("peak (MB)", peak / 1024.0 / 1024.0))
+    print("%-16s %10.1f" % ("time (ms)", elapsed * 1000.0))
+
+
+if __name__ == "__main__":
+    main()
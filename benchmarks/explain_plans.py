@@ -0,0 +1,145 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken to generate the slow SQL data for a harvest of
+10 slow SQL statements, against a database where each connection and each
+query takes 20 milliseconds, with the explain plans run serially at the
+time of the harvest and run in the background as each statement is first
+recorded. The statements are recorded 0.5 seconds before the harvest.
+
+    python benchmarks/explain_plans.py
+
+"""
+
+from __future__ import print_function
+
+import sqlite3
+import time
+
+import newrelic.core.stats_engine
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.database_node import SlowSqlNode
+from newrelic.core.database_utils import SQLConnections, explain_plan_executor
+from newrelic.core.stats_engine import StatsEngine
+
+LATENCY = 0.02
+STATEMENTS = 10
+HARVESTS = 3
+
+
+class Connection(object):
+    def __init__(self, *args, **kwargs):
+        time.sleep(LATENCY)
+        self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+
+    def cursor(self, *args, **kwargs):
+        return Cursor(self.connection.cursor())
+
+    def rollback(self):
+        self.connection.rollback()
+
+    def close(self):
+        self.connection.close()
+
+
+class Cursor(object):
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def execute(self, *args, **kwargs):
+        time.sleep(LATENCY)
+        return self.cursor.execute(*args, **kwargs)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+class DatabaseModule(object):
+    __name__ = "sqlite3"
+
+    _nr_database_product = "SQLite"
+    _nr_quoting_style = "single"
+    _nr_explain_query = "EXPLAIN QUERY PLAN"
+    _nr_explain_stmts = ("select",)
+
+    NotSupportedError = sqlite3.NotSupportedError
+
+    connect = Connection
+
+
+DATABASE_MODULE = DatabaseModule()
+
+
+def slow_sql_node(index):
+    return SlowSqlNode(
+        duration=1.0,
+        path="WebTransaction/Function/orders",
+        request_uri="/orders",
+        sql="SELECT name AS name_%d FROM sqlite_master WHERE type = 'table'" % index,
+        sql_format="obfuscated",
+        metric="Datastore/statement/SQLite/sqlite_master/select",
+        dbapi2_module=DATABASE_MODULE,
+        stack_trace=None,
+        connect_params=((), {}),
+        cursor_params=None,
+        sql_parameters=None,
+        execute_params=None,
+        host=None,
+        port_path_or_id=None,
+        database_name=None,
+        params={},
+    )
+
+
+def harvest(settings):
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+
+    for index in range(STATEMENTS):
+        workarea = stats.create_workarea()
+        workarea.record_slow_sql_node(slow_sql_node(index))
+        stats.merge(workarea)
+
+    time.sleep(0.5)
+
+    with SQLConnections(settings.agent_limits.max_sql_connections) as connections:
+        start = time.time()
+        slow_sql_data = stats.slow_sql_data(connections)
+        elapsed = time.time() - start
+
+    assert len(slow_sql_data) == STATEMENTS
+
+    return elapsed
+
+
+def main():
+    settings = finalize_application_settings()
+
+    executor = explain_plan_executor()
+
+    print("%-10s %8s %14s" % ("explain", "harvest", "duration (ms)"))
+    for name in ("serial", "executor"):
+        newrelic.core.stats_engine.explain_plan_executor = lambda: name == "executor" and executor or None
+        for index in range(HARVESTS):
+            print("%-10s %8d %14.1f" % (name, index + 1, harvest(settings) * 1000.0))
+
+    executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken by the garbage collector data source to count
+the types of the objects tracked by the garbage collector, in a process
+holding about 4 million objects. The time to fetch the objects from the
+garbage collector is reported separately from the time taken counting
+them, with the top five types counted exactly and from a sample of 10000
+objects.
+
+    python benchmarks/gc_census.py
+
+"""
+
+from __future__ import print_function
+
+import gc
+import time
+
+from newrelic.samplers.gc_data import object_type_counts
+
+ENTRIES = 1666666
+LIMIT = 5
+SAMPLE_SIZE = 10000
+
+
+class Order(object):
+    pass
+
+
+class Customer(object):
+    pass
+
+
+def main():
+    live = [(Order(), [], {}) if i % 3 else Customer() for i in range(ENTRIES)]
+
+    start = time.time()
+    objects = gc.get_objects()
+    fetched = time.time() - start
+
+    start = time.time()
+    exact = object_type_counts(objects, LIMIT)
+    exact_time = time.time() - start
+
+    start = time.time()
+    sampled = object_type_counts(objects, LIMIT, SAMPLE_SIZE)
+    sampled_time = time.time() - start
+
+    print("objects:              %d" % len(objects))
+    print("get_objects (ms):     %.1f" % (fetched * 1000.0))
+    print("exact count (ms):     %.1f" % (exact_time * 1000.0))
+    print("sampled count (ms):   %.1f" % (sampled_time * 1000.0))
+    print("max standard error:   %d" % (len(objects) / (2.0 * SAMPLE_SIZE**0.5)))
+    print()
+    print("%-20s %12s %12s" % ("type", "exact", "sampled"))
+    sampled = dict(sampled)
+    for obj_type, count in exact:
+        print("%-20s %12d %12d" % (obj_type.__name__, count, sampled.get(obj_type, 0)))
+
+    del live
+
+
+if __name__ == "__main__":
+    main()
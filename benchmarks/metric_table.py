@@ -0,0 +1,109 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compares the dictionary based stats table of the stats engine with the
+compact metric table for 1k, 10k and 100k unique scoped metrics. For each
+size this reports the memory held by the table, along with the time taken
+to record the metrics, merge one table into another and generate the
+metric data for a harvest.
+
+    python benchmarks/metric_table.py
+
+"""
+
+from __future__ import print_function
+
+import gc
+import time
+import tracemalloc
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.metric import TimeMetric
+from newrelic.core.stats_engine import StatsEngine
+
+SIZES = (1000, 10000, 100000)
+
+
+def create_stats_engine(compact):
+    settings = finalize_application_settings()
+    settings.compact_metric_table.enabled = compact
+
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+    return stats
+
+
+def create_metrics(size):
+    return [
+        TimeMetric(
+            name="Datastore/statement/Postgres/table_%d/select" % (i // 10),
+            scope="WebTransaction/Function/views:route_%d" % (i % 10),
+            duration=0.001 * (i % 100),
+            exclusive=0.0005 * (i % 100),
+        )
+        for i in range(size)
+    ]
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def run(size, compact):
+    metrics = create_metrics(size)
+
+    gc.collect()
+    tracemalloc.start()
+
+    stats = create_stats_engine(compact)
+    record_time, _ = timed(stats.record_time_metrics, metrics)
+
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    other = create_stats_engine(compact)
+    other.record_time_metrics(metrics)
+
+    merge_time, _ = timed(stats.merge_metric_stats, other)
+    metric_data_time, _ = timed(stats.metric_data)
+    normalize_time, _ = timed(stats.metric_data, lambda name: (name, False))
+
+    return memory, record_time, merge_time, metric_data_time, normalize_time
+
+
+def main():
+    header = ("metrics", "table", "memory (KiB)", "record (ms)", "merge (ms)", "metric_data (ms)", "normalized (ms)")
+    print("%8s %8s %14s %12s %12s %18s %16s" % header)
+
+    for size in SIZES:
+        for compact in (False, True):
+            memory, record_time, merge_time, metric_data_time, normalize_time = run(size, compact)
+            print(
+                "%8d %8s %14.1f %12.1f %12.1f %18.1f %16.1f"
+                % (
+                    size,
+                    compact and "compact" or "dict",
+                    memory / 1024.0,
+                    record_time * 1000,
+                    merge_time * 1000,
+                    metric_data_time * 1000,
+                    normalize_time * 1000,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken by StatsEngine.record_transaction() for a
+background task which makes 20 datastore calls and 20 external calls,
+when recorded into a new workarea for each transaction and when recorded
+into a long lived stats engine shard holding the metrics of the prior
+transactions. The best of 5 runs is reported. The agent is run in
+developer mode so no data is sent to the data collector.
+
+    python benchmarks/record_transaction.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import time
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.application import Application  # noqa: E402
+from newrelic.api.background_task import BackgroundTask  # noqa: E402
+from newrelic.api.datastore_trace import DatastoreTrace  # noqa: E402
+from newrelic.api.external_trace import ExternalTrace  # noqa: E402
+from newrelic.core.stats_engine import StatsEngine  # noqa: E402
+
+CALLS = 20
+TRANSACTIONS = 500
+REPEATS = 5
+
+
+def transaction_nodes(application):
+    # Capture the transaction nodes rather than letting the agent record
+    # them, so only record_transaction() itself is timed.
+
+    nodes = []
+
+    record_transaction = Application.record_transaction
+    Application.record_transaction = lambda self, node: nodes.append(node)
+
+    try:
+        for _ in range(TRANSACTIONS):
+            with BackgroundTask(application, "record"):
+                for i in range(CALLS):
+                    with DatastoreTrace("Redis", None, "get"):
+                        pass
+                    with ExternalTrace("library", "http://localhost/%d" % i):
+                        pass
+
+    finally:
+        Application.record_transaction = record_transaction
+
+    return nodes
+
+
+def main():
+    newrelic.agent.initialize()
+    application = newrelic.agent.register_application(timeout=10.0)
+
+    settings = application.settings
+    nodes = transaction_nodes(application)
+
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+
+    workarea = shard = float("inf")
+
+    for _ in range(REPEATS):
+        start = time.time()
+        for node in nodes:
+            stats.create_workarea().record_transaction(node)
+        workarea = min(workarea, (time.time() - start) / len(nodes))
+
+        start = time.time()
+        for node in nodes:
+            stats.record_transaction(node)
+        shard = min(shard, (time.time() - start) / len(nodes))
+
+    print("calls: %d datastore, %d external" % (CALLS, CALLS))
+    print("%-16s %10.1f" % ("workarea (us)", workarea * 1e6))
+    print("%-16s %10.1f" % ("shard (us)", shard * 1e6))
+
+
+if __name__ == "__main__":
+    main()
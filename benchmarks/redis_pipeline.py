@@ -0,0 +1,102 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken within a background task to queue up 500 SET
+commands on a Redis pipeline and execute it, against a local stand-in for
+the Redis server which replies OK to every command, along with the number
+of segments recorded for the transaction. The agent is run in developer
+mode so no data is sent to the data collector.
+
+    python benchmarks/redis_pipeline.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import socket
+import threading
+import time
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.background_task import BackgroundTask  # noqa: E402
+from newrelic.api.transaction import current_transaction  # noqa: E402
+
+COMMANDS = 500
+REPEATS = 20
+
+
+def handle(connection):
+    reader = connection.makefile("rb")
+    while True:
+        line = reader.readline()
+        if not line:
+            return
+        if line.startswith(b"*"):
+            for _ in range(int(line[1:]) * 2):
+                reader.readline()
+            connection.sendall(b"+OK\r\n")
+
+
+def serve(server):
+    while True:
+        connection, _ = server.accept()
+        thread = threading.Thread(target=handle, args=(connection,))
+        thread.daemon = True
+        thread.start()
+
+
+def start_server():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(5)
+    thread = threading.Thread(target=serve, args=(server,))
+    thread.daemon = True
+    thread.start()
+    return server.getsockname()[1]
+
+
+def execute_pipeline(application, client):
+    with BackgroundTask(application, "pipeline"):
+        pipeline = client.pipeline(transaction=False)
+        for i in range(COMMANDS):
+            pipeline.set("key:%d" % i, i)
+        pipeline.execute()
+        return current_transaction()._trace_node_count
+
+
+def main():
+    newrelic.agent.initialize()
+    application = newrelic.agent.register_application(timeout=10.0)
+
+    import redis
+
+    client = redis.Redis(port=start_server(), protocol=2)
+    segments = execute_pipeline(application, client)
+
+    start = time.time()
+    for _ in range(REPEATS):
+        execute_pipeline(application, client)
+    elapsed = (time.time() - start) / REPEATS
+
+    print("commands: %d" % COMMANDS)
+    print("%-16s %10.2f" % ("time (ms)", elapsed * 1000.0))
+    print("%-16s %10d" % ("segments", segments))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken and the peak memory allocated when a WSGI
+application yields HTML pages of increasing size, either as a single
+string or as a small string holding the head of the page followed by a
+single string for the body, and the browser monitoring snippet is
+automatically inserted into the page.
+The agent is run in developer mode so no data is sent to the data
+collector.
+
+    python benchmarks/rum_insertion.py
+
+"""
+
+from __future__ import print_function
+
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+os.environ.setdefault("NEW_RELIC_LICENSE_KEY", "0123456789012345678901234567890123456789")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.wsgi_application import WSGIApplicationWrapper  # noqa: E402
+
+SIZES = (64 * 1024, 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024)
+REPEATS = 5
+
+PAGES = {}
+
+
+def application(environ, start_response):
+    page = PAGES[environ["PATH_INFO"]]
+    start_response("200 OK", [("Content-Type", "text/html"), ("Content-Length", str(sum(map(len, page))))])
+    return page
+
+
+def request(wrapped, size):
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": str(size),
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "80",
+        "wsgi.url_scheme": "http",
+    }
+
+    def start_response(status, headers, exc_info=None):
+        return None
+
+    iterable = wrapped(environ, start_response)
+    length = sum(map(len, iterable))
+    iterable.close()
+
+    return length
+
+
+def main():
+    newrelic.agent.initialize()
+    application_instance = newrelic.agent.register_application(timeout=10.0)
+    application_instance.settings.browser_monitoring.enabled = True
+    application_instance.settings.js_agent_loader = u"<!-- NREUM HEADER -->"
+
+    wrapped = WSGIApplicationWrapper(application)
+
+    print("%-8s %12s %10s %12s" % ("layout", "size (MB)", "time (ms)", "peak (MB)"))
+
+    for layout in ("single", "split"):
+        for size in SIZES:
+            head = b"<html><head><title>Page</title></head>"
+            body = b"<body>" + (size - len(head) - 6) * b"X"
+            PAGES[str(size)] = layout == "single" and [head + body] or [head, body]
+
+            assert request(wrapped, size) > size
+
+            start = time.time()
+            for _ in range(REPEATS):
+                request(wrapped, size)
+            elapsed = (time.time() - start) / REPEATS
+
+            tracemalloc.start()
+            request(wrapped, size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                "%-8s %12.2f %10.2f %12.2f"
+                % (layout, size / 1024.0 / 1024.0, elapsed * 1000.0, peak / 1024.0 / 1024.0)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken to add samples to a SampledDataSet at span
+event reservoir sizes, and to merge full reservoirs into one another as
+is done when recording transactions and at harvest time.
+
+    python benchmarks/sampled_data_set.py
+
+"""
+
+from __future__ import print_function
+
+import random
+import time
+
+from newrelic.core.stats_engine import SampledDataSet
+
+CAPACITIES = (2000, 10000)
+SAMPLES = 200000
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def add_samples(data_set, priorities):
+    add = data_set.add
+    for priority in priorities:
+        add(None, priority)
+    data_set.num_samples
+
+
+def merge_sets(data_set, others):
+    for other in others:
+        data_set.merge(other)
+    data_set.num_samples
+
+
+def main():
+    random.seed(0)
+    priorities = [random.random() for _ in range(SAMPLES)]
+
+    print("%-10s %12s %12s %12s" % ("capacity", "add (ms)", "merge (ms)", "merge tx (ms)"))
+
+    for capacity in CAPACITIES:
+        add_time = timed(add_samples, SampledDataSet(capacity), priorities)
+
+        others = []
+        for i in range(10):
+            other = SampledDataSet(capacity)
+            add_samples(other, priorities[i * capacity : (i + 2) * capacity])
+            others.append(other)
+
+        merge_time = timed(merge_sets, SampledDataSet(capacity), others)
+
+        # Merging of the small per transaction data sets into the
+        # reservoir of the stats engine.
+        transactions = []
+        for i in range(SAMPLES // 20):
+            other = SampledDataSet(64)
+            add_samples(other, priorities[i * 20 : (i + 1) * 20])
+            transactions.append(other)
+
+        merge_tx_time = timed(merge_sets, SampledDataSet(capacity), transactions)
+
+        print(
+            "%-10d %12.1f %12.1f %12.1f" % (capacity, add_time * 1000.0, merge_time * 1000.0, merge_tx_time * 1000.0)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the wall time and peak memory of a transaction running an N+1
+ORM loop of 10,000 identical datastore queries, with and without a segment
+budget. The agent is run in developer mode so no data is sent to the data
+collector. The call count and total time recorded for the datastore metric
+are reported as a check that the aggregated segments still produce the
+exact metric totals.
+
+    python benchmarks/segment_budget.py
+
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.background_task import BackgroundTask  # noqa: E402
+from newrelic.api.datastore_trace import DatastoreTrace  # noqa: E402
+from newrelic.api.function_trace import FunctionTrace  # noqa: E402
+from newrelic.core.agent import agent_instance  # noqa: E402
+
+QUERIES = 10000
+REPEATS = 5
+METRIC = ("Datastore/statement/Postgres/customer/select", "OtherTransaction/Function/benchmark")
+
+
+def transaction(application):
+    with BackgroundTask(application, "benchmark"):
+        with FunctionTrace("app.views:orders"):
+            for _ in range(QUERIES):
+                with DatastoreTrace("Postgres", "customer", "select", host="localhost", port_path_or_id=5432):
+                    pass
+
+
+def measure(application, budget):
+    application.settings.agent_limits.segments_per_transaction = budget
+
+    gc.collect()
+    start = time.time()
+    for _ in range(REPEATS):
+        transaction(application)
+    duration = (time.time() - start) / REPEATS
+
+    gc.collect()
+    tracemalloc.start()
+    transaction(application)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats_engine = agent_instance().application(application.name)._stats_engine
+    stats = stats_engine.stats_table[METRIC]
+
+    return duration, peak, stats[0] // (REPEATS + 1), stats[1] / (REPEATS + 1)
+
+
+def main():
+    newrelic.agent.initialize()
+    application = newrelic.agent.register_application(timeout=10.0)
+
+    transaction(application)
+
+    print("queries: %d" % QUERIES)
+    print("%-8s %14s %18s %12s %14s" % ("budget", "wall time (ms)", "peak memory (KiB)", "call count", "total (ms)"))
+
+    for budget in (0, 2000):
+        agent_instance().application(application.name)._stats_engine.reset_stats(application.settings)
+        duration, peak, count, total = measure(application, budget)
+        print(
+            "%-8s %14.1f %18.1f %12d %14.1f"
+            % (budget or "none", duration * 1000.0, peak / 1024.0, count, total * 1000.0)
+        )
+
+
+if __name__ == "__main__":
+    main()
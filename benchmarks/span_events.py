@@ -0,0 +1,105 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken to generate span events for a transaction with
+2,000 function segments, both as siblings directly under the root as for
+N+1 ORM queries, and as a chain of nested segments 400 deep.
+
+    python benchmarks/span_events.py
+
+"""
+
+from __future__ import print_function
+
+import time
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+
+SEGMENTS = 2000
+DEPTH = 400
+REPEATS = 20
+
+
+def function_node(index, children=()):
+    return FunctionNode(
+        group="Function",
+        name="app.models:Order.customer_%d" % index,
+        children=children,
+        start_time=1.0 + index * 0.001,
+        end_time=1.0 + index * 0.001 + 0.0005,
+        duration=0.0005,
+        exclusive=0.0005,
+        label=None,
+        params=None,
+        rollup=None,
+        guid="%016x" % index,
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def root_node(children):
+    return RootNode(
+        name="Function/app.views:orders",
+        children=children,
+        start_time=1.0,
+        end_time=4.0,
+        exclusive=0.1,
+        duration=3.0,
+        guid="%016x" % SEGMENTS,
+        agent_attributes={},
+        user_attributes={},
+        path="WebTransaction/Function/app.views:orders",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+
+def siblings():
+    return root_node([function_node(i) for i in range(SEGMENTS)])
+
+
+def nested():
+    children = []
+    width = SEGMENTS // DEPTH
+    for depth in range(DEPTH):
+        leaves = [function_node(depth * width + i) for i in range(1, width)]
+        children = [function_node(depth * width, children + leaves)]
+    return root_node(children)
+
+
+def span_events(root, settings):
+    base_attrs = {"transactionId": "abcdef", "traceId": "0123456789abcdef", "sampled": True, "priority": 1.5}
+    for _ in range(REPEATS):
+        for _ in root.span_events(settings, base_attrs, parent_guid=None):
+            pass
+
+
+def main():
+    settings = finalize_application_settings()
+
+    print("%-10s %14s" % ("shape", "per span (us)"))
+
+    for shape, create in (("siblings", siblings), ("nested", nested)):
+        root = create()
+        start = time.time()
+        span_events(root, settings)
+        duration = time.time() - start
+        print("%-10s %14.2f" % (shape, duration / (REPEATS * (SEGMENTS + 1)) * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures streaming 20000 spans from 4 producer threads to a local gRPC
+server standing in for the trace observer, one span per message and in
+batches. Reports the time producers spend putting spans into the stream
+buffer and the time until the server has received every span. Also
+reports the cost of a put into a full stream buffer of 10000 spans with
+each drop policy, and the size of a batch of 100 spans on the wire with
+each compression method.
+
+    python benchmarks/span_streaming.py
+
+"""
+
+from __future__ import print_function
+
+import random
+import threading
+import time
+import zlib
+from concurrent import futures
+
+import grpc
+
+from newrelic.common.streaming_utils import StreamBuffer
+from newrelic.core.agent_streaming import StreamingRpc
+from newrelic.core.infinite_tracing_pb2 import (
+    AttributeValue,
+    RecordStatus,
+    Span,
+    SpanBatch,
+)
+
+PRODUCERS = 4
+SPANS = 20000
+METADATA = (("agent_run_token", ""), ("license_key", ""))
+
+
+class Received(object):
+    def __init__(self):
+        self.count = 0
+        self.done = threading.Event()
+
+    def add(self, count):
+        self.count += count
+        if self.count >= SPANS:
+            self.done.set()
+
+
+RECEIVED = Received()
+
+
+def record_span(request, context):
+    for _ in request:
+        RECEIVED.add(1)
+        yield RecordStatus(messages_seen=1)
+
+
+def record_span_batch(request, context):
+    for span_batch in request:
+        RECEIVED.add(len(span_batch.spans))
+        yield RecordStatus(messages_seen=len(span_batch.spans))
+
+
+def start_server():
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=4))
+    server.add_generic_rpc_handlers(
+        (
+            grpc.method_handlers_generic_handler(
+                "com.newrelic.trace.v1.IngestService",
+                {
+                    "RecordSpan": grpc.stream_stream_rpc_method_handler(
+                        record_span, Span.FromString, RecordStatus.SerializeToString
+                    ),
+                    "RecordSpanBatch": grpc.stream_stream_rpc_method_handler(
+                        record_span_batch, SpanBatch.FromString, RecordStatus.SerializeToString
+                    ),
+                },
+            ),
+        )
+    )
+    port = server.add_insecure_port("127.0.0.1:0")
+    server.start()
+    return server, port
+
+
+def produce(stream_buffer, span, count, times):
+    start = time.time()
+    for _ in range(count):
+        stream_buffer.put(span)
+    times.append(time.time() - start)
+
+
+def measure(port, batching):
+    global RECEIVED
+    RECEIVED = Received()
+
+    stream_buffer = StreamBuffer(SPANS, batching=batching)
+    rpc = StreamingRpc("127.0.0.1:%d" % port, stream_buffer, METADATA, lambda *args, **kwargs: None, ssl=False)
+    rpc.connect()
+
+    span = Span(
+        trace_id="0af7651916cd43dd8448eb211c80319c",
+        intrinsics={
+            "name": AttributeValue(string_value="Function/benchmark"),
+            "duration": AttributeValue(double_value=0.001),
+        },
+    )
+
+    times = []
+    producers = [
+        threading.Thread(target=produce, args=(stream_buffer, span, SPANS // PRODUCERS, times))
+        for _ in range(PRODUCERS)
+    ]
+
+    start = time.time()
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    RECEIVED.done.wait(60)
+    elapsed = time.time() - start
+
+    rpc.close()
+
+    return sum(times) / SPANS, elapsed, RECEIVED.count
+
+
+def measure_drop_policy(drop_policy):
+    stream_buffer = StreamBuffer(10000, drop_policy=drop_policy)
+    priorities = [random.random() for _ in range(100000)]
+
+    start = time.time()
+    for priority in priorities:
+        stream_buffer.put(None, priority=priority)
+    return (time.time() - start) / len(priorities)
+
+
+def measure_compression():
+    spans = [
+        Span(
+            trace_id="0af7651916cd43dd8448eb211c80319c",
+            intrinsics={
+                "name": AttributeValue(string_value="Function/benchmark"),
+                "guid": AttributeValue(string_value="%016x" % random.getrandbits(64)),
+                "duration": AttributeValue(double_value=random.random()),
+            },
+        )
+        for _ in range(100)
+    ]
+    data = SpanBatch(spans=spans).SerializeToString()
+
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31)
+    deflate = zlib.compressobj(6, zlib.DEFLATED, 15)
+    return (
+        ("none", len(data)),
+        ("gzip", len(gzip.compress(data) + gzip.flush())),
+        ("deflate", len(deflate.compress(data) + deflate.flush())),
+    )
+
+
+def main():
+    print("%-10s %14s" % ("policy", "full put (us)"))
+    for drop_policy in ("oldest", "priority"):
+        print("%-10s %14.2f" % (drop_policy, measure_drop_policy(drop_policy) * 1e6))
+    print()
+
+    print("%-10s %14s" % ("compress", "batch (bytes)"))
+    for name, size in measure_compression():
+        print("%-10s %14d" % (name, size))
+    print()
+
+    server, port = start_server()
+
+    try:
+        print("producers: %d, spans: %d" % (PRODUCERS, SPANS))
+        print("%-10s %14s %14s %10s" % ("mode", "put (us)", "total (ms)", "received"))
+        for name, batching in (("span", False), ("batch", True)):
+            put, elapsed, received = measure(port, batching)
+            print("%-10s %14.2f %14.1f %10d" % (name, put * 1e6, elapsed * 1000.0, received))
+    finally:
+        server.stop(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the time taken to derive the obfuscated SQL, operation, target
+and identifier for ORM style SELECT statements with IN lists of 10, 100
+and 1000 values. Each statement is first processed without the process
+wide cache of derived values, then through the cache as is done when the
+same statements are executed across many transactions.
+
+    python benchmarks/sql_obfuscation.py
+
+"""
+
+from __future__ import print_function
+
+import time
+
+from newrelic.core import database_utils
+from newrelic.core.database_utils import SQLDatabase, SQLStatement, sql_statement
+
+SIZES = (10, 100, 1000)
+STATEMENTS = 20
+REPEATS = 50
+
+
+class DatabaseModule(object):
+    __name__ = "benchmark_dbapi2"
+    _nr_database_product = "Postgres"
+    _nr_quoting_style = "single+dollar"
+
+
+def create_statements(size):
+    return [
+        'SELECT "app_order"."id", "app_order"."customer_id", "app_order"."status", '
+        '"app_order"."created" FROM "app_order" WHERE ("app_order"."status" = \'shipped\' '
+        'AND "app_order"."customer_id" IN (%s)) ORDER BY "app_order"."created" DESC LIMIT 20'
+        % ", ".join(str(i * 7919 + n) for i in range(size))
+        for n in range(STATEMENTS)
+    ]
+
+
+def derive(statement):
+    return statement.obfuscated, statement.operation, statement.target, statement.identifier
+
+
+def uncached(statements, database):
+    for _ in range(REPEATS):
+        for sql in statements:
+            derive(SQLStatement(sql, database))
+
+
+def cached(statements, module):
+    for _ in range(REPEATS):
+        for sql in statements:
+            derive(sql_statement(sql, module))
+
+
+def timed(func, *args):
+    start = time.time()
+    func(*args)
+    return time.time() - start
+
+
+def main():
+    module = DatabaseModule()
+    database = SQLDatabase(module)
+
+    print("%-10s %16s %16s" % ("IN list", "uncached (us)", "cached (us)"))
+
+    for size in SIZES:
+        statements = create_statements(size)
+        calls = float(STATEMENTS * REPEATS)
+
+        database_utils._sql_statement_values = None
+
+        uncached_time = timed(uncached, statements, database)
+        cached_time = timed(cached, statements, module)
+
+        print("%-10d %16.1f %16.1f" % (size, uncached_time / calls * 1e6, cached_time / calls * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the start up cost of the agent for short lived processes. Each
+run is a fresh interpreter which imports and initializes the agent in
+developer mode and then performs the first 500 imports of modules from the
+standard library, or as many as the standard library provides. The same imports are timed in a fresh interpreter without
+the agent for comparison. The median over a number of runs is reported.
+
+    python benchmarks/startup.py
+
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import pkgutil
+import subprocess
+import sys
+import sysconfig
+import time
+
+IMPORTS = 500
+RUNS = 7
+
+# Modules with side effects on import, or which are not meant to be
+# imported directly.
+
+EXCLUDED = set(["antigravity", "this", "idlelib", "tkinter", "turtle", "turtledemo", "test", "lib2to3", "pydoc_data"])
+
+
+def stdlib_modules():
+    stdlib = sysconfig.get_paths()["stdlib"]
+
+    names = []
+    for module in sorted(pkgutil.iter_modules([stdlib]), key=lambda module: module[1]):
+        name = module[1]
+        if name.startswith("_") or name in EXCLUDED:
+            continue
+        names.append(name)
+        if module[2]:
+            for submodule in pkgutil.iter_modules([os.path.join(stdlib, name)]):
+                if not submodule[1].startswith("_"):
+                    names.append("%s.%s" % (name, submodule[1]))
+
+    return names[:IMPORTS]
+
+
+def child(agent, names):
+    start = time.time()
+
+    if agent:
+        import newrelic.agent
+
+    imported = time.time()
+
+    if agent:
+        newrelic.agent.initialize()
+
+    initialized = time.time()
+
+    for name in names:
+        try:
+            __import__(name)
+        except Exception:
+            pass
+
+    finished = time.time()
+
+    print(json.dumps([imported - start, initialized - imported, finished - initialized]))
+
+
+def run(agent, names):
+    env = dict(os.environ)
+    env["NEW_RELIC_DEVELOPER_MODE"] = "true"
+    env["NEW_RELIC_APP_NAME"] = "Benchmark"
+    env["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] + sys.path)
+
+    output = subprocess.check_output(
+        [sys.executable, __file__, "--child", agent and "agent" or "none", json.dumps(names)],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    names = stdlib_modules()
+
+    print("imports: %d" % len(names))
+    print("%-10s %18s %16s %14s %12s" % ("", "import agent (ms)", "initialize (ms)", "imports (ms)", "total (ms)"))
+
+    for agent in (False, True):
+        results = [run(agent, names) for _ in range(RUNS)]
+        print(
+            "%-10s %18.1f %16.1f %14.1f %12.1f"
+            % (
+                agent and "agent" or "no agent",
+                median([result[0] for result in results]) * 1000.0,
+                median([result[1] for result in results]) * 1000.0,
+                median([result[2] for result in results]) * 1000.0,
+                median([sum(result) for result in results]) * 1000.0,
+            )
+        )
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2] == "agent", json.loads(sys.argv[3]))
+    else:
+        main()
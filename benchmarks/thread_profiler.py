@@ -0,0 +1,103 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the CPU time of the thread profiler taking a sample of 100
+threads, each blocked 30 frames deep, when building the call tree as each
+sample is taken and when counting folded stacks. The time to generate the
+profile data at the end of a session of 600 samples (one minute at the
+default sampling period) is also reported.
+
+    python benchmarks/thread_profiler.py
+
+"""
+
+from __future__ import print_function
+
+import threading
+import time
+
+from newrelic.core.profile_sessions import (
+    ProfileSession,
+    SessionState,
+    _sample_cpu_time,
+    collect_stack_traces,
+)
+
+THREADS = 100
+DEPTH = 30
+SAMPLES = 600
+
+
+def recurse(depth, event, ready):
+    if depth:
+        return recurse(depth - 1, event, ready)
+    ready.set()
+    event.wait()
+
+
+def start_threads(event):
+    threads = []
+    for i in range(THREADS):
+        ready = threading.Event()
+        thread = threading.Thread(target=recurse, args=(DEPTH - (i % 5), event, ready))
+        thread.start()
+        ready.wait()
+        threads.append(thread)
+    return threads
+
+
+def call_tree_sample(session):
+    for category, stack in collect_stack_traces():
+        session.update_call_tree(category, stack)
+
+
+def folded_sample(session):
+    session.update_folded_stacks()
+
+
+def measure(folded, sample):
+    session = ProfileSession(1, time.time() + 3600.0, folded=folded)
+
+    start = _sample_cpu_time()
+    for _ in range(SAMPLES):
+        sample(session)
+    per_sample = (_sample_cpu_time() - start) / SAMPLES
+
+    session.state = SessionState.FINISHED
+
+    start = _sample_cpu_time()
+    session.profile_data()
+    report = _sample_cpu_time() - start
+
+    return per_sample, report
+
+
+def main():
+    event = threading.Event()
+    threads = start_threads(event)
+
+    try:
+        print("threads: %d, samples: %d" % (THREADS, SAMPLES))
+        print("%-10s %18s %18s" % ("mode", "per sample (ms)", "profile data (ms)"))
+        for name, folded, sample in (("call_tree", False, call_tree_sample), ("folded", True, folded_sample)):
+            per_sample, report = measure(folded, sample)
+            print("%-10s %18.3f %18.1f" % (name, per_sample * 1000.0, report * 1000.0))
+    finally:
+        event.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Measures the wall time and memory allocated for a synthetic transaction
+with 5,000 segments, alternating between function and datastore traces as
+for N+1 ORM queries. The agent is run in developer mode so no data is sent
+to the data collector. Memory is reported as the peak traced by tracemalloc
+while the transaction is running, along with the memory allocated for a
+single trace.
+
+    python benchmarks/time_trace.py
+
+"""
+
+from __future__ import print_function
+
+import gc
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("NEW_RELIC_DEVELOPER_MODE", "true")
+os.environ.setdefault("NEW_RELIC_APP_NAME", "Benchmark")
+
+import newrelic.agent  # noqa: E402
+from newrelic.api.background_task import BackgroundTask  # noqa: E402
+from newrelic.api.datastore_trace import DatastoreTrace  # noqa: E402
+from newrelic.api.function_trace import FunctionTrace  # noqa: E402
+
+SEGMENTS = 5000
+REPEATS = 5
+
+
+def transaction(application):
+    with BackgroundTask(application, "benchmark"):
+        for i in range(SEGMENTS // 2):
+            with FunctionTrace("app.models:Order.customer"):
+                pass
+            with DatastoreTrace("Postgres", "customer", "select", host="localhost", port_path_or_id=5432):
+                pass
+
+
+def trace_size(create, count=1000):
+    gc.collect()
+    tracemalloc.start()
+    traces = [create() for _ in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del traces
+    return size // count
+
+
+def main():
+    newrelic.agent.initialize()
+    application = newrelic.agent.register_application(timeout=10.0)
+
+    transaction(application)
+
+    gc.collect()
+    start = time.time()
+    for _ in range(REPEATS):
+        transaction(application)
+    duration = (time.time() - start) / REPEATS
+
+    gc.collect()
+    tracemalloc.start()
+    transaction(application)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    gc.collect()
+    collections = sum(stat["collections"] for stat in gc.get_stats())
+    transaction(application)
+    collections = sum(stat["collections"] for stat in gc.get_stats()) - collections
+
+    print("segments:          %d" % SEGMENTS)
+    print("wall time (ms):    %.1f" % (duration * 1000.0))
+    print("peak memory (KiB): %.1f" % (peak / 1024.0))
+    print("gc collections:    %d" % collections)
+    print("function trace (bytes):  %d" % trace_size(lambda: FunctionTrace("name")))
+    print("datastore trace (bytes): %d" % trace_size(lambda: DatastoreTrace("Postgres", "customer", "select")))
+
+
+if __name__ == "__main__":
+    main()
@@ -52,6 +52,19 @@ def enable_datastore_instance_feature(dbapi2_module):
 
 
 class DatabaseTrace(TimeTrace):
+    __slots__ = (
+        "sql",
+        "dbapi2_module",
+        "connect_params",
+        "cursor_params",
+        "sql_parameters",
+        "execute_params",
+        "host",
+        "port_path_or_id",
+        "database_name",
+        "sql_format",
+        "stack_trace",
+    )
 
     __async_explain_plan_logged = False
 
@@ -87,6 +100,9 @@ class DatabaseTrace(TimeTrace):
         self.port_path_or_id = port_path_or_id
         self.database_name = database_name
 
+        self.sql_format = None
+        self.stack_trace = None
+
     def __enter__(self):
         result = super(DatabaseTrace, self).__enter__()
         if result and self.transaction:
@@ -236,9 +252,9 @@ class DatabaseTrace(TimeTrace):
             host=self.host,
             port_path_or_id=self.port_path_or_id,
             database_name=self.database_name,
-            guid=self.guid,
+            guid=self._guid,
             agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            user_attributes=self._node_user_attributes,
         )
 
 
@@ -22,6 +22,8 @@ from newrelic.core.external_node import ExternalNode
 
 
 class ExternalTrace(CatHeaderMixin, TimeTrace):
+    __slots__ = ("library", "url", "method", "params", "settings")
+
     def __init__(self, library, url, method=None, **kwargs):
         parent = kwargs.pop("parent", None)
         source = kwargs.pop("source", None)
@@ -34,6 +36,7 @@ class ExternalTrace(CatHeaderMixin, TimeTrace):
         self.url = url
         self.method = method
         self.params = {}
+        self.settings = None
 
     def __repr__(self):
         return "<%s object at 0x%x %s>" % (
@@ -60,9 +63,9 @@ class ExternalTrace(CatHeaderMixin, TimeTrace):
             duration=self.duration,
             exclusive=self.exclusive,
             params=self.params,
-            guid=self.guid,
+            guid=self._guid,
             agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            user_attributes=self._node_user_attributes,
         )
 
 
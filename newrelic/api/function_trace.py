@@ -22,6 +22,8 @@ from newrelic.core.function_node import FunctionNode
 
 
 class FunctionTrace(TimeTrace):
+    __slots__ = ("name", "group", "label", "params", "terminal", "rollup")
+
     def __init__(self, name, group=None, label=None, params=None, terminal=False, rollup=None, **kwargs):
         parent = kwargs.pop("parent", None)
         source = kwargs.pop("source", None)
@@ -83,9 +85,9 @@ class FunctionTrace(TimeTrace):
             label=self.label,
             params=self.params,
             rollup=self.rollup,
-            guid=self.guid,
-            agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            guid=self._guid,
+            agent_attributes=self._node_agent_attributes,
+            user_attributes=self._node_user_attributes,
         )
 
 
@@ -83,9 +83,9 @@ class GraphQLOperationTrace(TimeTrace):
             end_time=self.end_time,
             duration=self.duration,
             exclusive=self.exclusive,
-            guid=self.guid,
-            agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            guid=self._guid,
+            agent_attributes=self._node_agent_attributes,
+            user_attributes=self._node_user_attributes,
             operation_name=self.operation_name,
             operation_type=self.operation_type,
             deepest_path=self.deepest_path,
@@ -181,9 +181,9 @@ class GraphQLResolverTrace(TimeTrace):
             end_time=self.end_time,
             duration=self.duration,
             exclusive=self.exclusive,
-            guid=self.guid,
-            agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            guid=self._guid,
+            agent_attributes=self._node_agent_attributes,
+            user_attributes=self._node_user_attributes,
             product=self.product,
         )
 
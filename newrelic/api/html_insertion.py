@@ -33,6 +33,139 @@ _attachment_meta_re = re.compile(
 _body_re = re.compile(b"<body[^>]*>", re.IGNORECASE)
 
 
+class HTMLInsertionScanner(object):
+    """Searches a HTML response a chunk at a time for the point at which the
+    browser monitoring snippet should be inserted.
+
+    The chunks are searched in place using offsets so they are never copied
+    or joined together. As none of the tags being searched for can contain
+    a '>' except at their end, only the unterminated tag, if any, at the end
+    of the prior chunks needs to be carried over so that a tag split across
+    chunks is still found.
+
+    """
+
+    def __init__(self, search_limit=64 * 1024):
+        self.search_limit = search_limit
+
+        self.length = 0
+        self.lookback = b""
+
+        self.head = None
+        self.xua_meta = None
+        self.charset_meta = None
+        self.attachment = False
+
+        self.body = None
+
+    def scan(self, data):
+        """Searches the next chunk of the response. Returns True once the
+        start of the body element has been found, or the search limit has
+        been reached without finding it.
+
+        """
+
+        offset = self.length
+        self.length += len(data)
+
+        limit = max(0, min(len(data), self.search_limit - offset))
+
+        lookback = self.lookback
+        start = 0
+
+        # Join any unterminated tag from the prior chunks with the start of
+        # this chunk, up to where that tag must end, and search that first.
+
+        if lookback:
+            end = data.find(b">", 0, limit)
+
+            if end == -1:
+                lookback += data[:limit]
+                start = limit
+            else:
+                start = end + 1
+                if self._search(lookback + data[:start], offset - len(lookback), 0, start + len(lookback)):
+                    return True
+                lookback = b""
+
+        if start < limit and self._search(data, offset, start, limit):
+            return True
+
+        end = data.rfind(b">", start, limit)
+
+        if end != -1:
+            lookback = data[end + 1 : limit]
+        elif start < limit:
+            lookback += data[start:limit]
+
+        self.lookback = lookback
+
+        return self.length >= self.search_limit
+
+    def _search(self, data, offset, pos, endpos):
+        body = _body_re.search(data, pos, endpos)
+
+        # Anything in the head is only of interest if it precedes the
+        # start of the body element.
+
+        if body:
+            endpos = body.start()
+
+        if self.head is None:
+            head = _head_re.search(data, pos, endpos)
+            if head:
+                self.head = offset + head.end()
+
+        if self.xua_meta is None:
+            xua_meta = _xua_meta_re.search(data, pos, endpos)
+            if xua_meta:
+                self.xua_meta = offset + xua_meta.end()
+
+        if self.charset_meta is None:
+            charset_meta = _charset_meta_re.search(data, pos, endpos)
+            if charset_meta:
+                self.charset_meta = offset + charset_meta.end()
+
+        if not self.attachment:
+            self.attachment = _attachment_meta_re.search(data, pos, endpos) is not None
+
+        if body:
+            self.body = offset + body.start()
+            return True
+
+        return False
+
+    def insertion_point(self):
+        """Returns the offset into the response at which the snippet should
+        be inserted, or None if the body element wasn't found or nothing
+        should be inserted.
+
+        """
+
+        # Search for instance of a content disposition meta tag
+        # indicating that the response is actually being served up
+        # as an attachment and would be saved as a file and not
+        # actually interpreted by a browser.
+
+        if self.body is None or self.attachment:
+            return None
+
+        # Use whichever of the X-UA or charset meta tags is the last
+        # to appear in the data, then try for the start of the head
+        # section. Finally if no joy, insert before the start of the
+        # body.
+
+        index = max(self.xua_meta or 0, self.charset_meta or 0)
+
+        if index:
+            return index
+
+        if self.head is not None:
+            return self.head
+
+        return self.body
+
+
 def insert_html_snippet(data, html_to_be_inserted, search_limit=64 * 1024):
     # First determine if we have a body tag. If we don't we
     # always give up even though strictly speaking we may not
@@ -41,9 +174,10 @@ def insert_html_snippet(data, html_to_be_inserted, search_limit=64 * 1024):
     # doing this initial search, we only do up to the specified
     # search limit.
 
-    body = _body_re.search(data[:search_limit])
+    scanner = HTMLInsertionScanner(search_limit)
+    scanner.scan(data)
 
-    if not body:
+    if scanner.body is None:
         return data if len(data) > search_limit else None
 
     # We are definitely doing to insert something now, so
@@ -55,49 +189,12 @@ def insert_html_snippet(data, html_to_be_inserted, search_limit=64 * 1024):
     if not text:
         return data
 
-    # We are now going to split out everything before the body
-    # to limit searches when applying the regex patterns. We
-    # could have just used up to the search limit, but the
-    # patterns which follow seem to be expensive enough that a
-    # short a string as possible helps.
+    index = scanner.insertion_point()
 
-    start = body.start()
-    tail, data = data[start:], data[:start]
-
-    def insert_at_index(index):
-        return b"".join((data[:index], text, data[index:], tail))
-
-    # Search for instance of a content disposition meta tag
-    # indicating that the response is actually being served up
-    # as an attachment and would be saved as a file and not
-    # actually interpreted by a browser.
-
-    if _attachment_meta_re.search(data):
-        return data + tail
-
-    # Search for instances of X-UA or charset meta tags. We will
-    # use whichever is the last to appear in the data.
-
-    xua_meta = _xua_meta_re.search(data)
-    charset_meta = _charset_meta_re.search(data)
-
-    index = max(
-        xua_meta and xua_meta.end() or 0, charset_meta and charset_meta.end() or 0
-    )
-
-    if index:
-        return insert_at_index(index)
-
-    # Next try for the start of head section.
-
-    head = _head_re.search(data)
-
-    if head:
-        return insert_at_index(head.end())
-
-    # Finally if no joy, insert before the start of the body.
+    if index is None:
+        return data
 
-    return insert_at_index(body.start())
+    return b"".join((data[:index], text, data[index:]))
 
 
 def verify_body_exists(data):
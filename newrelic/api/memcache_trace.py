@@ -45,9 +45,9 @@ class MemcacheTrace(TimeTrace):
             end_time=self.end_time,
             duration=self.duration,
             exclusive=self.exclusive,
-            guid=self.guid,
-            agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            guid=self._guid,
+            agent_attributes=self._node_agent_attributes,
+            user_attributes=self._node_user_attributes,
         )
 
 
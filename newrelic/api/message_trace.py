@@ -83,9 +83,9 @@ class MessageTrace(CatHeaderMixin, TimeTrace):
             destination_name=self.destination_name,
             destination_type=self.destination_type,
             params=self.params,
-            guid=self.guid,
-            agent_attributes=self.agent_attributes,
-            user_attributes=self.user_attributes,
+            guid=self._guid,
+            agent_attributes=self._node_agent_attributes,
+            user_attributes=self._node_user_attributes,
         )
 
 
@@ -22,6 +22,7 @@ import warnings
 
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
 from newrelic.common.object_names import parse_exc_info
+from newrelic.core.aggregate_node import aggregate_child
 from newrelic.core.attribute import MAX_NUM_USER_ATTRIBUTES, process_user_attribute
 from newrelic.core.code_level_metrics import (
     extract_code_from_callable,
@@ -32,13 +33,56 @@ from newrelic.core.trace_cache import trace_cache
 
 _logger = logging.getLogger(__name__)
 
+# Passed to the nodes of any traces to which no attributes were added.
+# Nodes only ever read the attributes passed to them, except for those
+# which add attributes of their own when generating span events, which
+# are always passed a dictionary of their own.
+
+_EMPTY_ATTRIBUTES = {}
+
 
 class TimeTrace(object):
+    # Traces are created in large numbers, so attributes are held in slots
+    # rather than an instance dictionary. A dictionary is still available
+    # for any attributes not listed, for example those added by
+    # instrumentation hooks, but is only allocated when first used.
+    # Derived classes should list their own attributes in slots as well.
+    #
+    # Most traces have no children or attributes and are never asked for
+    # their guid, so the children start as an empty tuple, and the
+    # attribute dictionaries and guid are only created when first used.
+
+    __slots__ = (
+        "parent",
+        "root",
+        "child_count",
+        "children",
+        "start_time",
+        "end_time",
+        "duration",
+        "exclusive",
+        "thread_id",
+        "activated",
+        "exited",
+        "is_async",
+        "has_async_children",
+        "min_child_start_time",
+        "exc_data",
+        "should_record_segment_params",
+        "_guid",
+        "_agent_attributes",
+        "_user_attributes",
+        "_source",
+        "_greenlet",
+        "__dict__",
+        "__weakref__",
+    )
+
     def __init__(self, parent=None, source=None):
         self.parent = parent
         self.root = None
         self.child_count = 0
-        self.children = []
+        self.children = ()
         self.start_time = 0.0
         self.end_time = 0.0
         self.duration = 0.0
@@ -51,13 +95,46 @@ class TimeTrace(object):
         self.min_child_start_time = float("inf")
         self.exc_data = (None, None, None)
         self.should_record_segment_params = False
-        # 16-digit random hex. Padded with zeros in the front.
-        self.guid = "%016x" % random.getrandbits(64)
-        self.agent_attributes = {}
-        self.user_attributes = {}
+        self._guid = None
+        self._agent_attributes = None
+        self._user_attributes = None
 
         self._source = source
 
+    @property
+    def guid(self):
+        guid = self._guid
+        if guid is None:
+            # 16-digit random hex. Padded with zeros in the front.
+            guid = self._guid = "%016x" % random.getrandbits(64)
+        return guid
+
+    @guid.setter
+    def guid(self, value):
+        self._guid = value
+
+    @property
+    def agent_attributes(self):
+        attributes = self._agent_attributes
+        if attributes is None:
+            attributes = self._agent_attributes = {}
+        return attributes
+
+    @property
+    def user_attributes(self):
+        attributes = self._user_attributes
+        if attributes is None:
+            attributes = self._user_attributes = {}
+        return attributes
+
+    @property
+    def _node_agent_attributes(self):
+        return self._agent_attributes or _EMPTY_ATTRIBUTES
+
+    @property
+    def _node_user_attributes(self):
+        return self._user_attributes or _EMPTY_ATTRIBUTES
+
     @property
     def transaction(self):
         return self.root and self.root.transaction
@@ -495,7 +572,8 @@ class TimeTrace(object):
 
         if node:
             transaction._process_node(node)
-            parent.process_child(node, self.is_async)
+            budget = transaction._segment_budget
+            parent.process_child(node, self.is_async, budget and transaction._trace_node_count > budget)
 
         # ----------------------------------------------------------------------
         # SYNC  | The parent will not have exited yet, so no node will be
@@ -543,8 +621,17 @@ class TimeTrace(object):
             # call parent exclusive duration delta
             self.parent.update_async_exclusive_time(min_child_start_time, exclusive_duration_remaining)
 
-    def process_child(self, node, is_async):
-        self.children.append(node)
+    def process_child(self, node, is_async, aggregate=False):
+        # Once over the segment budget for the transaction, the node may
+        # instead be merged into the previous sibling. It then no longer
+        # occupies a slot in the children, so is also dropped from the
+        # count of children against which outstanding children are judged.
+        if aggregate and aggregate_child(self.children, node):
+            self.child_count -= 1
+        elif self.children:
+            self.children.append(node)
+        else:
+            self.children = [node]
         if is_async:
 
             # record the lowest start time
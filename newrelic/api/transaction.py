@@ -28,7 +28,12 @@ from collections import OrderedDict
 from newrelic.api.application import application_instance
 import newrelic.core.database_node
 import newrelic.core.error_node
+from newrelic.core.datastore_node import DatastoreNode
+from newrelic.core.external_node import ExternalNode
+from newrelic.core.function_node import FunctionNode
 from newrelic.core.log_event_node import LogEventNode
+from newrelic.core.loop_node import LoopNode
+from newrelic.core.memcache_node import MemcacheNode
 import newrelic.core.root_node
 import newrelic.core.transaction_node
 import newrelic.packages.six as six
@@ -66,6 +71,7 @@ from newrelic.core.custom_event import create_custom_event
 from newrelic.core.stack_trace import exception_stack
 from newrelic.core.stats_engine import CustomMetrics, SampledDataSet
 from newrelic.core.thread_utilization import utilization_tracker
+from newrelic.core.transaction_node import EVENT_ROLLUP_INTRINSICS
 from newrelic.core.trace_cache import (
     TraceCacheActiveTraceError,
     TraceCacheNoActiveTraceError,
@@ -85,6 +91,18 @@ PARENT_TYPE = {
     "2": "Mobile",
 }
 
+# The rollup metric reported by each type of node which contributes to the
+# call times and counts included in the analytics event intrinsics. Function
+# nodes instead contribute to those named by their own rollups.
+
+EVENT_ROLLUP_METRICS = {
+    newrelic.core.database_node.DatabaseNode: "Datastore/all",
+    DatastoreNode: "Datastore/all",
+    ExternalNode: "External/all",
+    MemcacheNode: "Memcache/all",
+    LoopNode: "EventLoop/Wait/all",
+}
+
 
 class Sentinel(TimeTrace):
     def __init__(self, transaction):
@@ -95,7 +113,10 @@ class Sentinel(TimeTrace):
         self.thread_id = transaction.thread_id
 
     def add_child(self, node):
-        self.children.append(node)
+        if self.children:
+            self.children.append(node)
+        else:
+            self.children = [node]
 
     def update_with_transaction_custom_attributes(self, transaction_params):
         """
@@ -205,6 +226,9 @@ class Transaction(object):
         self.stopped = False
 
         self._trace_node_count = 0
+        self._segment_budget = 0
+
+        self._event_rollups = {}
 
         self._errors = []
         self._slow_sql = []
@@ -325,6 +349,7 @@ class Transaction(object):
 
         if self._settings:
             self._custom_events = SampledDataSet(capacity=self._settings.event_harvest_config.harvest_limits.custom_event_data)
+            self._segment_budget = self._settings.agent_limits.segments_per_transaction or 0
             self._log_events = SampledDataSet(capacity=self._settings.event_harvest_config.harvest_limits.log_event_data)
         else:
             self._custom_events = SampledDataSet(capacity=DEFAULT_RESERVOIR_SIZE)
@@ -604,6 +629,7 @@ class Transaction(object):
             root_span_guid=root.guid,
             trace_id=self.trace_id,
             loop_time=self._loop_time,
+            event_rollups=self._event_rollups,
             root=root_node,
         )
 
@@ -1601,7 +1627,27 @@ class Transaction(object):
         node.node_count = self._trace_node_count
         self.total_time += node.exclusive
 
-        if type(node) is newrelic.core.database_node.DatabaseNode:
+        # Accumulate the call times and counts for the analytics event
+        # intrinsics as each node completes, rather than looking them up
+        # from the metrics once the transaction is recorded.
+
+        node_type = type(node)
+
+        rollup = EVENT_ROLLUP_METRICS.get(node_type)
+
+        if rollup:
+            self._add_event_rollup(rollup, node.duration)
+
+        elif node_type is FunctionNode and node.rollup:
+            rollups = node.rollup
+            if isinstance(rollups, six.string_types):
+                rollups = (rollups,)
+
+            for rollup in rollups:
+                if rollup in EVENT_ROLLUP_INTRINSICS:
+                    self._add_event_rollup(rollup, node.duration)
+
+        if node_type is newrelic.core.database_node.DatabaseNode:
             settings = self._settings
             if not settings.collect_traces:
                 return
@@ -1613,6 +1659,15 @@ class Transaction(object):
                 return
             self._slow_sql.append(node)
 
+    def _add_event_rollup(self, rollup, duration):
+        rollups = self._event_rollups
+        call_time, call_count = EVENT_ROLLUP_INTRINSICS[rollup]
+
+        rollups[call_time] = rollups.get(call_time, 0) + duration
+
+        if call_count:
+            rollups[call_count] = rollups.get(call_count, 0) + 1
+
     def stop_recording(self):
         if not self.enabled:
             return
@@ -22,7 +22,7 @@ from newrelic.api.transaction import current_transaction
 from newrelic.api.time_trace import notice_error
 from newrelic.api.web_transaction import WSGIWebTransaction
 from newrelic.api.function_trace import FunctionTrace, FunctionTraceWrapper
-from newrelic.api.html_insertion import insert_html_snippet, verify_body_exists
+from newrelic.api.html_insertion import HTMLInsertionScanner
 from newrelic.api.time_trace import notice_error
 from newrelic.api.transaction import current_transaction
 from newrelic.api.web_transaction import WSGIWebTransaction
@@ -190,9 +190,10 @@ class _WSGIApplicationMiddleware(object):
 
         self.content_length = None
 
-        self.response_length = 0
         self.response_data = []
 
+        self.html_scanner = HTMLInsertionScanner(self.search_maximum)
+
         settings = transaction.settings
 
         self.debug = settings and settings.debug.log_autorum_middleware
@@ -202,92 +203,76 @@ class _WSGIApplicationMiddleware(object):
         self.iterable = self.application(self.request_environ, self.start_response)
 
     def process_data(self, data):
-        # If this is the first data block, then immediately try
-        # for an insertion using full set of criteria. If this
-        # works then we are done, else we move to next phase of
-        # buffering up content until we find the body element.
+        # Buffer up the data while scanning it for the insertion
+        # point. Each block of data is only scanned as it arrives,
+        # with anything needed to find a tag split across blocks
+        # carried over by the scanner. If we haven't found the
+        # start of the body element and haven't reached the limit
+        # of buffering allowed, that is all we do.
 
-        def html_to_be_inserted():
-            header = self.transaction.browser_timing_header()
+        self.response_data.append(data)
 
-            if not header:
-                return b""
+        if not self.html_scanner.scan(data):
+            return
 
-            footer = self.transaction.browser_timing_footer()
+        buffered_data = self.response_data
+        self.response_data = []
 
-            return six.b(header) + six.b(footer)
+        # If we reached the limit of buffering allowed without
+        # finding the body element, give up and return the buffered
+        # data.
 
-        if not self.response_data:
-            modified = insert_html_snippet(data, html_to_be_inserted)
+        if self.html_scanner.body is None:
+            return buffered_data
 
-            if modified is not None:
-                if self.debug:
-                    _logger.debug(
-                        "RUM insertion from WSGI middleware "
-                        "triggered on first yielded string from "
-                        "response. Bytes added was %r.",
-                        len(modified) - len(data),
-                    )
+        # We are definitely doing to insert something now, so
+        # generate the text to be inserted. Bail out if is empty or
+        # the response is being served up as an attachment.
 
-                if self.content_length is not None:
-                    length = len(modified) - len(data)
-                    self.content_length += length
+        header = self.transaction.browser_timing_header()
 
-                return [modified]
+        if not header:
+            return buffered_data
 
-        # Buffer up the data. If we haven't found the start of
-        # the body element, that is all we do. If we have reached
-        # the limit of buffering allowed, then give up and return
-        # the buffered data.
+        footer = self.transaction.browser_timing_footer()
 
-        if not self.response_data or not verify_body_exists(data):
-            self.response_length += len(data)
-            self.response_data.append(data)
+        text = six.b(header) + six.b(footer)
 
-            if self.response_length >= self.search_maximum:
-                buffered_data = self.response_data
-                self.response_data = []
-                return buffered_data
+        index = self.html_scanner.insertion_point()
 
-            return
+        if index is None:
+            return buffered_data
 
-        # Now join back together any buffered data into a single
-        # string. This makes it easier to process, but there is a
-        # risk that we could temporarily double memory use for
-        # the response content if had small data blocks followed
-        # by very large data block. Expect that the risk of this
-        # occurring is very small.
+        # Split the one block of data holding the insertion point
+        # around the text to be inserted. All other blocks of data
+        # are passed through untouched rather than being joined back
+        # together, so a large response isn't copied.
 
-        if self.response_data:
-            self.response_data.append(data)
-            data = b"".join(self.response_data)
-            self.response_data = []
-
-        # Perform the insertion of the HTML. This should always
-        # succeed as we would only have got here if we had found
-        # the body element, which is the fallback point for
-        # insertion.
+        offset = 0
 
-        modified = insert_html_snippet(data, html_to_be_inserted)
+        for position, data in enumerate(buffered_data):
+            if index <= offset + len(data):
+                index -= offset
+                break
+            offset += len(data)
 
-        if modified is not None:
-            if self.debug:
-                _logger.debug(
-                    "RUM insertion from WSGI middleware "
-                    "triggered on subsequent string yielded from "
-                    "response. Bytes added was %r.",
-                    len(modified) - len(data),
-                )
+        if self.debug:
+            _logger.debug(
+                "RUM insertion from WSGI middleware "
+                "triggered on string %r yielded from "
+                "response. Bytes added was %r.",
+                position + 1,
+                len(text),
+            )
 
-            if self.content_length is not None:
-                length = len(modified) - len(data)
-                self.content_length += length
-
-            return [modified]
+        if self.content_length is not None:
+            self.content_length += len(text)
 
-        # Something went very wrong as we should never get here.
+        modified = buffered_data[:position]
+        modified.extend(part for part in (data[:index], text, data[index:]) if part)
+        modified.extend(buffered_data[position + 1 :])
 
-        return [data]
+        return modified
 
     def flush_headers(self):
         # Add back in any response content length header. It will
@@ -74,6 +74,7 @@ def _urllib3_ssl_recursion_workaround(wrapped, instance, args, kwargs):
 
 class BaseClient(object):
     AUDIT_LOG_ID = 0
+    STREAMING_PAYLOADS = False
 
     def __init__(
         self,
@@ -92,6 +93,7 @@ class BaseClient(object):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._audit_log_fp = audit_log_fp
 
@@ -108,14 +110,27 @@ class BaseClient(object):
         pass
 
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(
+        params, payload, body, compression_time, payload_size=None
+    ):
         pass
 
     @classmethod
     def log_request(
-        cls, fp, method, url, params, payload, headers, body=None, compression_time=None
+        cls,
+        fp,
+        method,
+        url,
+        params,
+        payload,
+        headers,
+        body=None,
+        compression_time=None,
+        payload_size=None,
     ):
-        cls._supportability_request(params, payload, body, compression_time)
+        cls._supportability_request(
+            params, payload, body, compression_time, payload_size
+        )
 
         if not fp:
             return
@@ -217,6 +232,7 @@ class BaseClient(object):
 
 
 class HttpClient(BaseClient):
+    STREAMING_PAYLOADS = True
     CONNECTION_CLS = urllib3.HTTPSConnectionPool
     PREFIX_SCHEME = "https://"
     BASE_HEADERS = urllib3.make_headers(
@@ -240,6 +256,7 @@ class HttpClient(BaseClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         self._host = host
         port = self._port = port
@@ -255,6 +272,14 @@ class HttpClient(BaseClient):
         self._connection_kwargs = connection_kwargs = {
             "timeout": timeout,
         }
+
+        # Requests may be sent from more than one thread at a time, such as
+        # when sending the parts of a split payload, in which case enough
+        # connections are kept for each of them to be reused.
+
+        if max_connections > 1:
+            connection_kwargs["maxsize"] = max_connections
+            connection_kwargs["block"] = True
         self._urlopen_kwargs = urlopen_kwargs = {}
 
         if self.CONNECTION_CLS.scheme == "https":
@@ -370,12 +395,21 @@ class HttpClient(BaseClient):
         headers,
         body=None,
         compression_time=None,
+        payload_size=None,
     ):
         if not self._prefix:
             url = self.CONNECTION_CLS.scheme + "://" + self._host + url
 
         return super(HttpClient, self).log_request(
-            fp, method, url, params, payload, headers, body, compression_time
+            fp,
+            method,
+            url,
+            params,
+            payload,
+            headers,
+            body,
+            compression_time,
+            payload_size,
         )
 
     @staticmethod
@@ -392,6 +426,55 @@ class HttpClient(BaseClient):
 
         return data, compression_time
 
+    @staticmethod
+    def _compress_chunks(chunks, method="gzip", level=None, threshold=0, limit=None):
+        # Consumes an iterable of encoded payload chunks, compressing them
+        # as they arrive once the total size passes the threshold. Only
+        # the compressed output is retained, so the uncompressed payload
+        # is never held in memory as a whole. If the output grows beyond
+        # the limit, the remaining chunks are not consumed at all.
+
+        level = level or zlib.Z_DEFAULT_COMPRESSION
+        wbits = 31 if method == "gzip" else 15
+
+        compressor = None
+        compression_time = None
+        pending = []
+        output = []
+        payload_size = 0
+        body_size = 0
+
+        for chunk in chunks:
+            payload_size += len(chunk)
+
+            if compressor is None:
+                pending.append(chunk)
+                if payload_size <= threshold:
+                    continue
+                chunk = b"".join(pending)
+                pending = None
+                compressor = zlib.compressobj(level, zlib.DEFLATED, wbits)
+                compression_time = 0.0
+
+            compression_start = time.time()
+            data = compressor.compress(chunk)
+            compression_time += max(time.time(), compression_start) - compression_start
+
+            if data:
+                output.append(data)
+                body_size += len(data)
+                if limit is not None and body_size > limit:
+                    break
+
+        if compressor is None:
+            return payload_size, b"".join(pending), None
+
+        compression_start = time.time()
+        output.append(compressor.flush())
+        compression_time += max(time.time(), compression_start) - compression_start
+
+        return payload_size, b"".join(output), compression_time
+
     def send_request(
         self,
         method="POST",
@@ -410,9 +493,34 @@ class HttpClient(BaseClient):
         if headers:
             merged_headers.update(headers)
         path = self._prefix + path
-        body = payload
         compression_time = None
-        if payload is not None:
+        payload_size = None
+
+        # Chunked payloads are required in full for the audit log, so
+        # are only streamed through the compressor when it is disabled.
+        # Otherwise they are joined and compressed the same as any other.
+        if payload is not None and not isinstance(payload, bytes) and self._audit_log_fp:
+            payload = b"".join(payload)
+
+        body = payload
+
+        if payload is not None and not isinstance(payload, bytes):
+            payload_size, body, compression_time = self._compress_chunks(
+                payload,
+                method=self._compression_method,
+                level=self._compression_level,
+                threshold=self._compression_threshold,
+                limit=self._max_payload_size_in_bytes,
+            )
+            payload = None
+            if compression_time is not None:
+                content_encoding = self._compression_method
+            else:
+                content_encoding = "Identity"
+
+            merged_headers["Content-Encoding"] = content_encoding
+
+        elif payload is not None:
             if len(payload) > self._compression_threshold:
                 body, compression_time = self._compress(
                     payload,
@@ -434,6 +542,7 @@ class HttpClient(BaseClient):
             merged_headers,
             body,
             compression_time,
+            payload_size,
         )
 
         if body and len(body) > self._max_payload_size_in_bytes:
@@ -489,6 +598,7 @@ class InsecureHttpClient(HttpClient):
         compression_method="gzip",
         max_payload_size_in_bytes=1000000,
         audit_log_fp=None,
+        max_connections=1,
     ):
         proxy = self._parse_proxy(proxy_scheme, proxy_host, None, None, None)
         if proxy and proxy.scheme == "https":
@@ -515,12 +625,15 @@ class InsecureHttpClient(HttpClient):
             compression_method,
             max_payload_size_in_bytes,
             audit_log_fp,
+            max_connections,
         )
 
 
 class SupportabilityMixin(object):
     @staticmethod
-    def _supportability_request(params, payload, body, compression_time):
+    def _supportability_request(
+        params, payload, body, compression_time, payload_size=None
+    ):
         # *********
         # Used only for supportability metrics. Do not use to drive business
         # logic!
@@ -530,9 +643,11 @@ class SupportabilityMixin(object):
         if agent_method and body:
             # Compression was applied
             if compression_time is not None:
+                if payload_size is None:
+                    payload_size = len(payload)
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Bytes/%s" % agent_method,
-                    len(payload),
+                    payload_size,
                 )
                 internal_metric(
                     "Supportability/Python/Collector/ZLIB/Compress/%s" % agent_method,
@@ -48,7 +48,7 @@ BASE64_DECODE_STR = getattr(base64, 'decodestring', None)
 # be supplied as key word arguments to allow the wrappers to supply
 # defaults.
 
-def json_encode(obj, **kwargs):
+def _json_encode_kwargs(kwargs):
     _kwargs = {}
 
     # This wrapper function needs to deal with a few issues.
@@ -102,7 +102,59 @@ def json_encode(obj, **kwargs):
 
     _kwargs.update(kwargs)
 
-    return json.dumps(obj, **_kwargs)
+    return _kwargs
+
+
+def json_encode(obj, **kwargs):
+    return json.dumps(obj, **_json_encode_kwargs(kwargs))
+
+
+def _json_iterencode(obj, encode, depth):
+    # Only the outer layers of lists, tuples and generators are walked
+    # here. Anything below the depth limit, and anything which isn't a
+    # sequence, is handed as a whole to the C accelerated encoder as
+    # going through JSONEncoder.iterencode() for everything would force
+    # use of the much slower pure Python implementation.
+
+    if depth and isinstance(obj, (list, tuple, types.GeneratorType)):
+        yield '['
+        first = True
+        for item in obj:
+            if not first:
+                yield ','
+            first = False
+            for piece in _json_iterencode(item, encode, depth - 1):
+                yield piece
+        yield ']'
+    else:
+        yield encode(obj)
+
+
+def json_encode_chunks(obj, chunk_size=64 * 1024, depth=2, **kwargs):
+    """Incrementally encodes obj as JSON, yielding UTF-8 encoded byte
+    strings of roughly chunk_size bytes. Joining the chunks produces the
+    same output as json_encode(obj).encode('utf-8'), but without ever
+    holding the complete encoded document in memory at once. Generators
+    in the outer depth levels are consumed lazily rather than being
+    expanded into a list first.
+
+    """
+
+    encode = json.JSONEncoder(**_json_encode_kwargs(kwargs)).encode
+
+    pieces = []
+    size = 0
+
+    for piece in _json_iterencode(obj, encode, depth):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield ''.join(pieces).encode('utf-8')
+            pieces = []
+            size = 0
+
+    if pieces:
+        yield ''.join(pieces).encode('utf-8')
 
 
 def json_decode(s, **kwargs):
@@ -0,0 +1,93 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Lookup of entry points registered by installed packages.
+
+Importing pkg_resources scans and parses the metadata of every installed
+distribution, which takes a substantial part of the agent start up time.
+Where available, importlib.metadata is used instead as it only reads the
+entry points files when they are asked for. Neither is imported until
+entry points are first looked up.
+
+"""
+
+import sys
+from collections import namedtuple
+
+EntryPoint = namedtuple("EntryPoint", ["name", "module_name", "attrs"])
+
+
+_importlib_entry_points_cache = None
+
+
+def _importlib_entry_points(group):
+    global _importlib_entry_points_cache
+
+    # The entry points of all the installed distributions are read in one
+    # pass and grouped, so looking up further groups is a dictionary lookup.
+
+    if _importlib_entry_points_cache is None:
+        from importlib.metadata import distributions
+
+        groups = {}
+
+        # The same distribution may be found more than once when it is
+        # reachable from multiple entries in sys.path.
+
+        seen = set()
+
+        for distribution in distributions():
+            for entry_point in distribution.entry_points:
+                key = (entry_point.group, entry_point.name, entry_point.value)
+
+                if key in seen:
+                    continue
+
+                seen.add(key)
+
+                # Value is of the form "module:attr.attr [extras]".
+
+                value = entry_point.value.split("[", 1)[0]
+                module_name, _, attrs = value.partition(":")
+                attrs = attrs.strip()
+
+                groups.setdefault(entry_point.group, []).append(
+                    EntryPoint(entry_point.name, module_name.strip(), attrs and tuple(attrs.split(".")) or ())
+                )
+
+        _importlib_entry_points_cache = groups
+
+    return iter(_importlib_entry_points_cache.get(group, ()))
+
+
+def _pkg_resources_entry_points(group):
+    try:
+        import pkg_resources
+    except ImportError:
+        return
+
+    for entry_point in pkg_resources.iter_entry_points(group=group):
+        yield EntryPoint(entry_point.name, entry_point.module_name, tuple(entry_point.attrs))
+
+
+def iter_entry_points(group):
+    """Yields the name, module name and attributes of each entry point
+    registered for the group.
+
+    """
+
+    if sys.version_info >= (3, 8):
+        return _importlib_entry_points(group)
+
+    return _pkg_resources_entry_points(group)
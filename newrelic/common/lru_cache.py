@@ -0,0 +1,82 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module implements a bounded, thread safe, least recently used
+cache which keeps count of hits, misses and evictions so that these can
+be reported as supportability metrics.
+
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __copy__(self):
+        return type(self)(self.maxsize)
+
+    def __deepcopy__(self, memo):
+        # The contents are derived data which can always be recreated,
+        # so copies start out empty rather than trying to copy the lock.
+        return type(self)(self.maxsize)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """Returns the counts of hits, misses and evictions since this
+        was last called and then resets them.
+
+        """
+
+        with self._lock:
+            result = (self.hits, self.misses, self.evictions)
+            self.hits = self.misses = self.evictions = 0
+            return result
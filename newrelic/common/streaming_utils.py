@@ -13,24 +13,122 @@
 # limitations under the License.
 
 import collections
+import heapq
+import itertools
 import logging
 import threading
+import time
 
 try:
-    from newrelic.core.infinite_tracing_pb2 import AttributeValue
+    from newrelic.core.infinite_tracing_pb2 import AttributeValue, SpanBatch
 except:
-    AttributeValue = None
+    AttributeValue, SpanBatch = None, None
 
 _logger = logging.getLogger(__name__)
 
+_REMOVED = object()
+
+
+class PriorityShedQueue(object):
+    """First in first out queue which, when full, sheds the item with the
+    lowest priority rather than the oldest item. Items of equal priority
+    are shed oldest first and items without a priority are shed first.
+
+    Items are also held in a heap ordered by priority. Items leaving the
+    queue are only marked as removed, with the heap and the queue itself
+    each being rebuilt once it holds twice as many entries as the queue
+    can.
+
+    """
 
-class StreamBuffer(object):
     def __init__(self, maxlen):
-        self._queue = collections.deque(maxlen=maxlen)
+        self.maxlen = maxlen
+        self._entries = collections.deque()
+        self._heap = []
+        self._length = 0
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return self._length
+
+    def append(self, item, priority=None):
+        """Adds the item to the queue, returning whether an item had to
+        be shed to make room. The shed item may be the one being added.
+
+        """
+
+        if priority is None:
+            priority = float("-inf")
+
+        shed = False
+
+        if self._length >= self.maxlen:
+            heap = self._heap
+
+            while heap and heap[0][2] is _REMOVED:
+                heapq.heappop(heap)
+
+            if not heap or priority < heap[0][0]:
+                return True
+
+            heapq.heappop(heap)[2] = _REMOVED
+            self._length -= 1
+            shed = True
+
+        limit = 2 * max(self.maxlen, 1)
+
+        if len(self._heap) >= limit:
+            self._heap = [entry for entry in self._heap if entry[2] is not _REMOVED]
+            heapq.heapify(self._heap)
+
+        if len(self._entries) >= limit:
+            self._entries = collections.deque(entry for entry in self._entries if entry[2] is not _REMOVED)
+
+        entry = [priority, next(self._counter), item]
+        heapq.heappush(self._heap, entry)
+        self._entries.append(entry)
+        self._length += 1
+
+        return shed
+
+    def popleft(self):
+        while True:
+            entry = self._entries.popleft()
+            item = entry[2]
+            if item is not _REMOVED:
+                entry[2] = _REMOVED
+                self._length -= 1
+                return item
+
+
+class StreamBuffer(object):
+    """Queue of items waiting to be sent on a gRPC stream.
+
+    When batching, the consumer is only woken when the first item arrives
+    in an empty queue and when the queue holds a full batch. In between,
+    the consumer waits for up to the linger time for the batch to fill
+    before sending what it has, so a put does not normally cost a thread
+    switch.
+
+    Once the queue is full, the oldest item is dropped to make room for a
+    new one unless the drop policy is "priority", in which case the item
+    with the lowest priority is dropped.
+
+    """
+
+    def __init__(self, maxlen, batching=False, batch_size=100, linger=0.05, drop_policy="oldest"):
+        if drop_policy == "priority":
+            self._queue = PriorityShedQueue(maxlen)
+        else:
+            self._queue = collections.deque(maxlen=maxlen)
         self._notify = self.condition()
         self._shutdown = False
         self._seen = 0
-        self._dropped = 0
+        self._dropped = collections.defaultdict(int)
+        self.drop_policy = drop_policy
+        self.batching = batching
+        self.batch_size = max(batch_size, 1)
+        self.linger = linger
 
     @staticmethod
     def condition(*args, **kwargs):
@@ -41,30 +139,48 @@ class StreamBuffer(object):
             self._shutdown = True
             self._notify.notify_all()
 
-    def put(self, item):
+    def put(self, item, priority=None):
         with self._notify:
             if self._shutdown:
                 return
 
             self._seen += 1
 
-            # NOTE: dropped can be over-counted as the queue approaches
-            # capacity while data is still being transmitted.
-            #
-            # This is because the length of the queue can be changing as it's
-            # being measured.
-            if len(self._queue) >= self._queue.maxlen:
-                self._dropped += 1
+            if self.drop_policy == "priority":
+                if self._queue.append(item, priority):
+                    self._dropped["Priority"] += 1
+
+            else:
+                # NOTE: dropped can be over-counted as the queue approaches
+                # capacity while data is still being transmitted.
+                #
+                # This is because the length of the queue can be changing as
+                # it's being measured.
+                if len(self._queue) >= self._queue.maxlen:
+                    self._dropped["QueueFull"] += 1
+
+                self._queue.append(item)
+
+            if self.batching:
+                length = len(self._queue)
+                if length != 1 and length != self.batch_size:
+                    return
 
-            self._queue.append(item)
             self._notify.notify_all()
 
     def stats(self):
+        """Returns the number of items seen and sent since stats were last
+        taken, along with a dictionary of the number of items dropped
+        keyed by the reason they were dropped.
+
+        """
+
         with self._notify:
-            seen, dropped = self._seen, self._dropped
-            self._seen, self._dropped = 0, 0
+            seen, dropped = self._seen, dict(self._dropped)
+            self._seen = 0
+            self._dropped.clear()
 
-        return seen, dropped
+        return seen, seen - sum(dropped.values()), dropped
 
     def __iter__(self):
         return StreamBufferIterator(self)
@@ -76,6 +192,7 @@ class StreamBufferIterator(object):
         self._notify = self.stream_buffer._notify
         self._shutdown = False
         self._stream = None
+        self._deadline = None
 
     def shutdown(self):
         with self._notify:
@@ -100,6 +217,12 @@ class StreamBufferIterator(object):
                         self.shutdown()
                     raise StopIteration
 
+                if self.stream_buffer.batching:
+                    batch = self._next_batch()
+                    if batch is not None:
+                        return batch
+                    continue
+
                 try:
                     return self.stream_buffer._queue.popleft()
                 except IndexError:
@@ -110,6 +233,33 @@ class StreamBufferIterator(object):
 
     next = __next__
 
+    def _next_batch(self):
+        # Called with the condition held. Returns None after waiting, so
+        # the caller checks whether the stream was closed in the meantime.
+
+        queue = self.stream_buffer._queue
+        batch_size = self.stream_buffer.batch_size
+
+        if not queue:
+            self._deadline = None
+            self._notify.wait()
+            return None
+
+        if len(queue) < batch_size:
+            now = time.time()
+
+            if self._deadline is None:
+                self._deadline = now + self.stream_buffer.linger
+
+            if now < self._deadline:
+                self._notify.wait(self._deadline - now)
+                return None
+
+        self._deadline = None
+
+        count = min(batch_size, len(queue))
+        return SpanBatch(spans=[queue.popleft() for _ in range(count)])
+
     def __iter__(self):
         return self
 
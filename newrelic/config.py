@@ -43,6 +43,7 @@ import newrelic.console
 import newrelic.core.agent
 import newrelic.core.config
 import newrelic.core.trace_cache as trace_cache
+from newrelic.common.entry_points import iter_entry_points
 from newrelic.common.log_file import initialize_logging
 from newrelic.common.object_names import expand_builtin_exception_name
 from newrelic.core.config import (
@@ -341,10 +342,14 @@ def _process_configuration(section):
     _process_setting(section, "attributes.enabled", "getboolean", None)
     _process_setting(section, "attributes.exclude", "get", _map_inc_excl_attributes)
     _process_setting(section, "attributes.include", "get", _map_inc_excl_attributes)
+    _process_setting(section, "attributes.filter_cache_size", "getint", None)
     _process_setting(section, "transaction_name.naming_scheme", "get", None)
     _process_setting(section, "gc_runtime_metrics.enabled", "getboolean", None)
     _process_setting(section, "gc_runtime_metrics.top_object_count_limit", "getint", None)
+    _process_setting(section, "gc_runtime_metrics.top_object_sample_size", "getint", None)
     _process_setting(section, "thread_profiler.enabled", "getboolean", None)
+    _process_setting(section, "thread_profiler.mode", "get", None)
+    _process_setting(section, "thread_profiler.overhead_budget", "getfloat", None)
     _process_setting(section, "transaction_tracer.enabled", "getboolean", None)
     _process_setting(
         section,
@@ -455,6 +460,7 @@ def _process_configuration(section):
     _process_setting(section, "local_daemon.socket_path", "get", None)
     _process_setting(section, "local_daemon.synchronous_startup", "getboolean", None)
     _process_setting(section, "agent_limits.transaction_traces_nodes", "getint", None)
+    _process_setting(section, "agent_limits.segments_per_transaction", "getint", None)
     _process_setting(section, "agent_limits.sql_query_length_maximum", "getint", None)
     _process_setting(section, "agent_limits.slow_sql_stack_trace", "getint", None)
     _process_setting(section, "agent_limits.max_sql_connections", "getint", None)
@@ -470,6 +476,19 @@ def _process_configuration(section):
     _process_setting(section, "agent_limits.synthetics_transactions", "getint", None)
     _process_setting(section, "agent_limits.data_compression_threshold", "getint", None)
     _process_setting(section, "agent_limits.data_compression_level", "getint", None)
+    _process_setting(section, "stats_shards.enabled", "getboolean", None)
+    _process_setting(section, "compact_metric_table.enabled", "getboolean", None)
+    _process_setting(section, "streaming_payload_encoder.enabled", "getboolean", None)
+    _process_setting(section, "streaming_payload_encoder.chunk_size", "getint", None)
+    _process_setting(section, "payload_splitting.enabled", "getboolean", None)
+    _process_setting(section, "payload_splitting.max_concurrency", "getint", None)
+    _process_setting(section, "harvest_executor.max_workers", "getint", None)
+    _process_setting(section, "explain_plan_executor.max_workers", "getint", None)
+    _process_setting(section, "explain_plan_executor.cache_ttl", "getfloat", None)
+    _process_setting(section, "explain_plan_executor.wait_timeout", "getfloat", None)
+    _process_setting(section, "rules_engine.cache_size", "getint", None)
+    _process_setting(section, "sql_obfuscation.cache_size", "getint", None)
+    _process_setting(section, "trace_cache.backend", "get", None)
     _process_setting(section, "console.listener_socket", "get", _map_console_listener_socket)
     _process_setting(section, "console.allow_interpreter_cmd", "getboolean", None)
     _process_setting(section, "debug.disable_api_supportability_metrics", "getboolean", None)
@@ -531,6 +550,14 @@ def _process_configuration(section):
     _process_setting(section, "infinite_tracing.trace_observer_host", "get", None)
     _process_setting(section, "infinite_tracing.trace_observer_port", "getint", None)
     _process_setting(section, "infinite_tracing.span_queue_size", "getint", None)
+    _process_setting(section, "infinite_tracing.batching", "getboolean", None)
+    _process_setting(section, "infinite_tracing.batch_size", "getint", None)
+    _process_setting(section, "infinite_tracing.batch_linger", "getfloat", None)
+    _process_setting(section, "infinite_tracing.drop_policy", "get", None)
+    _process_setting(section, "infinite_tracing.compression", "get", None)
+    _process_setting(section, "infinite_tracing.keepalive_time", "getfloat", None)
+    _process_setting(section, "infinite_tracing.keepalive_timeout", "getfloat", None)
+    _process_setting(section, "infinite_tracing.window_size", "getint", None)
     _process_setting(section, "code_level_metrics.enabled", "getboolean", None)
 
     _process_setting(section, "application_logging.enabled", "getboolean", None)
@@ -1996,6 +2023,8 @@ GREENLET_HOOK = ("greenlet", "newrelic.core.trace_cache", "greenlet_loaded")
 
 
 def _process_trace_cache_import_hooks():
+    trace_cache.use_trace_cache_backend(_settings.trace_cache.backend)
+
     _process_module_definition(*GREENLET_HOOK)
 
     if GREENLET_HOOK not in _module_import_hook_results:
@@ -2917,14 +2946,9 @@ def _process_module_builtin_defaults():
 
 
 def _process_module_entry_points():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = "newrelic.hooks"
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         target = entrypoint.name
 
         if target in _module_import_hook_registry:
@@ -2977,14 +3001,9 @@ def _setup_instrumentation():
 
 
 def _setup_extensions():
-    try:
-        import pkg_resources
-    except ImportError:
-        return
-
     group = "newrelic.extension"
 
-    for entrypoint in pkg_resources.iter_entry_points(group=group):
+    for entrypoint in iter_entry_points(group):
         __import__(entrypoint.module_name)
         module = sys.modules[entrypoint.module_name]
         module.initialize()
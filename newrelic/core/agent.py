@@ -34,11 +34,17 @@ import newrelic.core.application
 import newrelic.core.config
 import newrelic.packages.six as six
 from newrelic.common.log_file import initialize_logging
+from newrelic.core.database_utils import explain_plan_executor
 from newrelic.core.thread_utilization import thread_utilization_data_source
 from newrelic.samplers.cpu_usage import cpu_usage_data_source
 from newrelic.samplers.gc_data import garbage_collector_data_source
 from newrelic.samplers.memory_usage import memory_usage_data_source
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 _logger = logging.getLogger(__name__)
 
 
@@ -82,6 +88,59 @@ def check_environment():
             )
 
 
+class HarvestExecutor(object):
+    """Pool of background threads used to harvest several applications
+    at the same time, so that a slow response from the data collector
+    for one application does not delay the harvest of the others. The
+    worker threads are only started when first needed and are then kept
+    for subsequent harvests.
+
+    """
+
+    def __init__(self, max_workers):
+        self._max_workers = max_workers
+        self._queue = queue.Queue()
+        self._threads = []
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            function, argument, completed = item
+            try:
+                function(argument)
+            except Exception:
+                _logger.exception("Unexpected exception in harvest executor.")
+            finally:
+                completed.release()
+
+    def map(self, function, arguments):
+        """Calls the function for each argument using the pool of worker
+        threads, only returning once all calls have completed.
+
+        """
+
+        arguments = list(arguments)
+
+        while len(self._threads) < min(self._max_workers, len(arguments)):
+            thread = threading.Thread(target=self._worker, name="NR-Harvest-Executor")
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+        completed = threading.Semaphore(0)
+        for argument in arguments:
+            self._queue.put((function, argument, completed))
+        for _ in arguments:
+            completed.acquire()
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+
 class Agent(object):
 
     """Only one instance of the agent should ever exist and that can be
@@ -218,6 +277,7 @@ class Agent(object):
         self._default_harvest_duration = 0.0
         self._flexible_harvest_duration = 0.0
         self._scheduler = sched.scheduler(self._harvest_timer, self._harvest_shutdown.wait)
+        self._harvest_executor = None
 
         self._process_shutdown = False
 
@@ -587,11 +647,7 @@ class Agent(object):
         self._flexible_harvest_count += 1
         self._last_flexible_harvest = time.time()
 
-        for application in list(six.itervalues(self._applications)):
-            try:
-                application.harvest(shutdown=False, flexible=True)
-            except Exception:
-                _logger.exception("Failed to harvest data for %s." % application.name)
+        self._harvest_applications(False, True, self._last_flexible_harvest)
 
         self._flexible_harvest_duration = time.time() - self._last_flexible_harvest
 
@@ -611,15 +667,50 @@ class Agent(object):
         self._default_harvest_count += 1
         self._last_default_harvest = time.time()
 
-        for application in list(six.itervalues(self._applications)):
+        self._harvest_applications(shutdown, False, self._last_default_harvest)
+
+        self._default_harvest_duration = time.time() - self._last_default_harvest
+
+        _logger.debug("Completed harvest[default] of application data in %.2f seconds.", self._default_harvest_duration)
+
+        if shutdown and self._harvest_executor:
+            self._harvest_executor.shutdown()
+            self._harvest_executor = None
+
+        if shutdown:
+            executor = explain_plan_executor()
+            if executor is not None:
+                executor.shutdown()
+
+    def _harvest_applications(self, shutdown, flexible, harvest_start):
+        applications = list(six.itervalues(self._applications))
+
+        def harvest(application):
+            start = time.time()
             try:
-                application.harvest(shutdown, flexible=False)
+                application.harvest(shutdown, flexible=flexible, harvest_start=harvest_start)
             except Exception:
                 _logger.exception("Failed to harvest data for %s." % application.name)
+            _logger.debug(
+                "Completed harvest[%s] of %r in %.2f seconds.",
+                "flexible" if flexible else "default",
+                application.name,
+                time.time() - start,
+            )
 
-        self._default_harvest_duration = time.time() - self._last_default_harvest
+        # Each application takes its snapshot of the data under its own
+        # locks at the start of its harvest, so the applications can be
+        # harvested independently of each other.
 
-        _logger.debug("Completed harvest[default] of application data in %.2f seconds.", self._default_harvest_duration)
+        max_workers = self._config.harvest_executor.max_workers
+
+        if max_workers > 1 and len(applications) > 1:
+            if self._harvest_executor is None:
+                self._harvest_executor = HarvestExecutor(max_workers)
+            self._harvest_executor.map(harvest, applications)
+        else:
+            for application in applications:
+                harvest(application)
 
     def _harvest_timer(self):
         if self._harvest_shutdown_is_set():
@@ -21,6 +21,7 @@ from newrelic.common.agent_http import ApplicationModeClient, ServerlessModeClie
 from newrelic.common.encoding_utils import (
     json_decode,
     json_encode,
+    json_encode_chunks,
     serverless_payload_encode,
 )
 from newrelic.common.utilization import (
@@ -43,6 +44,7 @@ from newrelic.network.exceptions import (
     ForceAgentDisconnect,
     ForceAgentRestart,
     NetworkInterfaceException,
+    PayloadTooLargeForRequest,
     RetryDataForRequest,
 )
 
@@ -63,7 +65,7 @@ class AgentProtocol(object):
         409: ForceAgentRestart,
         410: ForceAgentDisconnect,
         411: DiscardDataForRequest,
-        413: DiscardDataForRequest,
+        413: PayloadTooLargeForRequest,
         414: DiscardDataForRequest,
         415: DiscardDataForRequest,
         417: DiscardDataForRequest,
@@ -159,6 +161,16 @@ class AgentProtocol(object):
         else:
             audit_log_fp = None
 
+        # The parts of a split payload are sent concurrently, except when
+        # writing to the audit log, each needing its own connection.
+
+        payload_splitting = settings.payload_splitting
+
+        if payload_splitting.enabled and not audit_log_fp:
+            max_connections = max(payload_splitting.max_concurrency, 1)
+        else:
+            max_connections = 1
+
         self.client = client_cls(
             host=host or settings.host,
             port=settings.port or 443,
@@ -175,6 +187,7 @@ class AgentProtocol(object):
             compression_method=settings.compressed_content_encoding,
             max_payload_size_in_bytes=settings.max_payload_size_in_bytes,
             audit_log_fp=audit_log_fp,
+            max_connections=max_connections,
         )
 
         self._params = {
@@ -197,6 +210,11 @@ class AgentProtocol(object):
         self._headers["Content-Type"] = "application/json"
         self._run_token = settings.agent_run_id
 
+        if settings.streaming_payload_encoder.enabled and self.client.STREAMING_PAYLOADS:
+            self._payload_chunk_size = settings.streaming_payload_encoder.chunk_size
+        else:
+            self._payload_chunk_size = None
+
         # Logging
         self._proxy_host = settings.proxy_host
         self._proxy_port = settings.proxy_port
@@ -258,6 +276,8 @@ class AgentProtocol(object):
         params["method"] = method
         if self._run_token:
             params["run_id"] = self._run_token
+        if self._payload_chunk_size:
+            return params, self._headers, json_encode_chunks(payload, self._payload_chunk_size)
         return params, self._headers, json_encode(payload).encode("utf-8")
 
     @staticmethod
@@ -18,9 +18,9 @@ import threading
 try:
     import grpc
 
-    from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span
+    from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span, SpanBatch
 except Exception:
-    grpc, RecordStatus, Span = None, None, None
+    grpc, RecordStatus, Span, SpanBatch = None, None, None, None
 
 _logger = logging.getLogger(__name__)
 
@@ -30,10 +30,12 @@ class StreamingRpc(object):
 
     This class keeps a stream_stream RPC alive, retrying after a timeout when
     errors are encountered. If grpc.StatusCode.UNIMPLEMENTED is encountered, a
-    retry will not occur.
+    retry will not occur. When the stream buffer is batching, spans are sent
+    in batches using the RecordSpanBatch method.
     """
 
     PATH = "/com.newrelic.trace.v1.IngestService/RecordSpan"
+    BATCH_PATH = "/com.newrelic.trace.v1.IngestService/RecordSpanBatch"
     RETRY_POLICY = (
         (15, False),
         (15, False),
@@ -43,10 +45,24 @@ class StreamingRpc(object):
         (300, True),
     )
     OPTIONS = [("grpc.enable_retries", 0)]
-
-    def __init__(self, endpoint, stream_buffer, metadata, record_metric, ssl=True):
+    COMPRESSION = {"gzip": "Gzip", "deflate": "Deflate"}
+
+    def __init__(
+        self,
+        endpoint,
+        stream_buffer,
+        metadata,
+        record_metric,
+        ssl=True,
+        compression=None,
+        keepalive_time=None,
+        keepalive_timeout=None,
+        window_size=None,
+    ):
         self._endpoint = endpoint
         self._ssl = ssl
+        self._compression = self.channel_compression(compression)
+        self._options = self.channel_options(keepalive_time, keepalive_timeout, window_size)
         self.metadata = metadata
         self.stream_buffer = stream_buffer
         self.request_iterator = iter(stream_buffer)
@@ -60,14 +76,59 @@ class StreamingRpc(object):
 
         self.create_channel()
 
+    def channel_compression(self, compression):
+        if not compression:
+            return None
+
+        name = self.COMPRESSION.get(compression.lower())
+        if name is None:
+            _logger.warning(
+                "Unsupported infinite_tracing.compression %r. The span stream will not be compressed.", compression
+            )
+            return None
+
+        return getattr(grpc.Compression, name)
+
+    def channel_options(self, keepalive_time, keepalive_timeout, window_size):
+        options = list(self.OPTIONS)
+
+        # Keepalive times are configured in seconds, but given to gRPC in
+        # milliseconds.
+
+        if keepalive_time:
+            options.append(("grpc.keepalive_time_ms", int(keepalive_time * 1000)))
+        if keepalive_timeout:
+            options.append(("grpc.keepalive_timeout_ms", int(keepalive_timeout * 1000)))
+
+        # The bandwidth delay product probe resizes the flow control window
+        # as it sees fit, so is turned off when the window size is fixed.
+
+        if window_size:
+            options.append(("grpc.http2.lookahead_bytes", window_size))
+            options.append(("grpc.http2.bdp_probe", 0))
+
+        return options
+
     def create_channel(self):
+        # Compression is only passed when set, as older versions of gRPC do
+        # not accept the argument.
+
+        kwargs = {"options": self._options}
+        if self._compression is not None:
+            kwargs["compression"] = self._compression
+
         if self._ssl:
             credentials = grpc.ssl_channel_credentials()
-            self.channel = grpc.secure_channel(self._endpoint, credentials, options=self.OPTIONS)
+            self.channel = grpc.secure_channel(self._endpoint, credentials, **kwargs)
         else:
-            self.channel = grpc.insecure_channel(self._endpoint, options=self.OPTIONS)
+            self.channel = grpc.insecure_channel(self._endpoint, **kwargs)
 
-        self.rpc = self.channel.stream_stream(self.PATH, Span.SerializeToString, RecordStatus.FromString)
+        if self.stream_buffer.batching:
+            self.rpc = self.channel.stream_stream(
+                self.BATCH_PATH, SpanBatch.SerializeToString, RecordStatus.FromString
+            )
+        else:
+            self.rpc = self.channel.stream_stream(self.PATH, Span.SerializeToString, RecordStatus.FromString)
 
     def create_response_iterator(self):
         with self.stream_buffer._notify:
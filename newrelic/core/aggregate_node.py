@@ -0,0 +1,175 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Aggregation of sibling segments once the segment budget for a
+transaction has been exceeded.
+
+Transactions which run many thousands of the same call in a loop produce a
+node for every call, each of which has to be held until the transaction
+completes. Once a transaction has exceeded its segment budget, consecutive
+sibling nodes which would be reported against the same metric are instead
+collapsed into a single aggregate node. The aggregate node carries the call
+count along with the total, minimum and maximum durations of the nodes it
+stands in for, so the time metrics generated from it are the same as if
+each node had been kept.
+
+"""
+
+from newrelic.core.metric import AggregateTimeMetric
+
+
+class AggregateNode(object):
+
+    __slots__ = ('node', 'key', 'count', 'start_time', 'end_time',
+            'duration', 'exclusive', 'min_duration', 'max_duration',
+            'sum_of_squares')
+
+    # Only nodes without children are ever aggregated.
+
+    children = ()
+
+    def __init__(self, node, key):
+        self.node = node
+        self.key = key
+        self.count = 1
+        self.start_time = node.start_time
+        self.end_time = node.end_time
+        self.duration = node.duration
+        self.exclusive = node.exclusive
+        self.min_duration = node.duration
+        self.max_duration = node.duration
+        self.sum_of_squares = node.duration ** 2
+
+    @property
+    def name(self):
+        return self.node.name
+
+    @property
+    def guid(self):
+        return self.node.guid
+
+    @property
+    def span_guid(self):
+        return self.node.span_guid
+
+    def add(self, node):
+        duration = node.duration
+
+        self.count += 1
+        self.start_time = min(self.start_time, node.start_time)
+        self.end_time = max(self.end_time, node.end_time)
+        self.duration += duration
+        self.exclusive += node.exclusive
+        self.min_duration = min(self.min_duration, duration)
+        self.max_duration = max(self.max_duration, duration)
+        self.sum_of_squares += duration ** 2
+
+        return self
+
+    def time_metrics(self, stats, root, parent):
+        """Return a generator yielding the timed metrics for all the
+        nodes that have been aggregated. Each metric produced by the first
+        node is reported with the combined stats of all the nodes.
+
+        """
+
+        for metric in self.node.time_metrics(stats, root, parent):
+            if metric.exclusive is None:
+                exclusive = self.duration
+            else:
+                exclusive = self.exclusive
+
+            yield AggregateTimeMetric(name=metric.name, scope=metric.scope,
+                    call_count=self.count, total_call_time=self.duration,
+                    total_exclusive_call_time=exclusive,
+                    min_call_time=self.min_duration,
+                    max_call_time=self.max_duration,
+                    sum_of_squares=self.sum_of_squares)
+
+    def _representative(self):
+        # A copy of the first node spanning the times of all the nodes.
+        # Creating the copy bypasses any constructor of the derived node
+        # type, so attributes it sets on the instance are copied across.
+
+        node = self.node
+        clone = node._replace(start_time=self.start_time,
+                end_time=self.end_time, duration=self.duration,
+                exclusive=self.exclusive)
+        clone.__dict__.update(node.__dict__)
+        return clone
+
+    def trace_node(self, stats, root, connections):
+        trace_node = self._representative().trace_node(stats, root,
+                connections)
+
+        trace_node.params['aggregate_count'] = self.count
+        trace_node.params['aggregate_min_duration_millis'] = (
+                1000.0 * self.min_duration)
+        trace_node.params['aggregate_max_duration_millis'] = (
+                1000.0 * self.max_duration)
+
+        return trace_node
+
+    def span_event(self, *args, **kwargs):
+        attrs = self._representative().span_event(*args, **kwargs)
+        a_attrs = attrs[2]
+
+        # The span is reported with the guid of the first node, which
+        # the copy of the node may not yet have been given.
+
+        attrs[0]['guid'] = self.span_guid
+
+        a_attrs['aggregate.count'] = self.count
+        a_attrs['aggregate.minDuration'] = self.min_duration
+        a_attrs['aggregate.maxDuration'] = self.max_duration
+
+        return attrs
+
+
+def aggregate_child(children, node):
+    """Merges the node into the last of the sibling nodes if both would
+    be reported against the same metric. Returns whether the node was
+    merged, in which case it should not also be added to the children.
+
+    """
+
+    if not children or node.children:
+        return False
+
+    aggregate_key = getattr(node, 'aggregate_key', None)
+    key = aggregate_key and aggregate_key()
+
+    if key is None:
+        return False
+
+    previous = children[-1]
+
+    if type(previous) is AggregateNode:
+        if previous.key != key:
+            return False
+
+        previous.add(node)
+
+    else:
+        if previous.children:
+            return False
+
+        aggregate_key = getattr(previous, 'aggregate_key', None)
+
+        if not aggregate_key or aggregate_key() != key:
+            return False
+
+        children[-1] = AggregateNode(previous, key).add(node)
+
+    return True
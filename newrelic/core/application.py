@@ -25,14 +25,20 @@ import threading
 import time
 import traceback
 import warnings
+import weakref
 from functools import partial
 
 from newrelic.common.object_names import callable_name
 from newrelic.core.adaptive_sampler import AdaptiveSampler
+from newrelic.core.code_level_metrics import code_level_metrics_cache_stats
 from newrelic.core.config import global_settings
 from newrelic.core.custom_event import create_custom_event
 from newrelic.core.data_collector import create_session
-from newrelic.core.database_utils import SQLConnections
+from newrelic.core.database_utils import (
+    SQLConnections,
+    explain_plan_executor,
+    sql_statement_cache_stats,
+)
 from newrelic.core.environment import environment_settings
 from newrelic.core.internal_metrics import (
     InternalTrace,
@@ -56,6 +62,51 @@ from newrelic.samplers.data_sampler import DataSampler
 _logger = logging.getLogger(__name__)
 
 
+class StatsShard(object):
+
+    """Holds a long lived stats engine owned by a single thread. When
+    stats sharding is enabled transactions are recorded directly into the
+    shard for the thread they completed in, rather than into a workarea
+    which is then merged into the application stats engine under the
+    global stats lock. The shards are swapped out and merged into the
+    application stats engine when a harvest is performed.
+
+    """
+
+    def __init__(self, stats_engine):
+        # The lock is only ever contended by the harvest thread when it
+        # swaps out the stats engine for the shard.
+
+        self.lock = threading.Lock()
+        self.stats = stats_engine.create_workarea()
+        self.transaction_count = 0
+        self.last_transaction = 0.0
+        self.owner = weakref.ref(threading.current_thread())
+
+    @property
+    def active(self):
+        thread = self.owner()
+        return thread is not None and thread.is_alive()
+
+    def swap(self, stats_engine):
+        """Replaces the stats engine for the shard with a new empty one,
+        returning the old stats engine along with the count of, and end
+        time of the last, transactions recorded into it.
+
+        """
+
+        stats = stats_engine.create_workarea()
+
+        with self.lock:
+            result = (self.stats, self.transaction_count, self.last_transaction)
+
+            self.stats = stats
+            self.transaction_count = 0
+            self.last_transaction = 0.0
+
+        return result
+
+
 class Application(object):
 
     """Class which maintains recorded data for a single application."""
@@ -106,6 +157,9 @@ class Application(object):
         self._stats_custom_lock = threading.RLock()
         self._stats_custom_engine = StatsEngine()
 
+        self._stats_shards = []
+        self._stats_shards_local = threading.local()
+
         self._agent_commands_lock = threading.Lock()
         self._data_samplers_lock = threading.Lock()
         self._data_samplers_started = False
@@ -419,9 +473,11 @@ class Application(object):
                             configuration.transaction_name_rules,
                         )
 
-                    self._rules_engine["url"] = RulesEngine(configuration.url_rules)
-                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules)
-                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules)
+                    cache_size = configuration.rules_engine.cache_size
+
+                    self._rules_engine["url"] = RulesEngine(configuration.url_rules, cache_size)
+                    self._rules_engine["metric"] = RulesEngine(configuration.metric_name_rules, cache_size)
+                    self._rules_engine["transaction"] = RulesEngine(configuration.transaction_name_rules, cache_size)
                     self._rules_engine["segment"] = SegmentCollapseEngine(configuration.transaction_segment_terms)
 
                 except Exception:
@@ -498,6 +554,7 @@ class Application(object):
 
         with self._stats_lock:
             self._stats_engine.reset_stats(configuration, reset_stream=True)
+            self._stats_shards = []
 
             if configuration.serverless_mode.enabled:
                 sampling_target_period = 60.0
@@ -888,6 +945,9 @@ class Application(object):
 
         internal_metrics = CustomMetrics()
 
+        if settings.stats_shards.enabled:
+            return self._record_transaction_shard(data, settings, internal_metrics)
+
         with InternalTraceContext(internal_metrics):
             with InternalTrace("Supportability/Python/RecordTransaction/Calls/record"):
                 try:
@@ -938,6 +998,87 @@ class Application(object):
                     if settings.debug.record_transaction_failure:
                         raise
 
+    def _stats_shard(self, settings):
+        """Returns the stats shard for the current thread, creating it if
+        one doesn't yet exist or the existing one is for a prior agent run.
+
+        """
+
+        shard = getattr(self._stats_shards_local, "shard", None)
+
+        if shard is None or shard.stats.settings is not settings:
+            shard = StatsShard(self._stats_engine)
+
+            with self._stats_lock:
+                self._stats_shards.append(shard)
+
+            self._stats_shards_local.shard = shard
+
+        return shard
+
+    def _record_transaction_shard(self, data, settings, internal_metrics):
+        """Record a single transaction directly into the stats shard for
+        the current thread.
+
+        """
+
+        shard = self._stats_shard(settings)
+
+        with shard.lock:
+            with InternalTraceContext(internal_metrics):
+                with InternalTrace("Supportability/Python/RecordTransaction/Calls/record"):
+                    try:
+                        shard.stats.record_transaction(data)
+
+                    except Exception:
+                        _logger.exception(
+                            "The generation of transaction data has "
+                            "failed. This would indicate some sort of internal "
+                            "implementation issue with the agent. Please report "
+                            "this problem to New Relic support for further "
+                            "investigation."
+                        )
+
+                        if settings.debug.record_transaction_failure:
+                            raise
+
+            shard.transaction_count += 1
+            shard.last_transaction = data.end_time
+
+            shard.stats.merge_custom_metrics(internal_metrics.metrics())
+
+    def _merge_stats_shards(self):
+        """Swaps out the stats engine of each stats shard and merges the
+        data recorded into them into the application stats engine. Shards
+        for a prior agent run or whose thread has exited are discarded.
+        Must be called with the stats lock held.
+
+        """
+
+        settings = self._stats_engine.settings
+
+        shards = []
+
+        for shard in self._stats_shards:
+            # A shard created for a prior agent run is left untouched so
+            # that the thread which owns it will replace it.
+
+            if shard.stats.settings is not settings:
+                continue
+
+            stats, transaction_count, last_transaction = shard.swap(self._stats_engine)
+
+            if transaction_count:
+                self._transaction_count += transaction_count
+                self._last_transaction = max(self._last_transaction, last_transaction)
+
+                self._stats_engine.merge_shard(stats)
+
+            if shard.active:
+                shards.append(shard)
+
+        self._stats_shards = shards
+
     def cmd_start_profiler(self, command_id=0, **kwargs):
         """Triggered by the start_profiler agent command to start a
         thread profiling session.
@@ -1043,9 +1184,11 @@ class Application(object):
 
         return {command_id: {}}
 
-    def harvest(self, shutdown=False, flexible=False):
+    def harvest(self, shutdown=False, flexible=False, harvest_start=None):
         """Performs a harvest, reporting aggregated data for the current
-        reporting period to the data collector.
+        reporting period to the data collector. When harvest_start is
+        given, the delay between it and the start of the harvest for
+        this application is recorded.
 
         """
 
@@ -1071,6 +1214,11 @@ class Application(object):
 
                 start = time.time()
 
+                if harvest_start is not None:
+                    internal_metric(
+                        "Supportability/Python/Harvest/Delay/" + call_metric, max(start, harvest_start) - harvest_start
+                    )
+
                 # Create a snapshot of the transaction stats and
                 # application specific custom metrics stats, then merge
                 # them together. The originals will be reset at the time
@@ -1081,9 +1229,13 @@ class Application(object):
                 _logger.debug("Snapshotting for harvest[%s] of %r.", call_metric, self._app_name)
 
                 configuration = self._active_session.configuration
-                transaction_count = self._transaction_count
 
                 with self._stats_lock:
+                    if self._stats_shards:
+                        self._merge_stats_shards()
+
+                    transaction_count = self._transaction_count
+
                     self._transaction_count = 0
 
                     self._last_transaction = 0.0
@@ -1236,11 +1388,15 @@ class Application(object):
                             span_stream = stats.span_stream
                             # Only merge stats as part of default harvest
                             if span_stream and not flexible:
-                                spans_seen, spans_dropped = span_stream.stats()
-                                spans_sent = spans_seen - spans_dropped
+                                spans_seen, spans_sent, spans_dropped = span_stream.stats()
 
                                 internal_count_metric("Supportability/InfiniteTracing/Span/Seen", spans_seen)
                                 internal_count_metric("Supportability/InfiniteTracing/Span/Sent", spans_sent)
+
+                                for reason, count in spans_dropped.items():
+                                    internal_count_metric(
+                                        "Supportability/InfiniteTracing/Span/Dropped/%s" % reason, count
+                                    )
                         else:
                             spans = stats.span_events
                             if spans:
@@ -1371,6 +1527,39 @@ class Application(object):
                         else:
                             metric_normalizer = None
 
+                        for rule_type in ("url", "transaction", "metric"):
+                            hits, misses = self._rules_engine[rule_type].cache_stats()
+                            if hits or misses:
+                                internal_count_metric(
+                                    "Supportability/Python/RulesEngine/%s/Cache/Hits" % rule_type, hits
+                                )
+                                internal_count_metric(
+                                    "Supportability/Python/RulesEngine/%s/Cache/Misses" % rule_type, misses
+                                )
+
+                        if configuration.attribute_filter:
+                            _, _, evictions = configuration.attribute_filter.cache.stats()
+                            if evictions:
+                                internal_count_metric("Supportability/Python/AttributeFilter/Cache/Evictions", evictions)
+
+                        hits, misses, evictions = sql_statement_cache_stats()
+                        if hits or misses:
+                            internal_count_metric("Supportability/Python/SQLStatement/Cache/Hits", hits)
+                            internal_count_metric("Supportability/Python/SQLStatement/Cache/Misses", misses)
+                            internal_count_metric("Supportability/Python/SQLStatement/Cache/Evictions", evictions)
+
+                        hits, misses = code_level_metrics_cache_stats()
+                        if hits or misses:
+                            internal_count_metric("Supportability/Python/CodeLevelMetrics/Cache/Hits", hits)
+                            internal_count_metric("Supportability/Python/CodeLevelMetrics/Cache/Misses", misses)
+
+                        executor = explain_plan_executor()
+                        if executor is not None:
+                            hits, misses = executor.cache_stats()
+                            if hits or misses:
+                                internal_count_metric("Supportability/Python/ExplainPlan/Cache/Hits", hits)
+                                internal_count_metric("Supportability/Python/ExplainPlan/Cache/Misses", misses)
+
                         # Merge all ready internal metrics
                         stats.merge_custom_metrics(internal_metrics.metrics())
 
@@ -67,6 +67,8 @@ _TRANSACTION_EVENT_DEFAULT_ATTRIBUTES = set((
         'db.instance',
         'db.operation',
         'db.statement',
+        'db.operation.batch.size',
+        'redis.pipeline.commands',
         'error.class',
         'error.message',
         'error.expected',
@@ -114,6 +116,31 @@ class Attribute(_Attribute):
                 self.name, self.value, bin(self.destinations))
 
 
+class AttributeDestinationCache(object):
+    """Wraps an attribute filter, remembering the destinations of each
+    attribute name passed through it. The nodes of a transaction mostly
+    carry attributes with the same names, so sharing one of these across
+    all the nodes of a transaction means each name only goes through the
+    attribute filter once. It can be passed anywhere an attribute filter
+    is expected when resolving attributes.
+
+    """
+
+    def __init__(self, attribute_filter):
+        self.attribute_filter = attribute_filter
+        self._destinations = {}
+
+    def apply(self, name, default_destinations):
+        key = (name, default_destinations)
+
+        try:
+            return self._destinations[key]
+        except KeyError:
+            destinations = self.attribute_filter.apply(name, default_destinations)
+            self._destinations[key] = destinations
+            return destinations
+
+
 def create_attributes(attr_dict, destinations, attribute_filter):
     attributes = []
 
@@ -227,6 +254,29 @@ def check_max_int(value, max_int=MAX_64_BIT_INT):
         raise IntTooLargeException()
 
 
+# Whether a str is made up only of ASCII characters, in which case its
+# length is the same as that of its UTF-8 encoding. On Python 2 a str is
+# already a byte string.
+
+if six.PY2:
+    def _is_ascii(text):
+        return True
+else:
+    _is_ascii = getattr(str, 'isascii', lambda text: False)
+
+
+def _fits_length(text, max_length):
+
+    # Returns whether a str is certainly no longer than max_length bytes
+    # once encoded, without encoding it. No character takes more than 4
+    # bytes in UTF-8. False means the text needs to be truncated as usual
+    # to find out.
+
+    length = len(text)
+    return length * 4 <= max_length or (
+            length <= max_length and _is_ascii(text))
+
+
 def process_user_attribute(
         name, value, max_length=MAX_ATTRIBUTE_LENGTH, ending=None):
 
@@ -239,6 +289,22 @@ def process_user_attribute(
     # If any of these checks fail, they will raise an exception, so we
     # log a message, and return (None, None).
 
+    # Most attributes have a str name and a value of one of the scalar
+    # types which is short enough to need no truncation. Those are
+    # returned as is, without going through each of the checks. The type
+    # checks are exact, so subclasses are always fully checked.
+
+    if type(name) is str and _fits_length(name, MAX_ATTRIBUTE_LENGTH):
+        value_type = type(value)
+
+        if value_type is str:
+            if _fits_length(value, max_length):
+                return (name, value)
+        elif value_type is bool or value_type is float:
+            return (name, value)
+        elif value_type is int and value <= MAX_64_BIT_INT:
+            return (name, value)
+
     FAILED_RESULT = (None, None)
 
     try:
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from newrelic.common.lru_cache import LRUCache
+
 # Attribute "destinations" represented as bitfields.
 
 DST_NONE = 0x0
@@ -57,12 +59,22 @@ class AttributeFilter(object):
     #      the bitfield.
     #
     #   4. Return the resulting bitfield after all rules have been applied.
+    #
+    # As every rule either adds or removes destinations, the effect of a
+    # sequence of rules can be represented as a single pair of masks,
+    # (keep, add), applied as (destinations & keep) | add. The rules are
+    # compiled into a prefix trie keyed on rule name, where each node holds
+    # the masks for all wildcard rules matching any name with that prefix,
+    # and for those plus the exact rules for that name. Applying the rules
+    # to a name is then a walk of the trie along the characters of the
+    # name, stopping as soon as no rule name shares the prefix.
 
     def __init__(self, flattened_settings):
 
         self.enabled_destinations = self._set_enabled_destinations(flattened_settings)
         self.rules = self._build_rules(flattened_settings)
-        self.cache = {}
+        self.trie = self._build_trie(self.rules)
+        self.cache = LRUCache(flattened_settings.get('attributes.filter_cache_size') or 1024)
 
     def __repr__(self):
         return "<AttributeFilter: destinations: %s, rules: %s>" % (
@@ -135,28 +147,87 @@ class AttributeFilter(object):
 
         return tuple(rules)
 
+    def _build_trie(self, rules):
+
+        # Rules are added to the trie in sorted order, so the rules held at
+        # each node are already in the order in which they must be applied.
+        # Rules matching a name are always for prefixes of that name and
+        # shorter names sort first, so the masks for a node are those of
+        # its parent, followed by its own wildcard rules and then its exact
+        # rules.
+
+        root = AttributeFilterTrieNode()
+
+        for rule in rules:
+            node = root
+            for char in rule.name:
+                node = node.children.setdefault(char, AttributeFilterTrieNode())
+            if rule.is_wildcard:
+                node.wildcard_rules.append(rule)
+            else:
+                node.exact_rules.append(rule)
+
+        stack = [(root, (DST_ALL, DST_NONE))]
+
+        while stack:
+            node, masks = stack.pop()
+            node.wildcard_masks = masks = self._apply_rules(masks, node.wildcard_rules)
+            node.exact_masks = self._apply_rules(masks, node.exact_rules)
+            stack.extend((child, masks) for child in node.children.values())
+
+        return root
+
+    def _apply_rules(self, masks, rules):
+        keep, add = masks
+
+        for rule in rules:
+            if rule.is_include:
+                add |= rule.destinations & self.enabled_destinations
+            else:
+                keep &= ~rule.destinations
+                add &= ~rule.destinations
+
+        return keep, add
+
     def apply(self, name, default_destinations):
         if self.enabled_destinations == DST_NONE:
             return DST_NONE
 
         cache_index = (name, default_destinations)
 
-        if cache_index in self.cache:
-            return self.cache[cache_index]
+        destinations = self.cache.get(cache_index)
+        if destinations is not None:
+            return destinations
+
+        node = self.trie
+        masks = node.wildcard_masks
 
-        destinations = self.enabled_destinations & default_destinations
+        for char in name:
+            node = node.children.get(char)
+            if node is None:
+                break
+            masks = node.wildcard_masks
+        else:
+            masks = node.exact_masks
 
-        for rule in self.rules:
-            if rule.name_match(name):
-                if rule.is_include:
-                    inc_dest = rule.destinations & self.enabled_destinations
-                    destinations |= inc_dest
-                else:
-                    destinations &= ~rule.destinations
+        keep, add = masks
+        destinations = (self.enabled_destinations & default_destinations & keep) | add
 
-        self.cache[cache_index] = destinations
+        self.cache.set(cache_index, destinations)
         return destinations
 
+class AttributeFilterTrieNode(object):
+
+    __slots__ = ('children', 'wildcard_rules', 'exact_rules',
+            'wildcard_masks', 'exact_masks')
+
+    def __init__(self):
+        self.children = {}
+        self.wildcard_rules = []
+        self.exact_rules = []
+        self.wildcard_masks = None
+        self.exact_masks = None
+
 class AttributeFilterRule(object):
 
     def __init__(self, name, destinations, is_include):
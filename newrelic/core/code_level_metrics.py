@@ -14,6 +14,7 @@
 
 import functools
 import inspect
+import weakref
 from collections import namedtuple
 
 from newrelic.common.object_names import object_context
@@ -37,12 +38,66 @@ class CodeLevelMetricsNode(_CodeLevelMetricsNode):
                 add_attr_function("code.%s" % k, v)
 
 
+# Code level metrics for callables which the node can't be stored on as an
+# attribute, or which are created as they are needed, such as partials and
+# methods of builtin types. The node is cached against the underlying
+# function, or for methods of builtin types against the type and then the
+# method name. Callables which can't be weakly referenced are not cached.
+
+_source_code_cache = weakref.WeakKeyDictionary()
+
+# Counts of hits and misses. These are updated without a lock, as they are
+# only used for supportability metrics and may be slightly out under
+# contention. They are held in a list rather than as module globals because
+# assigning to a global is slow, as it invalidates cached global lookups.
+
+_source_code_cache_stats = [0, 0]
+
+
+def _source_code_cache_key(func):
+    owner = getattr(func, "__self__", None)
+
+    if owner is not None and inspect.isbuiltin(func) and not inspect.ismodule(owner):
+        if not inspect.isclass(owner):
+            owner = type(owner)
+        return owner, func.__name__
+
+    while isinstance(func, functools.partial):
+        func = func.func
+
+    return getattr(func, "__func__", func), None
+
+
+def code_level_metrics_cache_stats():
+    """Returns the hits and misses when looking up the code level metrics
+    of callables since this was last called.
+
+    """
+
+    stats = _source_code_cache_stats
+    result = tuple(stats)
+    stats[:] = [0, 0]
+    return result
+
+
 def extract_code_from_callable(func):
     """Extract source code context from a callable and add appropriate attributes."""
     original_func = func  # Save original reference
 
-    if hasattr(func, "_nr_source_code"):
-        return func._nr_source_code
+    node = getattr(func, "_nr_source_code", None)
+
+    if node is None:
+        key, name = _source_code_cache_key(func)
+        try:
+            node = _source_code_cache[key][name]
+        except (KeyError, TypeError):
+            pass
+
+    if node is not None:
+        _source_code_cache_stats[0] += 1
+        return node
+
+    _source_code_cache_stats[1] += 1
 
     # Fully unwrap object
     while (hasattr(func, "__wrapped__") and func.__wrapped__ is not None) or isinstance(func, functools.partial):
@@ -113,8 +168,18 @@ def extract_code_from_callable(func):
             # Must store on underlying function not bound method
             original_func = original_func.__func__
         original_func._nr_source_code = node
+        stored = key is original_func
     except Exception:  # Don't raise exceptions for any reason
-        pass
+        stored = False
+
+    # Also cache the node where it will be found for callables which are
+    # created as they are needed, or which it could not be stored on.
+
+    if not stored:
+        try:
+            _source_code_cache.setdefault(key, {})[name] = node
+        except TypeError:
+            pass
 
     return node
 
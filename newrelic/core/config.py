@@ -172,6 +172,42 @@ class AgentLimitsSettings(Settings):
     pass
 
 
+class StatsShardsSettings(Settings):
+    pass
+
+
+class CompactMetricTableSettings(Settings):
+    pass
+
+
+class StreamingPayloadEncoderSettings(Settings):
+    pass
+
+
+class PayloadSplittingSettings(Settings):
+    pass
+
+
+class HarvestExecutorSettings(Settings):
+    pass
+
+
+class ExplainPlanExecutorSettings(Settings):
+    pass
+
+
+class RulesEngineSettings(Settings):
+    pass
+
+
+class SqlObfuscationSettings(Settings):
+    pass
+
+
+class TraceCacheSettings(Settings):
+    pass
+
+
 class ConsoleSettings(Settings):
     pass
 
@@ -374,6 +410,15 @@ _settings.event_loop_visibility = EventLoopVisibilitySettings()
 _settings.rum = RumSettings()
 _settings.slow_sql = SlowSqlSettings()
 _settings.agent_limits = AgentLimitsSettings()
+_settings.stats_shards = StatsShardsSettings()
+_settings.compact_metric_table = CompactMetricTableSettings()
+_settings.streaming_payload_encoder = StreamingPayloadEncoderSettings()
+_settings.payload_splitting = PayloadSplittingSettings()
+_settings.harvest_executor = HarvestExecutorSettings()
+_settings.explain_plan_executor = ExplainPlanExecutorSettings()
+_settings.rules_engine = RulesEngineSettings()
+_settings.sql_obfuscation = SqlObfuscationSettings()
+_settings.trace_cache = TraceCacheSettings()
 _settings.console = ConsoleSettings()
 _settings.debug = DebugSettings()
 _settings.cross_application_tracer = CrossApplicationTracerSettings()
@@ -643,12 +688,16 @@ _settings.max_payload_size_in_bytes = 1000000
 _settings.attributes.enabled = True
 _settings.attributes.exclude = []
 _settings.attributes.include = []
+_settings.attributes.filter_cache_size = 1024
 
 _settings.thread_profiler.enabled = True
+_settings.thread_profiler.mode = "call_tree"
+_settings.thread_profiler.overhead_budget = 0.05
 _settings.cross_application_tracer.enabled = False
 
 _settings.gc_runtime_metrics.enabled = False
 _settings.gc_runtime_metrics.top_object_count_limit = 5
+_settings.gc_runtime_metrics.top_object_sample_size = 10000
 
 _settings.transaction_events.enabled = True
 _settings.transaction_events.attributes.enabled = True
@@ -712,6 +761,7 @@ _settings.synthetics.enabled = True
 
 _settings.agent_limits.data_collector_timeout = 30.0
 _settings.agent_limits.transaction_traces_nodes = 2000
+_settings.agent_limits.segments_per_transaction = 2000
 _settings.agent_limits.sql_query_length_maximum = 16384
 _settings.agent_limits.slow_sql_stack_trace = 30
 _settings.agent_limits.max_sql_connections = 4
@@ -728,10 +778,40 @@ _settings.agent_limits.synthetics_transactions = 20
 _settings.agent_limits.data_compression_threshold = 64 * 1024
 _settings.agent_limits.data_compression_level = None
 
+_settings.stats_shards.enabled = False
+
+_settings.compact_metric_table.enabled = False
+
+_settings.streaming_payload_encoder.enabled = False
+_settings.streaming_payload_encoder.chunk_size = 64 * 1024
+
+_settings.payload_splitting.enabled = True
+_settings.payload_splitting.max_concurrency = 4
+
+_settings.harvest_executor.max_workers = 1
+
+_settings.explain_plan_executor.max_workers = 2
+_settings.explain_plan_executor.cache_ttl = 300.0
+_settings.explain_plan_executor.wait_timeout = 1.0
+
+_settings.rules_engine.cache_size = 1024
+
+_settings.sql_obfuscation.cache_size = 1024
+
+_settings.trace_cache.backend = os.environ.get("NEW_RELIC_TRACE_CACHE_BACKEND", "thread")
+
 _settings.infinite_tracing.trace_observer_host = os.environ.get("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_HOST", None)
 _settings.infinite_tracing.trace_observer_port = _environ_as_int("NEW_RELIC_INFINITE_TRACING_TRACE_OBSERVER_PORT", 443)
 _settings.infinite_tracing.ssl = True
 _settings.infinite_tracing.span_queue_size = _environ_as_int("NEW_RELIC_INFINITE_TRACING_SPAN_QUEUE_SIZE", 10000)
+_settings.infinite_tracing.batching = _environ_as_bool("NEW_RELIC_INFINITE_TRACING_BATCHING", False)
+_settings.infinite_tracing.batch_size = _environ_as_int("NEW_RELIC_INFINITE_TRACING_BATCH_SIZE", 100)
+_settings.infinite_tracing.batch_linger = 0.05
+_settings.infinite_tracing.drop_policy = "oldest"
+_settings.infinite_tracing.compression = None
+_settings.infinite_tracing.keepalive_time = None
+_settings.infinite_tracing.keepalive_timeout = None
+_settings.infinite_tracing.window_size = None
 
 _settings.event_harvest_config.harvest_limits.analytic_event_data = _environ_as_int(
     "NEW_RELIC_ANALYTICS_EVENTS_MAX_SAMPLES_STORED", DEFAULT_RESERVOIR_SIZE
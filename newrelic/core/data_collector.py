@@ -18,7 +18,9 @@
 
 from __future__ import print_function
 
+import collections
 import logging
+import threading
 
 from newrelic.common.agent_http import (
     ApplicationModeClient,
@@ -28,10 +30,44 @@ from newrelic.common.agent_http import (
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.core.config import global_settings
+from newrelic.core.internal_metrics import (
+    InternalTraceContext,
+    current_internal_metrics,
+    internal_count_metric,
+)
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentDisconnect,
+    ForceAgentRestart,
+    PayloadTooLargeForRequest,
+)
 
 _logger = logging.getLogger(__name__)
 
 
+def _split_sampling_info(sampling_info, parts, total):
+    # The events seen and reservoir size are shared out between the
+    # parts of a split payload in proportion to the number of samples
+    # in each, such that they still sum to the original values.
+
+    if not sampling_info:
+        return [sampling_info] * len(parts)
+
+    result = []
+    remaining = dict(sampling_info)
+    for index, part in enumerate(parts):
+        if index == len(parts) - 1:
+            result.append(remaining)
+            break
+        info = {}
+        for key, value in sampling_info.items():
+            info[key] = value * len(part) // total
+            remaining[key] -= info[key]
+        result.append(info)
+    return result
+
+
 class Session(object):
     PROTOCOL = AgentProtocol
     CLIENT = ApplicationModeClient
@@ -42,6 +78,11 @@ class Session(object):
         )
         self._rpc = None
 
+        # Largest number of samples known to fit within the maximum
+        # payload size, learned from previous 413 responses.
+        self._max_samples = {}
+        self._max_samples_lock = threading.Lock()
+
     @property
     def configuration(self):
         return self._protocol.configuration
@@ -55,12 +96,13 @@ class Session(object):
 
     def connect_span_stream(self, span_iterator, record_metric):
         if not self._rpc:
-            host = self.configuration.infinite_tracing.trace_observer_host
+            infinite_tracing = self.configuration.infinite_tracing
+            host = infinite_tracing.trace_observer_host
             if not host:
                 return
 
-            port = self.configuration.infinite_tracing.trace_observer_port
-            ssl = self.configuration.infinite_tracing.ssl
+            port = infinite_tracing.trace_observer_port
+            ssl = infinite_tracing.ssl
             endpoint = "{}:{}".format(host, port)
 
             if (
@@ -75,7 +117,15 @@ class Session(object):
                 )
 
                 rpc = self._rpc = StreamingRpc(
-                    endpoint, span_iterator, metadata, record_metric, ssl=ssl
+                    endpoint,
+                    span_iterator,
+                    metadata,
+                    record_metric,
+                    ssl=ssl,
+                    compression=infinite_tracing.compression,
+                    keepalive_time=infinite_tracing.keepalive_time,
+                    keepalive_timeout=infinite_tracing.keepalive_timeout,
+                    window_size=infinite_tracing.window_size,
                 )
                 rpc.connect()
                 return rpc
@@ -100,23 +150,173 @@ class Session(object):
         payload = (self.agent_run_id, transaction_traces)
         return self._protocol.send("transaction_sample_data", payload)
 
+    def _event_payload(self, sampling_info, samples):
+        return (self.agent_run_id, sampling_info, samples)
+
+    @staticmethod
+    def _log_event_payload(sampling_info, samples):
+        return ({"logs": tuple(log._asdict() for log in samples)},)
+
+    def _send_samples(self, method, sampling_info, samples, build_payload):
+        """Sends a set of samples, splitting them across several
+        requests if they are known not to fit within the maximum payload
+        size, or if the request is rejected as being too large.
+
+        """
+
+        settings = self.configuration.payload_splitting
+        if not settings.enabled:
+            return self._protocol.send(method, build_payload(sampling_info, samples))
+
+        samples = list(samples)
+        max_samples = self._max_samples.get(method)
+
+        if max_samples and len(samples) > max_samples:
+            parts = [samples[i : i + max_samples] for i in range(0, len(samples), max_samples)]
+            internal_count_metric("Supportability/Python/Collector/PayloadSplit/%s" % method, len(parts))
+
+        else:
+            try:
+                return self._protocol.send(method, build_payload(sampling_info, samples))
+            except PayloadTooLargeForRequest:
+                if len(samples) < 2:
+                    raise
+
+            parts = self._bisect_samples(method, samples)
+
+        return self._send_parts(method, sampling_info, samples, parts, build_payload)
+
+    def _bisect_samples(self, method, samples):
+        # Bisect the samples, remembering the smaller size so later
+        # harvests are split before being sent.
+
+        half = len(samples) // 2
+        with self._max_samples_lock:
+            max_samples = self._max_samples.get(method)
+            if not max_samples or half < max_samples:
+                self._max_samples[method] = half
+
+        internal_count_metric("Supportability/Python/Collector/PayloadSplit/%s" % method, 2)
+
+        return [samples[:half], samples[half:]]
+
+    def _send_parts(self, method, sampling_info, samples, parts, build_payload):
+        # Any part which is still too large is bisected in turn, with the
+        # halves queued up to be sent along with the remaining parts. The
+        # results are keyed so they can be put back in the order of the
+        # samples they hold.
+
+        infos = _split_sampling_info(sampling_info, parts, len(samples))
+        pending = collections.deque(((index,), info, part) for index, (info, part) in enumerate(zip(infos, parts)))
+        results = {}
+
+        def send(key, info, part):
+            try:
+                results[key] = (self._protocol.send(method, build_payload(info, part)), None)
+            except PayloadTooLargeForRequest as exc:
+                if len(part) < 2:
+                    results[key] = (None, exc)
+                    return ()
+                halves = self._bisect_samples(method, part)
+                infos = _split_sampling_info(info, halves, len(part))
+                return [(key + (index,), info, half) for index, (info, half) in enumerate(zip(infos, halves))]
+            except Exception as exc:
+                results[key] = (None, exc)
+            return ()
+
+        # The audit log is not safe to write to from multiple threads,
+        # so the parts are sent one after the other when it is enabled.
+
+        max_workers = self.configuration.payload_splitting.max_concurrency
+        if self.configuration.audit_log_file or max_workers < 2:
+            while pending:
+                pending.extend(send(*pending.popleft()))
+        else:
+            self._send_parallel(pending, send, max_workers)
+
+        results = [results[key] for key in sorted(results)]
+
+        # Parts which were sent cannot be retried without duplicating
+        # data, so if only some parts failed the remainder is dropped.
+
+        errors = [exc for _, exc in results if exc is not None]
+        for exc in errors:
+            if isinstance(exc, (ForceAgentRestart, ForceAgentDisconnect)):
+                raise exc
+        if errors:
+            if len(errors) == len(results):
+                raise errors[0]
+            _logger.warning(
+                "Only %d of %d parts of a split %r payload could be sent. The "
+                "remaining data will be discarded.",
+                len(results) - len(errors),
+                len(results),
+                method,
+            )
+            raise DiscardDataForRequest(errors[0])
+
+        return results[0][0]
+
+    def _send_parallel(self, pending, send, max_workers):
+        # A fixed number of workers take the parts from the queue, so the
+        # halves of a bisected part do not add to the number of requests
+        # in flight. An idle worker only exits once no other worker is
+        # still sending, as that part may yet be bisected. Each worker
+        # records its internal metrics separately, which are merged once
+        # all the workers are done.
+
+        condition = threading.Condition()
+        sending = [0]
+
+        def worker(metrics):
+            with InternalTraceContext(metrics):
+                while True:
+                    with condition:
+                        while not pending and sending[0]:
+                            condition.wait()
+                        if not pending:
+                            return
+                        call = pending.popleft()
+                        sending[0] += 1
+                    calls = ()
+                    try:
+                        calls = send(*call)
+                    finally:
+                        with condition:
+                            pending.extend(calls)
+                            sending[0] -= 1
+                            condition.notify_all()
+
+        worker_metrics = [CustomMetrics() for _ in range(max_workers)]
+
+        threads = [
+            threading.Thread(target=worker, args=(metrics,), name="NR-Payload-Sender") for metrics in worker_metrics
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        metrics = current_internal_metrics()
+        if metrics is not None:
+            for other in worker_metrics:
+                metrics.merge_metrics(other.metrics())
+
     def send_transaction_events(self, sampling_info, sample_set):
         """Called to submit sample set for analytics."""
 
-        payload = (self.agent_run_id, sampling_info, sample_set)
-        return self._protocol.send("analytic_event_data", payload)
+        return self._send_samples("analytic_event_data", sampling_info, sample_set, self._event_payload)
 
     def send_custom_events(self, sampling_info, custom_event_data):
         """Called to submit sample set for custom events."""
 
-        payload = (self.agent_run_id, sampling_info, custom_event_data)
-        return self._protocol.send("custom_event_data", payload)
+        return self._send_samples("custom_event_data", sampling_info, custom_event_data, self._event_payload)
 
     def send_span_events(self, sampling_info, span_event_data):
         """Called to submit sample set for span events."""
 
-        payload = (self.agent_run_id, sampling_info, span_event_data)
-        return self._protocol.send("span_event_data", payload)
+        return self._send_samples("span_event_data", sampling_info, span_event_data, self._event_payload)
 
     def send_metric_data(self, start_time, end_time, metric_data):
         """Called to submit metric data for specified period of time.
@@ -131,8 +331,7 @@ class Session(object):
     def send_log_events(self, sampling_info, log_event_data):
         """Called to submit sample set for log events."""
 
-        payload = ({"logs": tuple(log._asdict() for log in log_event_data)},)
-        return self._protocol.send("log_event_data", payload)
+        return self._send_samples("log_event_data", sampling_info, log_event_data, self._log_event_payload)
 
     def get_agent_commands(self):
         """Receive agent commands from the data collector.
@@ -157,8 +356,7 @@ class Session(object):
     def send_error_events(self, sampling_info, error_data):
         """Called to submit sample set for error events."""
 
-        payload = (self.agent_run_id, sampling_info, error_data)
-        return self._protocol.send("error_event_data", payload)
+        return self._send_samples("error_event_data", sampling_info, error_data, self._event_payload)
 
     def send_sql_traces(self, sql_traces):
         """Called to sub SQL traces. The SQL traces should be an
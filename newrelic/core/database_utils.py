@@ -18,14 +18,23 @@ explain plans for SQL etc.
 """
 
 import logging
+import os
 import re
+import threading
+import time
 import weakref
 
 import newrelic.packages.six as six
 
+from newrelic.common.lru_cache import LRUCache
 from newrelic.core.internal_metrics import internal_metric
 from newrelic.core.config import global_settings
 
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 _logger = logging.getLogger(__name__)
 
 # Obfuscation of SQL is done when reporting SQL statements back to the
@@ -49,11 +58,6 @@ _any_quotes_p = _single_quotes_p + '|' + _double_quotes_p
 _single_dollar_p = _single_quotes_p + '|' + _dollar_quotes_p
 _single_oracle_p = _single_quotes_p + '|' + _oracle_quotes_p
 
-_single_quotes_re = re.compile(_single_quotes_p)
-_any_quotes_re = re.compile(_any_quotes_p)
-_single_dollar_re = re.compile(_single_dollar_p)
-_single_oracle_re = re.compile(_single_oracle_p)
-
 # Cleanup regexes. Presence of a quote will indicate that the now obfuscated
 # sql was actually malformed.
 
@@ -77,37 +81,58 @@ _single_dollar_cleanup_re = re.compile(_single_dollar_cleanup_p)
 # follows on from a ':'. This is because ':1' can be used as positional
 # parameter with database adapters where 'paramstyle' is 'numeric'.
 
-_uuid_p = r'\{?(?:[0-9a-f]\-?){32}\}?'
-_int_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+(e[+-]?[0-9]+)?'
-_hex_p = r'0x[0-9a-f]+'
-_bool_p = r'\b(?:true|false|null)\b'
+_uuid_p = r'\{?(?:[0-9a-fA-F]\-?){32}\}?'
+_int_p = r'(?<!:)-?\b(?:[0-9]+\.)?[0-9]+([eE][+-]?[0-9]+)?'
+_hex_p = r'0[xX][0-9a-fA-F]+'
+_bool_p = (r'\b(?:[tT][rR][uU][eE]|[fF][aA][lL][sS][eE]|[nN][uU][lL][lL])'
+        r'%s')
 
-# Join all literals into one compiled regular expression. Longest expressions
-# first to avoid the situation of partial matches on shorter expressions. UUIDs
-# might be an example.
+# Join all literals into one regular expression. Longest expressions
+# first to avoid the situation of partial matches on shorter expressions.
+# UUIDs might be an example. Case is spelt out in the patterns rather
+# than using IGNORECASE, as these are combined with the patterns for
+# quoted strings below and the 'q' prefix of Oracle quoted strings is
+# case sensitive.
 
 _all_literals_p = '(' + ')|('.join([_uuid_p, _hex_p, _int_p, _bool_p]) + ')'
-_all_literals_re = re.compile(_all_literals_p, re.IGNORECASE)
+
+# Quoted strings and literals are replaced in a single pass over the SQL
+# using one regular expression per quoting style. The pattern for quoted
+# strings must come first, so that literals within strings are consumed
+# as part of the string, and so that the back reference for dollar
+# quoting refers to the correct group. As the 'q' prefix of an Oracle
+# quoted string is a word character, a boolean literal immediately
+# followed by an Oracle quoted string also needs to be allowed for in
+# place of the trailing word boundary, as the quoted string is replaced
+# by a '?' regardless.
+
+_oracle_bool_boundary_p = r"(?:\b|(?=q'[\[{<(]))"
+
+
+def _obfuscate_sql_re(quotes_p, bool_boundary_p=r'\b'):
+    literals_p = _all_literals_p % bool_boundary_p
+    return re.compile(quotes_p + '|' + literals_p)
+
 
 _quotes_table = {
-    'single': (_single_quotes_re, _single_quotes_cleanup_re),
-    'single+double': (_any_quotes_re, _any_quotes_cleanup_re),
-    'single+dollar': (_single_dollar_re, _single_dollar_cleanup_re),
-    'single+oracle': (_single_oracle_re, _single_quotes_cleanup_re),
+    'single': (_obfuscate_sql_re(_single_quotes_p),
+            _single_quotes_cleanup_re),
+    'single+double': (_obfuscate_sql_re(_any_quotes_p),
+            _any_quotes_cleanup_re),
+    'single+dollar': (_obfuscate_sql_re(_single_dollar_p),
+            _single_dollar_cleanup_re),
+    'single+oracle': (_obfuscate_sql_re(_single_oracle_p,
+            _oracle_bool_boundary_p), _single_quotes_cleanup_re),
 }
 
 
 def _obfuscate_sql(sql, database):
-    quotes_re, quotes_cleanup_re = _quotes_table.get(database.quoting_style,
-            (_single_quotes_re, _single_quotes_cleanup_re))
-
-    # Substitute quoted strings first.
-
-    sql = quotes_re.sub('?', sql)
+    obfuscate_re, quotes_cleanup_re = _quotes_table.get(
+            database.quoting_style, _quotes_table['single'])
 
-    # Replace all other sensitive fields
+    # Substitute quoted strings and all other sensitive fields.
 
-    sql = _all_literals_re.sub('?', sql)
+    sql = obfuscate_re.sub('?', sql)
 
     # Determine if the obfuscated query was malformed by searching for
     # remaining quote characters
@@ -765,6 +790,195 @@ def explain_plan(connections, sql_statement, connect_params, cursor_params,
 
     return details
 
+
+class ExplainPlanExecutor(object):
+    """Pool of background threads which run the explain plans for slow
+    SQL as soon as it is first recorded in a harvest period, rather than
+    serially when the harvest is being done. Each worker thread keeps its
+    own cache of database connections for as long as it runs, so that
+    connections are not opened again for each harvest. Completed explain
+    plans are cached for a period keyed by the SQL identifier, so that
+    the same SQL seen in each harvest isn't explained each time. If the
+    process is forked, the child starts its own worker threads, as those
+    of the parent do not exist in the child.
+
+    """
+
+    def __init__(self, max_workers=2, max_connections=4, cache_ttl=300.0):
+        self._max_workers = max_workers
+        self._max_connections = max(1, max_connections // max_workers)
+        self._cache_ttl = cache_ttl
+        self._cache = {}
+        self._cache_stats = [0, 0]
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._threads = []
+        self._condition = threading.Condition()
+        self._pending = set()
+
+    def _check_fork(self):
+        # Only the thread which called fork() exists in the child, so
+        # any worker threads, the SQL they were explaining and any lock
+        # they held at the time are all discarded.
+
+        if self._pid != os.getpid():
+            self._reset()
+
+    def _worker(self):
+        connections = SQLConnections(self._max_connections)
+
+        try:
+            while True:
+                node = self._queue.get()
+
+                if node is None:
+                    return
+
+                key = (node.identifier, node.sql_format)
+
+                try:
+                    result = explain_plan(connections, node.statement,
+                            node.connect_params, node.cursor_params,
+                            node.sql_parameters, node.execute_params,
+                            node.sql_format)
+                except Exception:
+                    _logger.exception('Unexpected exception in explain '
+                            'plan executor.')
+                    result = None
+
+                now = time.time()
+
+                with self._condition:
+                    for expired in [k for k, v in six.iteritems(self._cache)
+                            if v[0] <= now]:
+                        del self._cache[expired]
+
+                    self._cache[key] = (now + self._cache_ttl, result)
+                    self._pending.discard(key)
+                    self._condition.notify_all()
+
+        finally:
+            connections.cleanup()
+
+    def submit(self, node):
+        """Queues the slow SQL node to have its explain plan run, unless
+        the explain plan for the same SQL is already cached or is being
+        run, or an explain plan cannot be run for it.
+
+        """
+
+        if node.connect_params is None:
+            return
+
+        statement = node.statement
+
+        if statement.operation not in statement.database.explain_stmts:
+            return
+
+        key = (node.identifier, node.sql_format)
+
+        self._check_fork()
+
+        with self._condition:
+            if key in self._pending:
+                return
+
+            entry = self._cache.get(key)
+
+            if entry is not None and entry[0] > time.time():
+                return
+
+            self._pending.add(key)
+
+            while len(self._threads) < self._max_workers:
+                thread = threading.Thread(target=self._worker,
+                        name='NR-Explain-Plan-Executor')
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+        self._queue.put(node)
+
+    def explain_plan(self, node, timeout=0.0):
+        """Returns the explain plan for the slow SQL node, submitting it
+        if not already cached or being run. Waits at most timeout seconds
+        for an explain plan which is being run to complete, returning
+        None if it does not complete in that time.
+
+        """
+
+        self.submit(node)
+
+        key = (node.identifier, node.sql_format)
+        deadline = time.time() + timeout
+
+        with self._condition:
+            while True:
+                entry = self._cache.get(key)
+
+                if entry is not None:
+                    self._cache_stats[0] += 1
+                    return entry[1]
+
+                remaining = deadline - time.time()
+
+                if key not in self._pending or remaining <= 0:
+                    self._cache_stats[1] += 1
+                    return None
+
+                self._condition.wait(remaining)
+
+    def cache_stats(self):
+        """Returns the hits and misses for the cache of explain plans
+        since this was last called.
+
+        """
+
+        self._check_fork()
+
+        with self._condition:
+            hits, misses = self._cache_stats
+            self._cache_stats[:] = [0, 0]
+
+        return hits, misses
+
+    def shutdown(self):
+        with self._condition:
+            for _ in self._threads:
+                self._queue.put(None)
+            self._threads = []
+
+
+_explain_plan_executor = None
+_explain_plan_executor_lock = threading.Lock()
+
+
+def explain_plan_executor():
+    """Returns the explain plan executor shared by all applications, or
+    None if running explain plans in the background has been disabled.
+
+    """
+
+    global _explain_plan_executor
+
+    if _explain_plan_executor is None:
+        settings = global_settings()
+
+        if settings.explain_plan_executor.max_workers < 1:
+            return None
+
+        with _explain_plan_executor_lock:
+            if _explain_plan_executor is None:
+                _explain_plan_executor = ExplainPlanExecutor(
+                        settings.explain_plan_executor.max_workers,
+                        settings.agent_limits.max_sql_connections,
+                        settings.explain_plan_executor.cache_ttl)
+
+    return _explain_plan_executor
+
 # Wrapper for information about a specific database.
 
 
@@ -812,9 +1026,26 @@ class SQLDatabase(object):
         return result
 
 
+# Values derived from the text of a SQL statement which can be shared
+# between all statements with the same text for the same database product
+# and quoting style. These are filled in lazily as each is first required.
+
+
+class _SQLStatementValues(object):
+
+    __slots__ = ('operation', 'target', 'obfuscated', 'identifier')
+
+    def __init__(self):
+        self.operation = None
+        self.target = None
+        self.obfuscated = None
+        self.identifier = None
+
+
 class SQLStatement(object):
 
-    def __init__(self, sql, database=None):
+    def __init__(self, sql, database=None, values=None):
+        self._values = values
         self._operation = None
         self._target = None
         self._uncommented = None
@@ -840,16 +1071,32 @@ class SQLStatement(object):
         self.sql = sql
         self.database = database
 
+    def _shared_value(self, name, compute):
+        values = self._values
+
+        if values is None:
+            return compute()
+
+        value = getattr(values, name)
+
+        if value is None:
+            value = compute()
+            setattr(values, name, value)
+
+        return value
+
     @property
     def operation(self):
         if self._operation is None:
-            self._operation = _parse_operation(self.uncommented)
+            self._operation = self._shared_value('operation',
+                    lambda: _parse_operation(self.uncommented))
         return self._operation
 
     @property
     def target(self):
         if self._target is None:
-            self._target = _parse_target(self.uncommented, self.operation)
+            self._target = self._shared_value('target',
+                    lambda: _parse_target(self.uncommented, self.operation))
         return self._target
 
     @property
@@ -861,8 +1108,9 @@ class SQLStatement(object):
     @property
     def obfuscated(self):
         if self._obfuscated is None:
-            self._obfuscated = _uncomment_sql(_obfuscate_sql(self.sql,
-                self.database))
+            self._obfuscated = self._shared_value('obfuscated',
+                    lambda: _uncomment_sql(_obfuscate_sql(self.sql,
+                    self.database)))
         return self._obfuscated
 
     @property
@@ -874,7 +1122,8 @@ class SQLStatement(object):
     @property
     def identifier(self):
         if self._identifier is None:
-            self._identifier = hash(self.normalized)
+            self._identifier = self._shared_value('identifier',
+                    lambda: hash(self.normalized))
         return self._identifier
 
     def formatted(self, sql_format):
@@ -890,6 +1139,50 @@ class SQLStatement(object):
 
 _sql_statements = weakref.WeakValueDictionary()
 
+# The weak cache of statements above only helps while nodes referring to
+# a statement are still alive, which is rarely the case across separate
+# transactions. The derived values are therefore also held in a bounded
+# least recently used cache for the life of the process. This is created
+# on first use so that the configured size is honoured.
+
+_sql_statement_values = None
+
+
+def _statement_values(sql, database):
+    global _sql_statement_values
+
+    cache = _sql_statement_values
+
+    if cache is None:
+        cache_size = global_settings().sql_obfuscation.cache_size
+        if cache_size <= 0:
+            return None
+        cache = _sql_statement_values = LRUCache(cache_size)
+
+    key = (database.product, database.quoting_style, sql)
+
+    values = cache.get(key)
+
+    if values is None:
+        values = _SQLStatementValues()
+        cache.set(key, values)
+
+    return values
+
+
+def sql_statement_cache_stats():
+    """Returns the hits, misses and evictions for the cache of values
+    derived from SQL statements since this was last called.
+
+    """
+
+    cache = _sql_statement_values
+
+    if cache is None:
+        return (0, 0, 0)
+
+    return cache.stats()
+
 
 def sql_statement(sql, dbapi2_module):
     key = (sql, dbapi2_module)
@@ -900,7 +1193,7 @@ def sql_statement(sql, dbapi2_module):
         return result
 
     database = SQLDatabase(dbapi2_module)
-    result = SQLStatement(sql, database)
+    result = SQLStatement(sql, database, _statement_values(sql, database))
 
     _sql_statements[key] = result
 
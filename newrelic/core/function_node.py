@@ -29,6 +29,13 @@ _FunctionNode = namedtuple('_FunctionNode',
 
 class FunctionNode(_FunctionNode, GenericNodeMixin):
 
+    def aggregate_key(self):
+        rollup = self.rollup
+        if rollup is not None and not isinstance(rollup, six.string_types):
+            rollup = tuple(rollup)
+
+        return (type(self), self.group, self.name, rollup, self.label)
+
     def time_metrics(self, stats, root, parent):
         """Return a generator yielding the timed metrics for this
         function node as well as all the child nodes.
@@ -91,6 +91,9 @@ def wrap_internal_trace(module, object_path, name=None):
     newrelic.api.object_wrapper.wrap_object(module, object_path,
             InternalTraceWrapper, (name,))
 
+def current_internal_metrics():
+    return getattr(_context, 'current', None)
+
 def internal_metric(name, value):
     metrics = getattr(_context, 'current', None)
     if metrics is not None:
@@ -21,3 +21,8 @@ ApdexMetric = namedtuple('ApdexMetric',
 
 TimeMetric = namedtuple('TimeMetric',
         ['name', 'scope', 'duration', 'exclusive'])
+
+AggregateTimeMetric = namedtuple('AggregateTimeMetric',
+        ['name', 'scope', 'call_count', 'total_call_time',
+        'total_exclusive_call_time', 'min_call_time', 'max_call_time',
+        'sum_of_squares'])
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import random
+
 import newrelic.core.attribute as attribute
 
 from newrelic.core.attribute_filter import (DST_SPAN_EVENTS,
@@ -31,6 +33,31 @@ class GenericNodeMixin(object):
             u_attrs[k] = v
         return u_attrs
 
+    @property
+    def span_guid(self):
+        # Traces only generate a guid when it is first read, so the node
+        # for a trace whose guid was never needed is given one only if a
+        # span event is generated for it.
+
+        if self.guid is not None:
+            return self.guid
+
+        if hasattr(self, '_span_guid'):
+            return self._span_guid
+
+        self._span_guid = guid = '%016x' % random.getrandbits(64)
+        return guid
+
+    def aggregate_key(self):
+        """Returns the key identifying the metrics this node is reported
+        against, such that consecutive sibling nodes with the same key
+        can be aggregated once the segment budget has been exceeded.
+        Nodes returning None are never aggregated.
+
+        """
+
+        return None
+
     def get_trace_segment_params(self, settings, params=None):
         _params = attribute.resolve_agent_attributes(
                 self.agent_attributes,
@@ -53,11 +80,12 @@ class GenericNodeMixin(object):
                 settings,
                 base_attrs=None,
                 parent_guid=None,
-                attr_class=dict):
+                attr_class=dict,
+                attribute_filter=None):
         i_attrs = base_attrs and base_attrs.copy() or attr_class()
         i_attrs['type'] = 'Span'
         i_attrs['name'] = self.name
-        i_attrs['guid'] = self.guid
+        i_attrs['guid'] = self.span_guid
         i_attrs['timestamp'] = int(self.start_time * 1000)
         i_attrs['duration'] = self.duration
         i_attrs['category'] = 'generic'
@@ -65,41 +93,68 @@ class GenericNodeMixin(object):
         if parent_guid:
             i_attrs['parentId'] = parent_guid
 
-        a_attrs = attribute.resolve_agent_attributes(
-                self.agent_attributes,
-                settings.attribute_filter,
-                DST_SPAN_EVENTS,
-                attr_class=attr_class)
+        # Most segments carry no attributes of their own, in which case
+        # there is nothing to be passed through the attribute filter.
 
-        u_attrs = attribute.resolve_user_attributes(
-                self.processed_user_attributes,
-                settings.attribute_filter,
-                DST_SPAN_EVENTS,
-                attr_class=attr_class)
+        attribute_filter = attribute_filter or settings.attribute_filter
+
+        if self.agent_attributes:
+            a_attrs = attribute.resolve_agent_attributes(
+                    self.agent_attributes,
+                    attribute_filter,
+                    DST_SPAN_EVENTS,
+                    attr_class=attr_class)
+        else:
+            a_attrs = attr_class()
+
+        if getattr(self, 'user_attributes', None):
+            u_attrs = attribute.resolve_user_attributes(
+                    self.processed_user_attributes,
+                    attribute_filter,
+                    DST_SPAN_EVENTS,
+                    attr_class=attr_class)
+        else:
+            u_attrs = attr_class()
 
         # intrinsics, user attrs, agent attrs
         return [i_attrs, u_attrs, a_attrs]
 
     def span_events(self,
-            settings, base_attrs=None, parent_guid=None, attr_class=dict):
+            settings, base_attrs=None, parent_guid=None, attr_class=dict,
+            attribute_filter=None):
 
-        yield self.span_event(
-                settings,
-                base_attrs=base_attrs,
-                parent_guid=parent_guid,
-                attr_class=attr_class)
+        # The tree of nodes is walked depth first using an explicit stack
+        # rather than by nesting generators for each level. With nested
+        # generators every event is passed back up through each level of
+        # the tree and a deeply nested tree would exceed the recursion
+        # limit. Children are pushed in reverse so that events are still
+        # produced in the same order as the nodes are in the tree.
 
-        for child in self.children:
-            for event in child.span_events(
+        stack = [(self, parent_guid)]
+
+        while stack:
+            node, parent_guid = stack.pop()
+
+            yield node.span_event(
                     settings,
                     base_attrs=base_attrs,
-                    parent_guid=self.guid,
-                    attr_class=attr_class):
-                yield event
+                    parent_guid=parent_guid,
+                    attr_class=attr_class,
+                    attribute_filter=attribute_filter)
+
+            children = node.children
+
+            if children:
+                guid = node.span_guid
+                stack.extend([(child, guid) for child in reversed(children)])
 
 
 class DatastoreNodeMixin(GenericNodeMixin):
 
+    def aggregate_key(self):
+        return (type(self), self.product, self.target, self.operation,
+                self.instance_hostname, self.port_path_or_id)
+
     @property
     def name(self):
         product = self.product
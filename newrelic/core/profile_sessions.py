@@ -31,6 +31,15 @@ try:
 except ImportError:
     pass
 
+# The overhead of taking a sample is measured as the CPU time consumed by
+# the profiler thread where this is available, otherwise falling back to
+# the elapsed time, which is an upper bound on the CPU time.
+
+try:
+    from time import thread_time as _sample_cpu_time
+except ImportError:
+    _sample_cpu_time = time.time
+
 _logger = logging.getLogger(__name__)
 
 AGENT_PACKAGE_DIRECTORY = os.path.dirname(newrelic.__file__) + "/"
@@ -117,6 +126,34 @@ def collect_stack_traces(include_nr_threads=False):
         yield thread_category, stack_trace
 
 
+def format_folded_stack(stack, code_objects, thread_category):
+    """Formats a folded stack, being the pairs of code object id and line
+    number of each frame from the innermost frame outwards, into a list of
+    stack trace tuples as returned by format_stack_trace().
+
+    """
+
+    stack_trace = deque()
+
+    for index in range(0, len(stack), 2):
+        code = code_objects[stack[index]]
+        real_line = stack[index + 1]
+
+        filename = code.co_filename
+
+        if thread_category != "AGENT" and filename.startswith(AGENT_PACKAGE_DIRECTORY):
+            continue
+
+        func_name = code.co_name
+
+        if not stack_trace:
+            stack_trace.appendleft((filename, func_name, real_line, real_line))
+
+        stack_trace.appendleft((filename, func_name, code.co_firstlineno, real_line))
+
+    return stack_trace
+
+
 class ProfileSessionManager(object):
     """Singleton class that manages multiple profile sessions. Do NOT
     instantiate directly from this class. Instead use profile_session_manager()
@@ -149,6 +186,7 @@ class ProfileSessionManager(object):
         self._lock = threading.Lock()
         self.profile_agent_code = False
         self.sample_period_s = 0.1
+        self.overhead_budget = None
 
     def start_profile_session(self, app_name, profile_id, stop_time, sample_period_s=0.1, profile_agent_code=False):
         """Start a new profiler session. If a full_profiler is already
@@ -170,11 +208,14 @@ class ProfileSessionManager(object):
         # is invoked from the harvest thread and this ensures the variables are
         # not being updated concurrently by the profiler thread.
 
+        settings = global_settings().thread_profiler
+
         with self._lock:
 
             self.profile_agent_code = profile_agent_code
             self.sample_period_s = sample_period_s
-            self.full_profile_session = ProfileSession(profile_id, stop_time)
+            self.overhead_budget = settings.overhead_budget
+            self.full_profile_session = ProfileSession(profile_id, stop_time, folded=settings.mode == "folded")
             self.full_profile_app = app_name
 
             # Create a background thread to collect stack traces. Do this only
@@ -223,10 +264,15 @@ class ProfileSessionManager(object):
                 _logger.debug(
                     "Reporting final thread profiling data for "
                     "%d transactions over a period of %.2f seconds "
-                    "and %d samples.",
+                    "and %d samples. Samples took %.2fms of CPU time "
+                    "on average and %.2fms at most, with %d exceeding "
+                    "the overhead budget.",
                     session.transaction_count,
                     time.time() - session.start_time_s,
                     session.sample_count,
+                    session.sample_count and 1000.0 * session.sample_cpu_time / session.sample_count,
+                    1000.0 * session.max_sample_cpu_time,
+                    session.over_budget_count,
                 )
 
                 yield session.profile_data()
@@ -245,13 +291,27 @@ class ProfileSessionManager(object):
 
         while True:
 
-            for category, stack in collect_stack_traces(self.profile_agent_code):
+            start = _sample_cpu_time()
+
+            session = self.full_profile_session
+
+            if session is not None and session.folded:
+                session.update_folded_stacks(self.profile_agent_code)
 
-                # Merge the stack_trace to the call tree only for
-                # full_profile_session.
+            else:
+                for category, stack in collect_stack_traces(self.profile_agent_code):
+
+                    # Merge the stack_trace to the call tree only for
+                    # full_profile_session.
+
+                    if self.full_profile_session:
+                        self.full_profile_session.update_call_tree(category, stack)
 
-                if self.full_profile_session:
-                    self.full_profile_session.update_call_tree(category, stack)
+            overhead = _sample_cpu_time() - start
+
+            if session is not None:
+                budget = self.overhead_budget
+                session.record_sample_overhead(overhead, budget and budget * self.sample_period_s)
 
             self.update_profile_sessions()
 
@@ -261,7 +321,22 @@ class ProfileSessionManager(object):
                 self._profiler_thread_running = False
                 return
 
-            self._profiler_shutdown.wait(self.sample_period_s)
+            self._profiler_shutdown.wait(self.sample_wait_time(overhead))
+
+    def sample_wait_time(self, overhead):
+        """Returns the time to wait before taking the next sample. When
+        taking a sample consumed more than the overhead budget, being the
+        fraction of the sampling period which the profiler may use, the
+        wait is lengthened so that the overhead is kept within budget.
+
+        """
+
+        budget = self.overhead_budget
+
+        if budget and budget > 0.0:
+            return max(self.sample_period_s, overhead / budget - overhead)
+
+        return self.sample_period_s
 
     def update_profile_sessions(self):
         """Check the current time and decide if any of the profile sessions
@@ -287,20 +362,154 @@ class ProfileSessionManager(object):
 
 
 class ProfileSession(object):
-    def __init__(self, profile_id, stop_time):
+    def __init__(self, profile_id, stop_time, folded=False):
         self.profile_id = profile_id
         self.start_time_s = time.time()
         self.stop_time_s = stop_time
         self.actual_stop_time_s = 0
         self.state = SessionState.RUNNING
+        self.folded = folded
         self.reset_profile_data()
 
     def reset_profile_data(self):
         self.call_buckets = {"REQUEST": {}, "AGENT": {}, "BACKGROUND": {}, "OTHER": {}}
         self._node_list = []
+        self.folded_stacks = {}
+        self._code_objects = {}
+        self._empty_folded_stacks = set()
         self.start_time_s = time.time()
         self.sample_count = 0
         self.transaction_count = 0
+        self.sample_cpu_time = 0.0
+        self.max_sample_cpu_time = 0.0
+        self.over_budget_count = 0
+
+    def record_sample_overhead(self, overhead, limit=None):
+        """Record the CPU time taken to collect a sample, along with
+        whether it exceeded the limit on the time for a single sample.
+
+        """
+
+        self.sample_cpu_time += overhead
+        self.max_sample_cpu_time = max(self.max_sample_cpu_time, overhead)
+
+        if limit and overhead > limit:
+            self.over_budget_count += 1
+
+    def update_folded_stacks(self, include_nr_threads=False):
+        """Take a sample of the stacks of all the python threads, counting
+        each distinct stack under the category of the thread. Each frame
+        of a stack is recorded as the id of its code object and the line
+        number being executed, from the innermost frame outwards. Lookup
+        of file and function names, and the filtering out of frames for
+        the agent, is deferred until the profile data is generated.
+        Stacks consisting only of frames for the agent are not recorded
+        or counted, the same as when building the call tree as each
+        sample is taken.
+
+        """
+
+        folded_stacks = self.folded_stacks
+        code_objects = self._code_objects
+        empty_stacks = self._empty_folded_stacks
+
+        for (txn, thread_id, thread_category, frame) in trace_cache().active_threads():
+
+            if (thread_category == "AGENT") and (not include_nr_threads):
+                continue
+
+            stack = []
+            append = stack.append
+
+            f = frame
+            while f is not None:
+                append(id(f.f_code))
+                append(f.f_lineno)
+                f = f.f_back
+
+            key = (thread_category, tuple(stack))
+
+            count = folded_stacks.get(key)
+
+            if count is None:
+                if key in empty_stacks:
+                    continue
+
+                # A reference to each code object is held for as long
+                # as the stack is, so that the id of the code object
+                # cannot be reused by another while the stack is held.
+                # Whether the stack has any frames left once those for
+                # the agent are filtered out is worked out only the
+                # first time it is seen.
+
+                empty = thread_category != "AGENT"
+
+                f = frame
+                while f is not None:
+                    code = f.f_code
+                    code_objects[id(code)] = code
+                    if empty and not code.co_filename.startswith(AGENT_PACKAGE_DIRECTORY):
+                        empty = False
+                    f = f.f_back
+
+                if empty or not stack:
+                    empty_stacks.add(key)
+                    continue
+
+                folded_stacks[key] = 1
+
+            else:
+                folded_stacks[key] = count + 1
+
+            self.transaction_count += 1
+
+    def _merge_folded_stacks(self):
+        """Merge the folded stacks sampled into the call tree buckets."""
+
+        folded_stacks = self.folded_stacks
+        code_objects = self._code_objects
+
+        self.folded_stacks = {}
+        self._code_objects = {}
+        self._empty_folded_stacks = set()
+
+        for (thread_category, stack), count in six.iteritems(folded_stacks):
+            stack_trace = format_folded_stack(stack, code_objects, thread_category)
+
+            # Stacks consisting only of frames for the agent are skipped
+            # the same as when building the call tree as each sample is
+            # taken.
+
+            if stack_trace:
+                self._merge_call_tree(thread_category, stack_trace, count)
+
+    def folded_stack_lines(self):
+        """Returns the stacks sampled in the folded stack format, being
+        the thread category followed by the frames from the outermost
+        inwards, separated by semicolons, and then the number of samples
+        of that stack.
+
+        """
+
+        code_objects = self._code_objects
+
+        lines = []
+
+        for (thread_category, stack), count in six.iteritems(self.folded_stacks):
+            frames = [thread_category]
+
+            for index in range(len(stack) - 2, -1, -2):
+                code = code_objects[stack[index]]
+
+                if thread_category != "AGENT" and code.co_filename.startswith(AGENT_PACKAGE_DIRECTORY):
+                    continue
+
+                frames.append("%s:%s:%d" % (code.co_filename, code.co_name, stack[index + 1]))
+
+            if len(frames) > 1:
+                lines.append("%s %d" % (";".join(frames), count))
+
+        return lines
 
     def update_call_tree(self, bucket_type, stack_trace):
         """Merge a single call stack trace into a call tree bucket. If
@@ -312,6 +521,9 @@ class ProfileSession(object):
 
         self.transaction_count += 1
 
+        return self._merge_call_tree(bucket_type, stack_trace)
+
+    def _merge_call_tree(self, bucket_type, stack_trace, count=1):
         depth = 1
         try:
             bucket = self.call_buckets[bucket_type]
@@ -326,7 +538,7 @@ class ProfileSession(object):
                 self._node_list.append(call_tree)
                 bucket[method] = call_tree
 
-            call_tree.call_count += 1
+            call_tree.call_count += count
 
             # The call depth is incremented on each recursive call so we
             # know the depth of the call stack. We use this later when
@@ -387,6 +599,12 @@ class ProfileSession(object):
         # limit. This is just to avoid having the response be too large
         # and get rejected by the data collector.
 
+        # Folded stacks are only converted to the call tree format when
+        # the profile data is being reported.
+
+        if self.folded:
+            self._merge_folded_stacks()
+
         settings = global_settings()
         self._prune_call_trees(settings.agent_limits.thread_profiler_nodes)
 
@@ -15,6 +15,16 @@
 import re
 from collections import namedtuple
 
+from newrelic.common.lru_cache import LRUCache
+
+# Patterns using back references, conditional group references or inline
+# flags can't safely be joined into a single alternation as the group
+# numbering and the flags would then apply across all the patterns.
+
+_UNCOMBINABLE_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|\(\?[aiLmsux]")
+
+_MISSING = object()
+
 _NormalizationRule = namedtuple(
     "_NormalizationRule",
     ["match_expression", "replacement", "ignore", "eval_order", "terminate_chain", "each_segment", "replace_all"],
@@ -33,8 +43,39 @@ class NormalizationRule(_NormalizationRule):
         return self.match_expression_re.subn(self.replacement, string, count)
 
 
+def _combine_rules(rules):
+    # Returns a single expression which will match wherever any of the
+    # rules would, or None if that can't be constructed.
+
+    patterns = [rule.match_expression for rule in rules]
+
+    if any(_UNCOMBINABLE_RE.search(pattern) for pattern in patterns):
+        return None
+
+    try:
+        return re.compile("|".join("(?:%s)" % pattern for pattern in patterns), re.IGNORECASE)
+    except re.error:
+        return None
+
+
+def _split_segments(string):
+    # FIXME This fiddle is to skip leading segment
+    # when splitting on '/' where it is empty.
+    # Should the rule just be to skip any empty
+    # segment when matching keeping it as empty
+    # but not matched. Wouldn't then have to treat
+    # this as special.
+
+    segments = string.split("/")
+
+    if segments and not segments[0]:
+        return [""], segments[1:]
+
+    return [], segments
+
+
 class RulesEngine(object):
-    def __init__(self, rules):
+    def __init__(self, rules, cache_size=1024):
         self.__rules = []
 
         for rule in rules:
@@ -46,10 +87,47 @@ class RulesEngine(object):
 
         self.__rules = sorted(self.__rules, key=lambda rule: rule.eval_order)
 
+        # If no rule matches the original string, the string is returned
+        # unchanged, so the rules of each type are compiled into a single
+        # expression used to check for that before applying them in turn.
+
+        string_rules = [rule for rule in self.__rules if not rule.each_segment]
+        segment_rules = [rule for rule in self.__rules if rule.each_segment]
+
+        self._string_matcher = _combine_rules(string_rules) if string_rules else False
+        self._segment_matcher = _combine_rules(segment_rules) if segment_rules else False
+        self._prefilter = self._string_matcher is not None and self._segment_matcher is not None
+
+        self._cache = LRUCache(cache_size) if cache_size and self.__rules else None
+
     @property
     def rules(self):
         return self.__rules
 
+    def cache_stats(self):
+        """Returns the counts of cache hits and misses since this was
+        last called.
+
+        """
+
+        if self._cache is None:
+            return 0, 0
+
+        hits, misses, _ = self._cache.stats()
+        return hits, misses
+
+    def _may_match(self, string):
+        if self._string_matcher and self._string_matcher.search(string):
+            return True
+
+        if self._segment_matcher:
+            search = self._segment_matcher.search
+            for segment in _split_segments(string)[1]:
+                if search(segment):
+                    return True
+
+        return False
+
     def normalize(self, string):
         # URLs are supposed to be ASCII but can get a
         # URL with illegal non ASCII characters. As the
@@ -63,26 +141,30 @@ class RulesEngine(object):
         if isinstance(string, bytes):
             string = string.decode("Latin-1")
 
+        cache = self._cache
+
+        if cache is None:
+            return self._normalize(string)
+
+        result = cache.get(string, _MISSING)
+
+        if result is _MISSING:
+            result = self._normalize(string)
+            cache.set(string, result)
+
+        return result
+
+    def _normalize(self, string):
+        if self._prefilter and not self._may_match(string):
+            return (string, False)
+
         final_string = string
         ignore = False
         for rule in self.__rules:
             if rule.each_segment:
                 matched = False
 
-                segments = final_string.split("/")
-
-                # FIXME This fiddle is to skip leading segment
-                # when splitting on '/' where it is empty.
-                # Should the rule just be to skip any empty
-                # segment when matching keeping it as empty
-                # but not matched. Wouldn't then have to treat
-                # this as special.
-
-                if segments and not segments[0]:
-                    rule_segments = [""]
-                    segments = segments[1:]
-                else:
-                    rule_segments = []
+                rule_segments, segments = _split_segments(final_string)
 
                 for segment in segments:
                     rule_segment, match_count = rule.apply(segment)
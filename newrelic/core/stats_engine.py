@@ -28,7 +28,9 @@ import sys
 import time
 import warnings
 import zlib
-from heapq import heapify, heapreplace
+from array import array
+from heapq import heapify
+from itertools import compress
 
 import newrelic.packages.six as six
 from newrelic.api.settings import STRIP_EXCEPTION_MESSAGE
@@ -40,9 +42,9 @@ from newrelic.core.attribute import create_user_attributes, process_user_attribu
 from newrelic.core.attribute_filter import DST_ERROR_COLLECTOR
 from newrelic.core.code_level_metrics import extract_code_from_traceback
 from newrelic.core.config import is_expected_error, should_ignore_error
-from newrelic.core.database_utils import explain_plan
+from newrelic.core.database_utils import explain_plan, explain_plan_executor
 from newrelic.core.error_collector import TracedError
-from newrelic.core.metric import TimeMetric
+from newrelic.core.metric import AggregateTimeMetric, TimeMetric
 from newrelic.core.stack_trace import exception_stack
 from newrelic.core.log_event_node import LogEventNode
 
@@ -182,6 +184,371 @@ class CountStats(TimeStats):
         pass
 
 
+_TIME_STATS = 0
+_APDEX_STATS = 1
+_COUNT_STATS = 2
+
+
+def _stats_kind(stats):
+    if isinstance(stats, CompactMetricStats):
+        return stats.kind
+    elif isinstance(stats, ApdexStats):
+        return _APDEX_STATS
+    elif isinstance(stats, CountStats):
+        return _COUNT_STATS
+    return _TIME_STATS
+
+
+def _stats_value(value):
+    # Counts are held as floats in the columns but are reported back as
+    # integers where they are whole numbers, as they would be by the list
+    # based stats buckets.
+
+    if value.is_integer():
+        return int(value)
+    return value
+
+
+class CompactMetricStats(object):
+
+    """View onto the accumulated stats for a single metric held in a
+    compact metric table. Behaves the same as the list based stats
+    buckets, with any updates being written back to the table.
+
+    """
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    @property
+    def kind(self):
+        return self._table._kinds[self._index]
+
+    def __len__(self):
+        return 6
+
+    def __iter__(self):
+        return iter(self._table._row(self._index))
+
+    def __getitem__(self, item):
+        return self._table._row(self._index)[item]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(self._table._row(self._index))
+
+    def __copy__(self):
+        kind = self.kind
+        row = self._table._row(self._index)
+
+        if kind == _APDEX_STATS:
+            stats = ApdexStats()
+            stats[:] = row
+            return stats
+        elif kind == _COUNT_STATS:
+            return CountStats(*row)
+        return TimeStats(*row)
+
+    call_count = satisfying = property(operator.itemgetter(0))
+    total_call_time = tolerating = property(operator.itemgetter(1))
+    total_exclusive_call_time = frustrating = property(operator.itemgetter(2))
+    min_call_time = property(operator.itemgetter(3))
+    max_call_time = property(operator.itemgetter(4))
+    sum_of_squares = property(operator.itemgetter(5))
+
+    def merge_stats(self, other):
+        """Merge data from another instance of a stats bucket."""
+
+        self._table._merge_row(self._index, other)
+
+    def merge_raw_time_metric(self, duration, exclusive=None):
+        """Merge time value."""
+
+        if self.kind != _COUNT_STATS:
+            self._table._merge_raw_time_metric(self._index, duration, exclusive)
+
+    def merge_time_metric(self, metric):
+        """Merge data from a time metric object."""
+
+        self.merge_raw_time_metric(metric.duration, metric.exclusive)
+
+    def merge_custom_metric(self, value):
+        """Merge data value."""
+
+        self.merge_raw_time_metric(value)
+
+    def merge_apdex_metric(self, metric):
+        """Merge data from an apdex metric object."""
+
+        self._table._merge_apdex_metric(self._index, metric)
+
+
+class CompactMetricTable(object):
+
+    """Alternative to the dictionary of list based stats buckets used as
+    the stats table of the stats engine. Metric keys are interned to an
+    integer index into contiguous columns holding the count, total,
+    exclusive, min, max and sum of squares for each metric. The table
+    otherwise presents the same mapping interface as the dictionary,
+    with values being views onto the row for a metric.
+
+    For apdex metrics the count, total and exclusive columns hold the
+    satisfying, tolerating and frustrating counts, with min and max
+    holding the apdex_t values.
+
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._keys = []
+        self._kinds = array("b")
+        self._count = array("d")
+        self._total = array("d")
+        self._exclusive = array("d")
+        self._min = array("d")
+        self._max = array("d")
+        self._sum_of_squares = array("d")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __getitem__(self, key):
+        return CompactMetricStats(self, self._ids[key])
+
+    def __setitem__(self, key, stats):
+        index = self._ids.get(key)
+
+        if index is None:
+            self._append(key, _stats_kind(stats), stats)
+        else:
+            self._kinds[index] = _stats_kind(stats)
+            self._set_row(index, stats)
+
+    def get(self, key, default=None):
+        index = self._ids.get(key)
+        if index is None:
+            return default
+        return CompactMetricStats(self, index)
+
+    def keys(self):
+        return list(self._keys)
+
+    def values(self):
+        return [CompactMetricStats(self, index) for index in range(len(self._keys))]
+
+    def items(self):
+        return [(key, CompactMetricStats(self, index)) for index, key in enumerate(self._keys)]
+
+    iteritems = items
+
+    def _row(self, index):
+        row = [
+            _stats_value(self._count[index]),
+            self._total[index],
+            self._exclusive[index],
+            self._min[index],
+            self._max[index],
+            self._sum_of_squares[index],
+        ]
+
+        if self._kinds[index] == _APDEX_STATS:
+            row[1] = _stats_value(row[1])
+            row[2] = _stats_value(row[2])
+            row[5] = 0
+
+        return row
+
+    def _append(self, key, kind, stats):
+        self._ids[key] = len(self._keys)
+        self._keys.append(key)
+        self._kinds.append(kind)
+        self._count.append(stats[0])
+        self._total.append(stats[1])
+        self._exclusive.append(stats[2])
+        self._min.append(stats[3])
+        self._max.append(stats[4])
+        self._sum_of_squares.append(stats[5])
+
+    def _set_row(self, index, stats):
+        self._count[index] = stats[0]
+        self._total[index] = stats[1]
+        self._exclusive[index] = stats[2]
+        self._min[index] = stats[3]
+        self._max[index] = stats[4]
+        self._sum_of_squares[index] = stats[5]
+
+    def _merge_values(self, index, kind, count, total, exclusive, min_value, max_value, sum_of_squares):
+        # The merge for each kind of metric replicates that of the merge
+        # of the corresponding list based stats bucket.
+
+        if kind == _TIME_STATS:
+            self._min[index] = self._count[index] and min(self._min[index], min_value) or min_value
+            self._max[index] = max(self._max[index], max_value)
+            self._total[index] += total
+            self._exclusive[index] += exclusive
+            self._sum_of_squares[index] += sum_of_squares
+            self._count[index] += count
+
+        elif kind == _APDEX_STATS:
+            self._count[index] += count
+            self._total[index] += total
+            self._exclusive[index] += exclusive
+
+            satisfied = self._count[index] or self._total[index] or self._exclusive[index]
+
+            self._min[index] = satisfied and min(self._min[index], min_value) or min_value
+            self._max[index] = max(self._max[index], min_value)
+
+        else:
+            self._count[index] += count
+
+    def _merge_row(self, index, stats):
+        self._merge_values(index, self._kinds[index], *stats)
+
+    def _merge_raw_time_metric(self, index, duration, exclusive=None):
+        if exclusive is None:
+            exclusive = duration
+
+        self._total[index] += duration
+        self._exclusive[index] += exclusive
+        self._min[index] = self._count[index] and min(self._min[index], duration) or duration
+        self._max[index] = max(self._max[index], duration)
+        self._sum_of_squares[index] += duration**2
+        self._count[index] += 1
+
+    def _merge_apdex_metric(self, index, metric):
+        self._merge_values(
+            index,
+            _APDEX_STATS,
+            metric.satisfying,
+            metric.tolerating,
+            metric.frustrating,
+            metric.apdex_t,
+            metric.apdex_t,
+            0,
+        )
+
+    def merge_table(self, other, normalizer=None):
+        """Merges all the metrics from another compact metric table into
+        this one. Metrics not already present are appended to the columns
+        in bulk, with only the metrics present in both tables being
+        merged row by row. Where a normalizer is supplied it is applied to
+        the name of each of the metrics from the other table.
+
+        """
+
+        ids = self._ids
+        keys = self._keys
+        kinds = self._kinds
+
+        merged = []
+        appended = []
+
+        for other_index, key in enumerate(other._keys):
+            if normalizer is not None:
+                key = (normalizer(key[0])[0], key[1])
+
+            index = ids.get(key)
+
+            if index is None:
+                ids[key] = len(keys)
+                keys.append(key)
+                appended.append(other_index)
+            else:
+                merged.append((index, other_index))
+
+        kinds.extend(array("b", [other._kinds[i] for i in appended]))
+
+        for name in ("_count", "_total", "_exclusive", "_min", "_max", "_sum_of_squares"):
+            column = getattr(other, name)
+            getattr(self, name).extend(array("d", [column[i] for i in appended]))
+
+        count, total, exclusive = self._count, self._total, self._exclusive
+        min_values, max_values, sum_of_squares = self._min, self._max, self._sum_of_squares
+
+        other_count, other_total, other_exclusive = other._count, other._total, other._exclusive
+        other_min, other_max, other_sum_of_squares = other._min, other._max, other._sum_of_squares
+
+        for index, other_index in merged:
+            kind = kinds[index]
+
+            # Time metrics make up the bulk of the metrics, so are merged
+            # inline rather than through _merge_values().
+
+            if kind == _TIME_STATS:
+                min_value = other_min[other_index]
+                min_values[index] = count[index] and min(min_values[index], min_value) or min_value
+                max_values[index] = max(max_values[index], other_max[other_index])
+                total[index] += other_total[other_index]
+                exclusive[index] += other_exclusive[other_index]
+                sum_of_squares[index] += other_sum_of_squares[other_index]
+                count[index] += other_count[other_index]
+            else:
+                self._merge_values(
+                    index,
+                    kind,
+                    other_count[other_index],
+                    other_total[other_index],
+                    other_exclusive[other_index],
+                    other_min[other_index],
+                    other_max[other_index],
+                    other_sum_of_squares[other_index],
+                )
+
+    def normalize(self, normalizer):
+        """Returns a new compact metric table where the normalizer has
+        been applied to the metric names, with metrics which now have the
+        same name and scope being merged together.
+
+        """
+
+        table = CompactMetricTable()
+        table.merge_table(self, normalizer)
+
+        return table
+
+    def metric_data(self):
+        """Returns a list of the accumulated metric data in the format
+        expected by the data collector.
+
+        """
+
+        result = []
+
+        for key, kind, count, total, exclusive, min_value, max_value, sum_of_squares in zip(
+            self._keys,
+            self._kinds,
+            self._count,
+            self._total,
+            self._exclusive,
+            self._min,
+            self._max,
+            self._sum_of_squares,
+        ):
+            if kind == _APDEX_STATS:
+                row = [int(count), int(total), int(exclusive), min_value, max_value, 0]
+            else:
+                row = [_stats_value(count), total, exclusive, min_value, max_value, sum_of_squares]
+
+            result.append((dict(name=key[0], scope=key[1]), row))
+
+        return result
+
+
 class CustomMetrics(object):
 
     """Table for collection a set of value metrics."""
@@ -220,6 +587,20 @@ class CustomMetrics(object):
 
         return six.iteritems(self.__stats_table)
 
+    def merge_metrics(self, metrics):
+        """Merges in a set of value metrics. The metrics should be
+        provided as an iterable where each item is a tuple of the metric
+        name and the accumulated stats for the metric.
+
+        """
+
+        for name, other in metrics:
+            stats = self.__stats_table.get(name)
+            if stats is None:
+                self.__stats_table[name] = other
+            else:
+                stats.merge_stats(other)
+
     def reset_metric_stats(self):
         """Resets the accumulated statistics back to initial state for
         metric data.
@@ -272,11 +653,25 @@ class SlowSqlStats(list):
 
 
 class SampledDataSet(object):
+    """Reservoir holding the samples with the highest priorities seen.
+
+    The priorities, the sequence numbers of when each sample was seen and
+    the samples themselves are held in separate columns. Once full, a new
+    sample is rejected with a single comparison against the minimum
+    priority retained at the last compaction. Accepted samples are
+    appended and the reservoir is only compacted back down to capacity,
+    by selecting the samples with the highest priorities, when twice the
+    capacity has been buffered or when the samples are read. Merging
+    another reservoir appends its columns in bulk followed by the same
+    selection step. Where priorities are equal, the sample seen first is
+    kept.
+
+    """
+
     def __init__(self, capacity=100):
-        self.pq = []
-        self.heap = False
         self.capacity = capacity
         self.num_seen = 0
+        self.reset()
 
         if capacity <= 0:
 
@@ -285,13 +680,22 @@ class SampledDataSet(object):
 
             self.add = add
 
+    @property
+    def pq(self):
+        self._compact()
+        entries = list(zip(self._priorities, self._seen, self._samples))
+        heapify(entries)
+        return entries
+
     @property
     def samples(self):
-        return (x[-1] for x in self.pq)
+        self._compact()
+        return iter(self._samples)
 
     @property
     def num_samples(self):
-        return len(self.pq)
+        self._compact()
+        return len(self._samples)
 
     @property
     def sampling_info(self):
@@ -301,20 +705,53 @@ class SampledDataSet(object):
         return self.samples
 
     def reset(self):
-        self.pq = []
-        self.heap = False
+        self._priorities = array("d")
+        self._seen = []
+        self._samples = []
+        self._minimum = None
+        self._compact_at = max(self.capacity, 1)
         self.num_seen = 0
 
-    def should_sample(self, priority):
-        if self.heap:
-            # self.pq[0] is always the minimal
-            # priority sample in the queue
-            if priority > self.pq[0][0]:
-                return True
-            return False
+    def _compact(self):
+        priorities = self._priorities
+        count = len(priorities)
+        capacity = self.capacity
 
+        if count < capacity or not count:
+            return
+
+        if count > capacity:
+            # Find the lowest priority to keep by sorting a copy of the
+            # priorities, which is done in C on the raw values, and filter
+            # the columns against it. Ties at that priority are
+            # resolved in favour of the earlier position, which is always
+            # the sample seen first, as the columns are kept in the order
+            # the samples were seen.
+
+            minimum = sorted(priorities)[count - capacity]
+            keep = [p > minimum for p in priorities]
+            ties = capacity - sum(keep)
+
+            for index, priority in enumerate(priorities):
+                if not ties:
+                    break
+                if priority == minimum:
+                    keep[index] = True
+                    ties -= 1
+
+            self._minimum = minimum
+            self._priorities = array("d", compress(priorities, keep))
+            self._seen = list(compress(self._seen, keep))
+            self._samples = list(compress(self._samples, keep))
+
+        elif self._minimum is None:
+            self._minimum = min(priorities)
+
+        self._compact_at = 2 * capacity
+
+    def should_sample(self, priority):
         # Always sample if under capacity
-        return True
+        return self._minimum is None or priority > self._minimum
 
     def add(self, sample, priority=None):  # pylint: disable=E0202
         self.num_seen += 1
@@ -322,29 +759,45 @@ class SampledDataSet(object):
         if priority is None:
             priority = random.random()  # nosec
 
-        entry = (priority, self.num_seen, sample)
-        if self.num_seen == self.capacity:
-            self.pq.append(entry)
-            self.heap = self.heap or heapify(self.pq) or True
-        elif not self.heap:
-            self.pq.append(entry)
-        else:
-            sampled = self.should_sample(priority)
-            if not sampled:
-                return
-            heapreplace(self.pq, entry)
+        if self._minimum is not None and priority <= self._minimum:
+            return
+
+        self._priorities.append(priority)
+        self._seen.append(self.num_seen)
+        self._samples.append(sample)
+
+        if len(self._samples) >= self._compact_at:
+            self._compact()
 
     def merge(self, other_data_set, priority=None):
-        if priority is None:
-            priority = -1
+        if self.capacity > 0:
+            other_data_set._compact()
 
-        for original_priority, seen_at, sample in other_data_set.pq:
-            self.add(sample, max(priority, original_priority))
+            priorities = other_data_set._priorities
+            if priority is not None:
+                priorities = [max(priority, p) for p in priorities]
 
-        # Merge the num_seen from the other_data_set, but take care not to
-        # double-count the actual samples of other_data_set since the .add
-        # call above will add one to self.num_seen each time
-        self.num_seen += other_data_set.num_seen - other_data_set.num_samples
+            seen = range(self.num_seen + 1, self.num_seen + 1 + len(priorities))
+            samples = other_data_set._samples
+
+            # Samples which would be rejected by add() are dropped up
+            # front rather than being buffered.
+
+            minimum = self._minimum
+            if minimum is not None:
+                keep = [p > minimum for p in priorities]
+                priorities = compress(priorities, keep)
+                seen = compress(seen, keep)
+                samples = compress(samples, keep)
+
+            self._priorities.extend(priorities)
+            self._seen.extend(seen)
+            self._samples.extend(samples)
+
+            if len(self._samples) >= self._compact_at:
+                self._compact()
+
+        self.num_seen += other_data_set.num_seen
 
 
 class LimitedDataSet(list):
@@ -481,6 +934,11 @@ class StatsEngine(object):
     def error_events(self):
         return self._error_events
 
+    def _create_stats_table(self):
+        if self.__settings is not None and self.__settings.compact_metric_table.enabled:
+            return CompactMetricTable()
+        return {}
+
     def metrics_count(self):
         """Returns a count of the number of unique metrics currently
         recorded for apdex, time and value metrics.
@@ -508,8 +966,10 @@ class StatsEngine(object):
         stats = self.__stats_table.get(key)
         if stats is None:
             stats = ApdexStats(apdex_t=metric.apdex_t)
+            stats.merge_apdex_metric(metric)
             self.__stats_table[key] = stats
-        stats.merge_apdex_metric(metric)
+        else:
+            stats.merge_apdex_metric(metric)
 
         return key
 
@@ -540,6 +1000,17 @@ class StatsEngine(object):
 
         key = (metric.name, metric.scope or "")
         stats = self.__stats_table.get(key)
+
+        # Aggregated segments report the combined stats of all the
+        # segments they stand in for, rather than a single timing.
+
+        if type(metric) is AggregateTimeMetric:
+            if stats is None:
+                self.__stats_table[key] = TimeStats(*metric[2:])
+            else:
+                stats.merge_stats(metric[2:])
+            return key
+
         if stats is None:
             stats = TimeStats(
                 call_count=1,
@@ -838,6 +1309,14 @@ class StatsEngine(object):
                 stats = SlowSqlStats()
                 self.__sql_stats_table[key] = stats
 
+                # Start on the explain plan now so that it is ready
+                # by the time of the harvest, even where this stats
+                # engine is only merged in at the time of the harvest.
+
+                executor = explain_plan_executor()
+                if executor is not None:
+                    executor.submit(node)
+
         if stats:
             stats.merge_slow_sql_node(node)
 
@@ -944,7 +1423,7 @@ class StatsEngine(object):
             self.__transaction_errors = self.__transaction_errors[: settings.agent_limits.errors_per_harvest]
 
         if error_collector.capture_events and error_collector.enabled and settings.collect_error_events:
-            events = transaction.error_events(self.__stats_table)
+            events = transaction.error_events()
             for event in events:
                 self._error_events.add(event, priority=transaction.priority)
 
@@ -983,12 +1462,12 @@ class StatsEngine(object):
         # while transactions from regular requests are saved in another.
 
         if transaction.synthetics_resource_id:
-            event = transaction.transaction_event(self.__stats_table)
+            event = transaction.transaction_event()
             self._synthetics_events.add(event)
 
         elif settings.collect_analytics_events and settings.transaction_events.enabled:
 
-            event = transaction.transaction_event(self.__stats_table)
+            event = transaction.transaction_event()
             self._transaction_events.add(event, priority=transaction.priority)
 
         # Merge in custom events
@@ -1001,7 +1480,7 @@ class StatsEngine(object):
         if settings.distributed_tracing.enabled and settings.span_events.enabled and settings.collect_span_events:
             if settings.infinite_tracing.enabled:
                 for event in transaction.span_protos(settings):
-                    self._span_stream.put(event)
+                    self._span_stream.put(event, priority=transaction.priority)
             elif transaction.sampled:
                 for event in transaction.span_events(self.__settings):
                     self._span_events.add(event, priority=transaction.priority)
@@ -1072,13 +1551,16 @@ class StatsEngine(object):
             )
 
         if normalizer is not None:
-            for key, value in six.iteritems(self.__stats_table):
-                key = (normalizer(key[0])[0], key[1])
-                stats = normalized_stats.get(key)
-                if stats is None:
-                    normalized_stats[key] = copy.copy(value)
-                else:
-                    stats.merge_stats(value)
+            if isinstance(self.__stats_table, CompactMetricTable):
+                normalized_stats = self.__stats_table.normalize(normalizer)
+            else:
+                for key, value in six.iteritems(self.__stats_table):
+                    key = (normalizer(key[0])[0], key[1])
+                    stats = normalized_stats.get(key)
+                    if stats is None:
+                        normalized_stats[key] = copy.copy(value)
+                    else:
+                        stats.merge_stats(value)
         else:
             normalized_stats = self.__stats_table
 
@@ -1089,6 +1571,9 @@ class StatsEngine(object):
                 list(six.iteritems(normalized_stats)),
             )
 
+        if isinstance(normalized_stats, CompactMetricTable):
+            return normalized_stats.metric_data()
+
         for key, value in six.iteritems(normalized_stats):
             key = dict(name=key[0], scope=key[1])
             result.append((key, value))
@@ -1133,6 +1618,13 @@ class StatsEngine(object):
 
         result = []
 
+        # Explain plans are normally run in the background by the explain
+        # plan executor as each SQL is first recorded, so only wait a
+        # limited time in total for any which are still being run.
+
+        executor = explain_plan_executor()
+        deadline = time.time() + self.__settings.explain_plan_executor.wait_timeout
+
         for stats_node in slow_sql_nodes:
 
             slow_sql_node = stats_node.slow_sql_node
@@ -1142,15 +1634,18 @@ class StatsEngine(object):
             if slow_sql_node.stack_trace:
                 params["backtrace"] = slow_sql_node.stack_trace
 
-            explain_plan_data = explain_plan(
-                connections,
-                slow_sql_node.statement,
-                slow_sql_node.connect_params,
-                slow_sql_node.cursor_params,
-                slow_sql_node.sql_parameters,
-                slow_sql_node.execute_params,
-                slow_sql_node.sql_format,
-            )
+            if executor is not None:
+                explain_plan_data = executor.explain_plan(slow_sql_node, max(0.0, deadline - time.time()))
+            else:
+                explain_plan_data = explain_plan(
+                    connections,
+                    slow_sql_node.statement,
+                    slow_sql_node.connect_params,
+                    slow_sql_node.cursor_params,
+                    slow_sql_node.sql_parameters,
+                    slow_sql_node.execute_params,
+                    slow_sql_node.sql_format,
+                )
 
             if explain_plan_data:
                 params["explain_plan"] = explain_plan_data
@@ -1382,7 +1877,7 @@ class StatsEngine(object):
         """
 
         self.__settings = settings
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
         self.__sql_stats_table = {}
         self.__slow_transaction = None
         self.__slow_transaction_map = {}
@@ -1398,7 +1893,13 @@ class StatsEngine(object):
         self.reset_synthetics_events()
         # streams are never reset after instantiation
         if reset_stream:
-            self._span_stream = StreamBuffer(settings.infinite_tracing.span_queue_size)
+            self._span_stream = StreamBuffer(
+                settings.infinite_tracing.span_queue_size,
+                batching=settings.infinite_tracing.batching,
+                batch_size=settings.infinite_tracing.batch_size,
+                linger=settings.infinite_tracing.batch_linger,
+                drop_policy=settings.infinite_tracing.drop_policy,
+            )
 
     def reset_metric_stats(self):
         """Resets the accumulated statistics back to initial state for
@@ -1406,7 +1907,7 @@ class StatsEngine(object):
 
         """
 
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
 
     def reset_transaction_events(self):
         """Resets the accumulated statistics back to initial state for
@@ -1491,7 +1992,7 @@ class StatsEngine(object):
         self.__slow_transaction = None
         self.__synthetics_transactions = []
         self.__sql_stats_table = {}
-        self.__stats_table = {}
+        self.__stats_table = self._create_stats_table()
         self.__transaction_errors = []
 
     def harvest_snapshot(self, flexible=False):
@@ -1571,6 +2072,27 @@ class StatsEngine(object):
         self._merge_sql(snapshot)
         self._merge_traces(snapshot)
 
+    def merge_shard(self, shard):
+        """Merges data from a stats engine shard. Shard is a long lived
+        instance of StatsEngine owned by a single thread, which unlike
+        the workarea for a single transaction can hold the data for many
+        transactions.
+        """
+
+        if not self.__settings:
+            return
+
+        self.merge_metric_stats(shard)
+        self._merge_transaction_events(shard, rollback=True)
+        self._merge_synthetics_events(shard)
+        self._merge_error_events(shard)
+        self._merge_error_traces(shard)
+        self._merge_custom_events(shard)
+        self._merge_span_events(shard)
+        self._merge_log_events(shard)
+        self._merge_sql(shard)
+        self._merge_traces(shard)
+
     def rollback(self, snapshot):
         """Performs a "rollback" merge after a failed harvest. Snapshot is a
         copy of the main StatsEngine data that we attempted to harvest, but
@@ -1604,7 +2126,13 @@ class StatsEngine(object):
         if not self.__settings:
             return
 
-        for key, other in six.iteritems(snapshot.__stats_table):
+        self._merge_stats_table(snapshot.__stats_table)
+
+    def _merge_stats_table(self, stats_table):
+        if isinstance(self.__stats_table, CompactMetricTable) and isinstance(stats_table, CompactMetricTable):
+            return self.__stats_table.merge_table(stats_table)
+
+        for key, other in six.iteritems(stats_table):
             stats = self.__stats_table.get(key)
             if not stats:
                 self.__stats_table[key] = other
@@ -1697,6 +2225,13 @@ class StatsEngine(object):
                 maximum = self.__settings.agent_limits.slow_sql_data
                 if len(self.__sql_stats_table) < maximum:
                     self.__sql_stats_table[key] = copy.copy(slow_sql_stats)
+
+                    # Start on the explain plan now so that it is ready
+                    # by the time of the harvest.
+
+                    executor = explain_plan_executor()
+                    if executor is not None:
+                        executor.submit(slow_sql_stats.slow_sql_node)
             else:
                 stats.merge_stats(slow_sql_stats)
 
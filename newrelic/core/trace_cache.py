@@ -28,6 +28,11 @@ try:
 except ImportError:
     import _thread as thread
 
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
 from newrelic.core.config import global_settings
 from newrelic.core.loop_node import LoopNode
 
@@ -152,6 +157,22 @@ class TraceCache(object):
     def current_trace(self):
         return self._cache.get(self.current_thread_id())
 
+    def swap_trace(self, thread_id, trace):
+        """Makes the specified trace the current trace for the thread ID,
+        or removes the current trace if the trace is None. Returns the
+        trace which was previously current so that it can be restored.
+
+        """
+
+        previous = self._cache.get(thread_id)
+
+        if trace is None:
+            self._cache.pop(thread_id, None)
+        else:
+            self._cache[thread_id] = trace
+
+        return previous
+
     def active_threads(self):
         """Returns an iterator over all current stack frames for all
         active threads in the process. The result for each is a tuple
@@ -184,7 +205,7 @@ class TraceCache(object):
                 # obtain a name for as being 'OTHER'.
 
                 thread = threading._active.get(thread_id)
-                if thread is not None and thread.getName().startswith("NR-"):
+                if thread is not None and thread.name.startswith("NR-"):
                     yield None, thread_id, "AGENT", frame
                 else:
                     yield None, thread_id, "OTHER", frame
@@ -255,25 +276,27 @@ class TraceCache(object):
 
         self._cache[thread_id] = trace
 
-        # We judge whether we are actually running in a coroutine by
-        # seeing if the current thread ID is actually listed in the set
-        # of all current frames for executing threads. If we are
-        # executing within a greenlet, then thread.get_ident() will
-        # return the greenlet identifier. This will not be a key in
-        # dictionary of all current frames because that will still be
-        # the original standard thread which all greenlets are running
-        # within.
+        # We judge whether we are running in a greenlet the same way as
+        # current_thread_id(), by checking whether the current greenlet
+        # has a parent. Comparing thread IDs is not sufficient here, as
+        # when gevent or eventlet have monkey patched the thread module,
+        # thread.get_ident() returns the greenlet identifier as well. For
+        # tasks, the thread ID for the trace will differ from that of the
+        # actual thread. This avoids checking whether the thread ID is a
+        # key in sys._current_frames(), which would take a snapshot of
+        # the frames for every thread each time a trace is saved.
 
         trace._greenlet = None
 
-        if hasattr(sys, "_current_frames"):
-            if thread_id not in sys._current_frames():
-                if self.greenlet:
-                    trace._greenlet = weakref.ref(self.greenlet.getcurrent())
+        if self.greenlet:
+            current = self.greenlet.getcurrent()
+            if current is not None and current.parent is not None:
+                trace._greenlet = weakref.ref(current)
 
-                if self.asyncio and not hasattr(trace, "_task"):
-                    task = current_task(self.asyncio)
-                    trace._task = task
+        if trace._greenlet is not None or thread_id != thread.get_ident():
+            if self.asyncio and not hasattr(trace, "_task"):
+                task = current_task(self.asyncio)
+                trace._task = task
 
     def pop_current(self, trace):
         """Restore the trace's parent under the thread ID of the current
@@ -391,6 +414,81 @@ class TraceCache(object):
             root.add_child(node)
 
 
+class ContextVarTraceCache(TraceCache):
+    """A trace cache which remembers the current trace in a context
+    variable. Looking up the current trace or transaction is then a
+    context variable lookup and a check that the trace is still the one
+    saved under its own thread ID, rather than needing to determine the
+    identifier for the current greenlet, task or thread. The cache keyed
+    by thread ID remains the only record of which trace is current, so
+    where the trace in the context variable has exited or is no longer
+    current, the trace is looked up the same as for the default cache.
+
+    This relies on each asyncio task and greenlet running in its own
+    context, which for greenlets requires greenlet 0.4.17 or later.
+
+    """
+
+    def __init__(self):
+        super(ContextVarTraceCache, self).__init__()
+
+        # A weak reference to the trace is held in the context variable,
+        # as contexts are copied into any tasks which are created and
+        # may outlive the trace.
+
+        self._current = contextvars.ContextVar("newrelic_current_trace", default=None)
+
+    def _set_current(self, trace):
+        self._current.set(trace is not None and weakref.ref(trace) or None)
+
+    def current_transaction(self):
+        trace = self.current_trace()
+        return trace and trace.transaction
+
+    def current_trace(self):
+        ref = self._current.get()
+        trace = ref and ref()
+
+        # The context variable is copied into any tasks created while
+        # the trace is current, so it may refer to a trace which has
+        # since exited or been replaced under its thread ID.
+
+        if (
+            trace is not None
+            and not trace.exited
+            and not (trace.root and trace.root.exited)
+            and self._cache.get(trace.thread_id) is trace
+        ):
+            return trace
+
+        return super(ContextVarTraceCache, self).current_trace()
+
+    def swap_trace(self, thread_id, trace):
+        previous = super(ContextVarTraceCache, self).swap_trace(thread_id, trace)
+        self._set_current(trace)
+        return previous
+
+    def save_trace(self, trace):
+        super(ContextVarTraceCache, self).save_trace(trace)
+        self._set_current(trace)
+
+    def pop_current(self, trace):
+        super(ContextVarTraceCache, self).pop_current(trace)
+
+        # The trace may be exiting from within a different context to
+        # that it was saved in, in which case the context variable for
+        # this context should be left alone.
+
+        ref = self._current.get()
+        if ref is not None and ref() is trace:
+            self._set_current(trace.parent)
+
+
+_trace_cache_backends = {
+    "thread": TraceCache,
+    "contextvars": ContextVarTraceCache,
+}
+
 _trace_cache = TraceCache()
 
 
@@ -398,6 +496,35 @@ def trace_cache():
     return _trace_cache
 
 
+def use_trace_cache_backend(backend):
+    """Replaces the global trace cache with one using the named backend.
+    This can only be done before any traces have been saved, so is done
+    when the agent is initialized.
+
+    """
+
+    global _trace_cache
+
+    backend_type = _trace_cache_backends.get(backend)
+
+    if backend_type is None:
+        _logger.warning("Unknown trace cache backend %r, using the default.", backend)
+        return
+
+    if type(_trace_cache) is backend_type:
+        return
+
+    if backend_type is ContextVarTraceCache and contextvars is None:
+        _logger.warning("The contextvars trace cache backend is not available on this version of Python.")
+        return
+
+    if _trace_cache._cache:
+        _logger.warning("The trace cache backend cannot be changed while traces are active.")
+        return
+
+    _trace_cache = backend_type()
+
+
 def greenlet_loaded(module):
     _trace_cache.greenlet = module
 
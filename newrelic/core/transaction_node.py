@@ -25,7 +25,7 @@ import newrelic.core.trace_node
 
 from newrelic.core.metric import ApdexMetric, TimeMetric
 from newrelic.core.string_table import StringTable
-from newrelic.core.attribute import create_user_attributes
+from newrelic.core.attribute import AttributeDestinationCache, create_user_attributes
 from newrelic.core.attribute_filter import (DST_ERROR_COLLECTOR,
         DST_TRANSACTION_TRACER, DST_TRANSACTION_EVENTS)
 
@@ -50,7 +50,18 @@ _TransactionNode = namedtuple('_TransactionNode',
         'distributed_trace_intrinsics', 'user_attributes', 'priority',
         'sampled', 'parent_transport_duration', 'parent_span', 'parent_type',
         'parent_account', 'parent_app', 'parent_tx', 'parent_transport_type',
-        'root_span_guid', 'trace_id', 'loop_time'])
+        'root_span_guid', 'trace_id', 'loop_time', 'event_rollups'])
+
+# The intrinsics for analytics events which total up the call time, and
+# where applicable the call count, of the rollup metrics reported by the
+# nodes of a transaction. These are accumulated as each node is created.
+
+EVENT_ROLLUP_INTRINSICS = {
+    'External/all': ('externalDuration', 'externalCallCount'),
+    'Datastore/all': ('databaseDuration', 'databaseCallCount'),
+    'Memcache/all': ('memcacheDuration', None),
+    'EventLoop/Wait/all': ('eventLoopWait', None),
+}
 
 
 class TransactionNode(_TransactionNode):
@@ -418,12 +429,12 @@ class TransactionNode(_TransactionNode):
             else:
                 return 'F'
 
-    def transaction_event(self, stats_table):
+    def transaction_event(self):
         # Create the transaction event, which is a list of attributes.
 
         # Intrinsic attributes don't get filtered
 
-        intrinsics = self.transaction_event_intrinsics(stats_table)
+        intrinsics = self.transaction_event_intrinsics()
 
         # Add user and agent attributes to event
 
@@ -440,10 +451,10 @@ class TransactionNode(_TransactionNode):
         transaction_event = [intrinsics, user_attributes, agent_attributes]
         return transaction_event
 
-    def transaction_event_intrinsics(self, stats_table):
+    def transaction_event_intrinsics(self):
         """Put together the intrinsic attributes for a transaction event"""
 
-        intrinsics = self._event_intrinsics(stats_table)
+        intrinsics = self._event_intrinsics()
 
         intrinsics['type'] = 'Transaction'
         intrinsics['name'] = self.path
@@ -481,12 +492,12 @@ class TransactionNode(_TransactionNode):
 
         return intrinsics
 
-    def error_events(self, stats_table):
+    def error_events(self):
 
         errors = []
         for error in self.errors:
 
-            intrinsics = self.error_event_intrinsics(error, stats_table)
+            intrinsics = self.error_event_intrinsics(error)
 
             # Add user and agent attributes to event
 
@@ -513,9 +524,9 @@ class TransactionNode(_TransactionNode):
 
         return errors
 
-    def error_event_intrinsics(self, error, stats_table):
+    def error_event_intrinsics(self, error):
 
-        intrinsics = self._event_intrinsics(stats_table)
+        intrinsics = self._event_intrinsics()
 
         intrinsics['type'] = "TransactionError"
         intrinsics['error.class'] = error.type
@@ -531,7 +542,7 @@ class TransactionNode(_TransactionNode):
 
         return intrinsics
 
-    def _event_intrinsics(self, stats_table):
+    def _event_intrinsics(self):
         """Common attributes for analytics events"""
 
         cache = getattr(self, '_event_intrinsics_cache', None)
@@ -557,38 +568,22 @@ class TransactionNode(_TransactionNode):
             intrinsics['nr.syntheticsJobId'] = self.synthetics_job_id
             intrinsics['nr.syntheticsMonitorId'] = self.synthetics_monitor_id
 
-        def _add_call_time(source, target):
-            # include time for keys previously added to stats table via
-            # stats_engine.record_transaction
-            if (source, '') in stats_table:
-                call_time = stats_table[(source, '')].total_call_time
-                if target in intrinsics:
-                    intrinsics[target] += call_time
-                else:
-                    intrinsics[target] = call_time
-
-        def _add_call_count(source, target):
-            # include counts for keys previously added to stats table via
-            # stats_engine.record_transaction
-            if (source, '') in stats_table:
-                call_count = stats_table[(source, '')].call_count
-                if target in intrinsics:
-                    intrinsics[target] += call_count
-                else:
-                    intrinsics[target] = call_count
-
-        _add_call_time('WebFrontend/QueueTime', 'queueDuration')
-
-        _add_call_time('External/all', 'externalDuration')
-        _add_call_time('Datastore/all', 'databaseDuration')
-        _add_call_time('Memcache/all', 'memcacheDuration')
-
-        _add_call_count('External/all', 'externalCallCount')
-        _add_call_count('Datastore/all', 'databaseCallCount')
+        # The call times and counts are only included if the matching
+        # metrics were reported by time_metrics(), which reports none
+        # for a transaction without a name.
+
+        if self.base_name:
+            if self.type == 'WebTransaction' and self.queue_start != 0:
+                queue_wait = self.start_time - self.queue_start
+                if queue_wait < 0:
+                    queue_wait = 0
+
+                intrinsics['queueDuration'] = queue_wait
+
+            intrinsics.update(self.event_rollups)
 
         if self.loop_time:
             intrinsics['eventLoopTime'] = self.loop_time
-        _add_call_time('EventLoop/Wait/all', 'eventLoopWait')
 
         self._event_intrinsics_cache = intrinsics.copy()
 
@@ -610,10 +605,16 @@ class TransactionNode(_TransactionNode):
             ('priority', self.priority),
         ))
 
+        # The destinations of each attribute name are only resolved once
+        # for all the spans of the transaction.
+
+        attribute_filter = AttributeDestinationCache(settings.attribute_filter)
+
         for event in self.root.span_events(
             settings,
             base_attrs,
             parent_guid=self.parent_span,
             attr_class=attr_class,
+            attribute_filter=attribute_filter,
         ):
             yield event
@@ -12,6 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+import itertools
+import operator
+
+import newrelic.packages.six as six
+
 from newrelic.api.database_trace import DatabaseTrace, register_database_client
 from newrelic.api.function_trace import FunctionTrace
 from newrelic.api.transaction import current_transaction
@@ -21,6 +27,57 @@ from newrelic.core.config import global_settings
 
 DEFAULT = object()
 
+
+def peek_parameters(seq_of_parameters):
+    """Returns the first set of parameters from the sequence of parameters
+    passed to executemany(), or DEFAULT if there are none, along with what
+    to pass on to executemany() in place of the sequence of parameters and
+    a function returning the count of the sets of parameters. If the
+    sequence of parameters is only an iterator, such as a generator
+    yielding the rows for a bulk load, the first set of parameters is
+    chained back on to the front of it rather than reading it all into
+    memory. The count is then of the sets of parameters consumed so far.
+    Any other iterable is passed on unchanged, with the first set of
+    parameters read from a separate iterator, and is only counted if it
+    has a length.
+
+    """
+
+    if isinstance(seq_of_parameters, (list, tuple)):
+        if seq_of_parameters:
+            return (seq_of_parameters[0], seq_of_parameters,
+                    functools.partial(len, seq_of_parameters))
+        return DEFAULT, seq_of_parameters, lambda: 0
+
+    try:
+        iterator = iter(seq_of_parameters)
+    except TypeError:
+        return DEFAULT, seq_of_parameters, lambda: 0
+
+    if iterator is not seq_of_parameters:
+        parameters = next(iterator, DEFAULT)
+
+        if hasattr(seq_of_parameters, '__len__'):
+            return (parameters, seq_of_parameters,
+                    functools.partial(len, seq_of_parameters))
+        return parameters, seq_of_parameters, lambda: None
+
+    try:
+        parameters = next(iterator)
+    except StopIteration:
+        return DEFAULT, seq_of_parameters, lambda: 0
+
+    # The sets of parameters are counted by pairing each with the next
+    # value from a counter, which unlike a generator keeps the iteration
+    # in C for the database client.
+
+    counter = itertools.count()
+    iterator = six.moves.map(operator.itemgetter(0), six.moves.zip(
+            itertools.chain((parameters,), iterator), counter))
+
+    return parameters, iterator, functools.partial(next, counter)
+
+
 class CursorWrapper(ObjectProxy):
 
     def __init__(self, cursor, dbapi2_module, connect_params, cursor_params):
@@ -43,20 +100,24 @@ class CursorWrapper(ObjectProxy):
                 return self.__wrapped__.execute(sql, **kwargs)
 
     def executemany(self, sql, seq_of_parameters):
-        try:
-            seq_of_parameters = list(seq_of_parameters)
-            parameters = seq_of_parameters[0]
-        except (TypeError, IndexError):
-            parameters = DEFAULT
+        parameters, seq_of_parameters, count = peek_parameters(
+                seq_of_parameters)
         if parameters is not DEFAULT:
-            with DatabaseTrace(sql, self._nr_dbapi2_module,
+            trace = DatabaseTrace(sql, self._nr_dbapi2_module,
                     self._nr_connect_params, self._nr_cursor_params,
-                    parameters, source=self.__wrapped__.executemany):
-                return self.__wrapped__.executemany(sql, seq_of_parameters)
+                    parameters, source=self.__wrapped__.executemany)
         else:
-            with DatabaseTrace(sql, self._nr_dbapi2_module,
-                    self._nr_connect_params, self._nr_cursor_params, source=self.__wrapped__.executemany):
+            trace = DatabaseTrace(sql, self._nr_dbapi2_module,
+                    self._nr_connect_params, self._nr_cursor_params,
+                    source=self.__wrapped__.executemany)
+        with trace:
+            try:
                 return self.__wrapped__.executemany(sql, seq_of_parameters)
+            finally:
+                batch_size = count()
+                if batch_size is not None:
+                    trace._add_agent_attribute('db.operation.batch.size',
+                            batch_size)
 
     def callproc(self, procname, parameters=DEFAULT):
         with DatabaseTrace('CALL %s' % procname,
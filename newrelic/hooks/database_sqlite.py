@@ -19,9 +19,8 @@ from newrelic.common.object_wrapper import wrap_object
 
 from newrelic.hooks.database_dbapi2 import (CursorWrapper as
         DBAPI2CursorWrapper, ConnectionWrapper as DBAPI2ConnectionWrapper,
-        ConnectionFactory as DBAPI2ConnectionFactory)
-
-DEFAULT = object()
+        ConnectionFactory as DBAPI2ConnectionFactory, DEFAULT,
+        peek_parameters)
 
 
 class CursorWrapper(DBAPI2CursorWrapper):
@@ -70,20 +69,24 @@ class ConnectionWrapper(DBAPI2ConnectionWrapper):
                 return self.__wrapped__.execute(sql)
 
     def executemany(self, sql, seq_of_parameters):
-        try:
-            seq_of_parameters = list(seq_of_parameters)
-            parameters = seq_of_parameters[0]
-        except (TypeError, IndexError):
-            parameters = DEFAULT
+        parameters, seq_of_parameters, count = peek_parameters(
+                seq_of_parameters)
         if parameters is not DEFAULT:
-            with DatabaseTrace(sql, self._nr_dbapi2_module,
+            trace = DatabaseTrace(sql, self._nr_dbapi2_module,
                     self._nr_connect_params, None,
-                    parameters, source=self.__wrapped__.executemany):
-                return self.__wrapped__.executemany(sql, seq_of_parameters)
+                    parameters, source=self.__wrapped__.executemany)
         else:
-            with DatabaseTrace(sql, self._nr_dbapi2_module,
-                    self._nr_connect_params, None, source=self.__wrapped__.executemany):
+            trace = DatabaseTrace(sql, self._nr_dbapi2_module,
+                    self._nr_connect_params, None,
+                    source=self.__wrapped__.executemany)
+        with trace:
+            try:
                 return self.__wrapped__.executemany(sql, seq_of_parameters)
+            finally:
+                batch_size = count()
+                if batch_size is not None:
+                    trace._add_agent_attribute('db.operation.batch.size',
+                            batch_size)
 
     def executescript(self, sql_script):
         with DatabaseTrace(sql_script, self._nr_dbapi2_module,
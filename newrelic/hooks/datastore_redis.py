@@ -204,11 +204,22 @@ def _instance_info(kwargs):
     return (host, port_path_or_id, db)
 
 
+def _pipeline_queues_commands(instance):
+    # A pipeline only queues up commands to be sent when it is executed,
+    # unless it is watching keys ahead of starting a transaction, in which
+    # case commands are sent immediately. Pipelines for a cluster cannot
+    # watch keys and so do not have these attributes.
+
+    return getattr(instance, "command_stack", None) is not None and not (
+        getattr(instance, "watching", False) and not getattr(instance, "explicit_transaction", False)
+    )
+
+
 def _wrap_Redis_method_wrapper_(module, instance_class_name, operation):
     def _nr_wrapper_Redis_method_(wrapped, instance, args, kwargs):
         transaction = current_transaction()
 
-        if transaction is None:
+        if transaction is None or _pipeline_queues_commands(instance):
             return wrapped(*args, **kwargs)
 
         dt = DatastoreTrace(product="Redis", target=None, operation=operation, source=wrapped)
@@ -229,7 +240,65 @@ def _wrap_Redis_method_wrapper_(module, instance_class_name, operation):
     wrap_function_wrapper(module, name, _nr_wrapper_Redis_method_)
 
 
+def _pipeline_commands(command_stack):
+    counts = {}
+
+    for args, _ in command_stack:
+        operation = args[0]
+        if isinstance(operation, bytes):
+            operation = operation.decode("utf-8", "replace")
+        operation = _redis_operation_re.sub("_", operation.strip().lower())
+        counts[operation] = counts.get(operation, 0) + 1
+
+    return ",".join("%s:%d" % item for item in sorted(counts.items()))
+
+
+def _nr_Pipeline_execute_wrapper_(wrapped, instance, args, kwargs):
+    transaction = current_transaction()
+
+    if transaction is None:
+        return wrapped(*args, **kwargs)
+
+    command_stack = getattr(instance, "command_stack", None)
+
+    if not command_stack:
+        return wrapped(*args, **kwargs)
+
+    host, port_path_or_id, db = (None, None, None)
+
+    try:
+        dt = transaction.settings.datastore_tracer
+        if dt.instance_reporting.enabled or dt.database_name_reporting.enabled:
+            conn_kwargs = instance.connection_pool.connection_kwargs
+            host, port_path_or_id, db = _instance_info(conn_kwargs)
+    except:
+        pass
+
+    # All the queued commands are sent to the server in one round trip, so
+    # are recorded as a single pipeline operation, with how many of each
+    # command there were.
+
+    trace = DatastoreTrace(
+        product="Redis",
+        target=None,
+        operation="pipeline",
+        host=host,
+        port_path_or_id=port_path_or_id,
+        database_name=db,
+        source=wrapped,
+    )
+
+    with trace:
+        trace._add_agent_attribute("db.operation.batch.size", len(command_stack))
+        trace._add_agent_attribute("redis.pipeline.commands", _pipeline_commands(command_stack))
+        return wrapped(*args, **kwargs)
+
+
 def instrument_redis_client(module):
+    for name in ("BasePipeline", "Pipeline"):
+        if hasattr(module, name) and "execute" in vars(getattr(module, name)):
+            wrap_function_wrapper(module, "%s.execute" % name, _nr_Pipeline_execute_wrapper_)
+
     if hasattr(module, "StrictRedis"):
         for name in _redis_client_methods:
             if name in vars(module.StrictRedis):
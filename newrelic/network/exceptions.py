@@ -23,4 +23,5 @@ class NetworkInterfaceException(Exception): pass
 class ForceAgentRestart(NetworkInterfaceException): pass
 class ForceAgentDisconnect(NetworkInterfaceException): pass
 class DiscardDataForRequest(NetworkInterfaceException): pass
+class PayloadTooLargeForRequest(DiscardDataForRequest): pass
 class RetryDataForRequest(NetworkInterfaceException): pass
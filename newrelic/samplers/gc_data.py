@@ -15,6 +15,7 @@
 import gc
 import os
 import platform
+import random
 import time
 from collections import Counter
 
@@ -24,6 +25,43 @@ from newrelic.core.stats_engine import CustomMetrics
 from newrelic.samplers.decorators import data_source_factory
 
 
+# Random number generator private to the agent so the sampling of objects
+# does not disturb the sequence of numbers seen by the application.
+
+_random = random.Random()
+
+
+def object_type_counts(objects, limit, sample_size=None):
+    """Returns the types with the highest count of objects and their counts.
+
+    Counting the type of every object tracked by the garbage collector takes
+    a long time in processes with many millions of objects, during which the
+    GIL is held and all other threads are stalled. When there are more
+    objects than the sample size, only that many objects, chosen at random
+    with replacement, are counted and the counts are extrapolated to the
+    total.
+
+    For a type making up a fraction p of the N objects, the extrapolated
+    count from a sample of k objects has a standard error of
+    N * sqrt(p * (1 - p) / k), which is at most N / (2 * sqrt(k)). For the
+    default sample size of 10000 this is at most 0.5% of the total number
+    of objects. Types whose counts differ by less than a few times this may
+    be reported in a different order, or swap places at the cutoff for the
+    highest types, when compared with an exact count.
+
+    """
+
+    total = len(objects)
+
+    if sample_size and sample_size > 0 and total > sample_size:
+        rand = _random.random
+        counts = Counter([type(objects[int(rand() * total)]) for _ in range(sample_size)])
+        scale = float(total) / sample_size
+        return [(obj_type, int(round(count * scale))) for obj_type, count in counts.most_common(limit)]
+
+    return Counter(map(type, objects)).most_common(limit)
+
+
 @data_source_factory(name="Garbage Collector Metrics")
 class _GCDataSource(object):
     def __init__(self, settings, environ):
@@ -45,6 +83,11 @@ class _GCDataSource(object):
         settings = global_settings()
         return settings.gc_runtime_metrics.top_object_count_limit
 
+    @property
+    def top_object_sample_size(self):
+        settings = global_settings()
+        return settings.gc_runtime_metrics.top_object_sample_size
+
     def record_gc(self, phase, info):
         if not self.enabled:
             return
@@ -92,9 +135,10 @@ class _GCDataSource(object):
 
         # Record object count for top five types with highest count
         if hasattr(gc, "get_objects"):
-            object_types = map(type, gc.get_objects())
             if self.top_object_count_limit > 0:
-                highest_types = Counter(object_types).most_common(self.top_object_count_limit)
+                highest_types = object_type_counts(
+                    gc.get_objects(), self.top_object_count_limit, self.top_object_sample_size
+                )
                 for obj_type, count in highest_types:
                     yield (
                         "GC/objects/%d/type/%s" % (self.pid, callable_name(obj_type)),
@@ -21,7 +21,8 @@ from newrelic.api.transaction import (add_custom_parameter,
         add_custom_parameters)
 from newrelic.api.wsgi_application import wsgi_application
 from newrelic.core.attribute import (truncate, sanitize, Attribute,
-    CastingFailureException, MAX_64_BIT_INT, _DESTINATIONS_WITH_EVENTS)
+    CastingFailureException, MAX_64_BIT_INT, _DESTINATIONS_WITH_EVENTS,
+    process_user_attribute)
 
 from newrelic.packages import six
 
@@ -513,3 +514,38 @@ class AttributeErrorString(object):
 def test_str_raises_attribute_error():
     with pytest.raises(CastingFailureException):
         sanitize(AttributeErrorString())
+
+
+
+class StrSubclass(str):
+    pass
+
+
+@pytest.mark.parametrize('name,value,expected', (
+    ('key', 'value', ('key', 'value')),
+    ('key', 'x' * 255, ('key', 'x' * 255)),
+    ('key', 'x' * 256, ('key', 'x' * 255)),
+    ('key', True, ('key', True)),
+    ('key', 1.5, ('key', 1.5)),
+    ('key', MAX_64_BIT_INT, ('key', MAX_64_BIT_INT)),
+    ('key', MAX_64_BIT_INT + 1, (None, None)),
+    ('key', -MAX_64_BIT_INT - 10, ('key', -MAX_64_BIT_INT - 10)),
+    ('k' * 255, 1, ('k' * 255, 1)),
+    ('k' * 256, 1, (None, None)),
+    ('key', StrSubclass('x' * 256), ('key', 'x' * 255)),
+    ('key', [1], ('key', '[1]')),
+    (1, 1, (None, None)),
+))
+def test_process_user_attribute(name, value, expected):
+    assert process_user_attribute(name, value) == expected
+
+
+@pytest.mark.skipif(six.PY2, reason='str is a byte string on Python 2')
+def test_process_user_attribute_multibyte():
+    snowman = u'\u2603'
+
+    # Each snowman is 3 bytes once encoded.
+    assert process_user_attribute('key', snowman * 85) == ('key', snowman * 85)
+    assert process_user_attribute('key', snowman * 86) == ('key', snowman * 85)
+    assert process_user_attribute(snowman * 85, 1) == (snowman * 85, 1)
+    assert process_user_attribute(snowman * 86, 1) == (None, None)
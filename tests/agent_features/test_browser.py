@@ -234,6 +234,46 @@ def test_html_insertion_yield_multi_no_head():
 
     response.mustcontain('NREUM HEADER', 'NREUM.info')
 
+@wsgi_application()
+def target_wsgi_application_yield_multi_split_body(environ, start_response):
+    status = '200 OK'
+
+    output = [b'<html><he', b'ad><title>RESPONSE</title></head><bo',
+            b'dy><p>', 128*1024*b'X', b'</p></body></html>']
+
+    response_headers = [('Content-Type', 'text/html; charset=utf-8'),
+                        ('Content-Length', str(len(b''.join(output))))]
+    start_response(status, response_headers)
+
+    for data in output:
+        yield data
+
+target_application_yield_multi_split_body = webtest.TestApp(
+        target_wsgi_application_yield_multi_split_body)
+
+_test_html_insertion_yield_multi_split_body_settings = {
+    'browser_monitoring.enabled': True,
+    'browser_monitoring.auto_instrument': True,
+    'js_agent_loader': u'<!-- NREUM HEADER -->',
+}
+
+@override_application_settings(
+    _test_html_insertion_yield_multi_split_body_settings)
+def test_html_insertion_yield_multi_split_body():
+    response = target_application_yield_multi_split_body.get('/', status=200)
+
+    assert 'Content-Type' in response.headers
+    assert 'Content-Length' in response.headers
+
+    # The head and body elements are split across the yielded strings,
+    # with the insertion being made after the head element even though
+    # it is only complete in a later string.
+
+    assert response.body.startswith(b'<html><head><script')
+    assert response.body.endswith(128*1024*b'X' + b'</p></body></html>')
+
+    response.mustcontain('NREUM HEADER', 'NREUM.info')
+
 @wsgi_application()
 def target_wsgi_application_unnamed_attachment_header(environ, start_response):
     status = '200 OK'
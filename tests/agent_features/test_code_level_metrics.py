@@ -12,8 +12,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import sys
 import sqlite3
+from collections import deque
 import newrelic.packages.six as six
 import pytest
 
@@ -22,6 +24,7 @@ from testing_support.validators.validate_span_events import validate_span_events
 
 from newrelic.api.background_task import background_task
 from newrelic.api.function_trace import FunctionTrace, FunctionTraceWrapper
+from newrelic.core.code_level_metrics import code_level_metrics_cache_stats, extract_code_from_callable
 
 from _test_code_level_metrics import exercise_function, CLASS_INSTANCE, CLASS_INSTANCE_CALLABLE, exercise_lambda, exercise_partial, ExerciseClass, ExerciseClassCallable, __file__ as FILE_PATH
 
@@ -206,4 +209,35 @@ def test_code_level_metrics_objects(obj, agents):
         with FunctionTrace("_test", source=obj):
             pass
     
-    _test()
\ No newline at end of file
+    _test()
+
+
+class SlotsCallable(object):
+    # Attributes can't be set on instances, but they can be weakly referenced.
+    __slots__ = ("__weakref__",)
+
+    def __call__(self):
+        pass
+
+
+SLOTS_CALLABLE = SlotsCallable()
+
+
+@pytest.mark.parametrize(
+    "factory",
+    (
+        lambda: deque().rotate,  # Builtin method, created on each lookup
+        lambda: SQLITE_CONNECTION.__exit__,
+        lambda: SLOTS_CALLABLE,
+        lambda: functools.partial(exercise_function),  # Partial, created on each use
+    ),
+)
+def test_code_level_metrics_cache(factory):
+    node = extract_code_from_callable(factory())
+
+    code_level_metrics_cache_stats()
+
+    for _ in range(3):
+        assert extract_code_from_callable(factory()) == node
+
+    assert code_level_metrics_cache_stats() == (3, 0)
@@ -0,0 +1,102 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.background_task import background_task
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
+from newrelic.api.function_trace import FunctionTrace
+from newrelic.api.memcache_trace import MemcacheTrace
+from newrelic.common.object_wrapper import transient_function_wrapper
+
+from testing_support.fixtures import override_application_settings
+
+_rollup_intrinsics = (
+    ('External/all', 'externalDuration', 'externalCallCount'),
+    ('Datastore/all', 'databaseDuration', 'databaseCallCount'),
+    ('Memcache/all', 'memcacheDuration', None),
+)
+
+
+def validate_event_rollup_intrinsics(call_counts):
+    @transient_function_wrapper('newrelic.core.stats_engine',
+            'StatsEngine.record_transaction')
+    def _validate_event_rollup_intrinsics(wrapped, instance, args, kwargs):
+        def _bind_params(transaction, *args, **kwargs):
+            return transaction
+
+        transaction = _bind_params(*args, **kwargs)
+
+        # The stats engine may already hold the metrics of a prior
+        # transaction, so only the change in the metrics is compared.
+
+        before = {}
+        for name, _, _ in _rollup_intrinsics:
+            stats = instance.stats_table.get((name, ''))
+            before[name] = stats and (stats.total_call_time,
+                    stats.call_count) or (0, 0)
+
+        result = wrapped(*args, **kwargs)
+
+        intrinsics = transaction.transaction_event()[0]
+
+        # The intrinsics accumulated as the nodes completed must match
+        # the rollup metrics derived from the nodes afterwards.
+
+        for name, call_time, call_count in _rollup_intrinsics:
+            stats = instance.stats_table[(name, '')]
+            total_call_time, previous_count = before[name]
+
+            assert intrinsics[call_time] == pytest.approx(
+                    stats.total_call_time - total_call_time)
+
+            if call_count:
+                assert intrinsics[call_count] == call_counts[call_count]
+                assert stats.call_count - previous_count == call_counts[call_count]
+
+        return result
+
+    return _validate_event_rollup_intrinsics
+
+
+@pytest.mark.parametrize('stats_shards', (False, True))
+def test_event_rollup_intrinsics(stats_shards):
+    @override_application_settings({'stats_shards.enabled': stats_shards})
+    @validate_event_rollup_intrinsics({
+        'externalCallCount': 2,
+        'databaseCallCount': 3,
+    })
+    @background_task()
+    def _test():
+        with FunctionTrace('connect', terminal=True,
+                rollup=['Datastore/all', 'Datastore/Redis/all']):
+            pass
+
+        for _ in range(2):
+            with DatastoreTrace('Redis', None, 'get'):
+                pass
+
+            with FunctionTrace('fetch'):
+                with ExternalTrace('library', 'http://example.com/'):
+                    pass
+
+        with MemcacheTrace('get'):
+            pass
+
+    # Recording a second transaction checks that the intrinsics of the
+    # first don't carry over, such as into a long lived stats shard.
+
+    _test()
+    _test()
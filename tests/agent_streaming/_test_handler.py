@@ -15,7 +15,22 @@
 from concurrent import futures
 
 import grpc
-from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span
+from newrelic.core.infinite_tracing_pb2 import RecordStatus, Span, SpanBatch
+
+# Sizes of the batches received by RecordSpanBatch, in order of arrival.
+RECEIVED_BATCH_SIZES = []
+
+
+def _abort_on_status_code(span, context):
+    # Returns True when the stream should be closed by the server.
+    status_code = span.intrinsics.get('status_code', None)
+    status_code = status_code and getattr(
+        grpc.StatusCode, status_code.string_value)
+    if status_code is grpc.StatusCode.OK:
+        return True
+    elif status_code:
+        context.abort(status_code, "Abort triggered by client")
+    return False
 
 
 def record_span(request, context):
@@ -24,24 +39,37 @@ def record_span(request, context):
     assert 'license_key' in metadata
 
     for span in request:
-        status_code = span.intrinsics.get('status_code', None)
-        status_code = status_code and getattr(
-            grpc.StatusCode, status_code.string_value)
-        if status_code is grpc.StatusCode.OK:
+        if _abort_on_status_code(span, context):
             break
-        elif status_code:
-            context.abort(status_code, "Abort triggered by client")
 
         yield RecordStatus(messages_seen=1)
 
 
+def record_span_batch(request, context):
+    metadata = dict(context.invocation_metadata())
+    assert 'agent_run_token' in metadata
+    assert 'license_key' in metadata
+
+    for span_batch in request:
+        RECEIVED_BATCH_SIZES.append(len(span_batch.spans))
+
+        for span in span_batch.spans:
+            if _abort_on_status_code(span, context):
+                return
+
+        yield RecordStatus(messages_seen=len(span_batch.spans))
+
+
 HANDLERS = (
     grpc.method_handlers_generic_handler(
         "com.newrelic.trace.v1.IngestService",
         {
             "RecordSpan": grpc.stream_stream_rpc_method_handler(
                 record_span, Span.FromString, RecordStatus.SerializeToString
-            )
+            ),
+            "RecordSpanBatch": grpc.stream_stream_rpc_method_handler(
+                record_span_batch, SpanBatch.FromString, RecordStatus.SerializeToString
+            ),
         },
     ),
 )
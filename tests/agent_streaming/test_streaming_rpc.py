@@ -13,10 +13,13 @@
 # limitations under the License.
 
 import threading
+import time
+
+import pytest
 
 from newrelic.core.agent_streaming import StreamingRpc
 from newrelic.common.streaming_utils import StreamBuffer
-from newrelic.core.infinite_tracing_pb2 import Span, AttributeValue
+from newrelic.core.infinite_tracing_pb2 import Span, SpanBatch, AttributeValue
 
 
 CONDITION_CLS = type(threading.Condition())
@@ -104,3 +107,171 @@ def test_close_while_awaiting_reconnect(mock_grpc_server, monkeypatch):
     rpc.close()
     # Make sure the processing_thread is closed
     assert not rpc.response_processing_thread.is_alive()
+
+
+def test_batched_spans_sent(mock_grpc_server):
+    from _test_handler import RECEIVED_BATCH_SIZES
+
+    del RECEIVED_BATCH_SIZES[:]
+
+    endpoint = "localhost:%s" % mock_grpc_server
+    stream_buffer = StreamBuffer(100, batching=True, batch_size=10, linger=0.01)
+
+    # Queue the spans before connecting so the batches sent do not depend
+    # on how quickly they are consumed.
+    for _ in range(25):
+        stream_buffer.put(Span(intrinsics={}, agent_attributes={}, user_attributes={}))
+
+    rpc = StreamingRpc(
+        endpoint, stream_buffer, DEFAULT_METADATA, record_metric, ssl=False
+    )
+
+    rpc.connect()
+
+    deadline = time.time() + 5
+    while sum(RECEIVED_BATCH_SIZES) < 25 and time.time() < deadline:
+        time.sleep(0.01)
+
+    rpc.close()
+
+    assert RECEIVED_BATCH_SIZES == [10, 10, 5]
+
+
+def test_batching_notifies_once_per_batch(monkeypatch):
+    notifications = []
+
+    class CountNotify(CONDITION_CLS):
+        def notify_all(self, *args, **kwargs):
+            notifications.append(None)
+            return super(CountNotify, self).notify_all(*args, **kwargs)
+
+    @staticmethod
+    def condition(*args, **kwargs):
+        return CountNotify(*args, **kwargs)
+
+    monkeypatch.setattr(StreamBuffer, "condition", condition)
+
+    stream_buffer = StreamBuffer(100, batching=True, batch_size=10)
+
+    for _ in range(25):
+        stream_buffer.put(Span())
+
+    # The consumer is woken by the first span and when a batch is full.
+    assert len(notifications) == 2
+
+
+def test_partial_batch_sent_after_linger():
+    stream_buffer = StreamBuffer(100, batching=True, batch_size=10, linger=0.05)
+    stream_buffer.put(Span(trace_id="a"))
+    stream_buffer.put(Span(trace_id="b"))
+
+    start = time.time()
+    batch = next(iter(stream_buffer))
+
+    assert time.time() - start >= 0.04
+    assert isinstance(batch, SpanBatch)
+    assert [span.trace_id for span in batch.spans] == ["a", "b"]
+    assert not stream_buffer._queue
+
+
+@pytest.mark.parametrize("compression", ("gzip", "deflate"))
+def test_compressed_stream(mock_grpc_server, buffer_empty_event, compression):
+    endpoint = "localhost:%s" % mock_grpc_server
+    stream_buffer = StreamBuffer(1)
+
+    rpc = StreamingRpc(
+        endpoint,
+        stream_buffer,
+        DEFAULT_METADATA,
+        record_metric,
+        ssl=False,
+        compression=compression,
+        keepalive_time=30,
+        keepalive_timeout=5,
+        window_size=1 << 20,
+    )
+
+    rpc.connect()
+
+    buffer_empty_event.clear()
+    stream_buffer.put(Span(intrinsics={}, agent_attributes={}, user_attributes={}))
+
+    assert buffer_empty_event.wait(5)
+    rpc.close()
+
+
+def test_channel_options():
+    rpc = StreamingRpc(
+        "localhost:1",
+        StreamBuffer(1),
+        DEFAULT_METADATA,
+        record_metric,
+        ssl=False,
+        compression="unknown",
+        keepalive_time=30,
+        keepalive_timeout=2.5,
+        window_size=1024,
+    )
+    rpc.close()
+
+    assert rpc._compression is None
+    assert rpc._options == [
+        ("grpc.enable_retries", 0),
+        ("grpc.keepalive_time_ms", 30000),
+        ("grpc.keepalive_timeout_ms", 2500),
+        ("grpc.http2.lookahead_bytes", 1024),
+        ("grpc.http2.bdp_probe", 0),
+    ]
+
+
+def test_priority_drop_policy():
+    stream_buffer = StreamBuffer(3, drop_policy="priority")
+
+    for name, priority in (("a", 1.0), ("b", 0.5), ("c", 1.5), ("d", 0.1), ("e", 1.2), ("f", 1.0)):
+        stream_buffer.put(name, priority=priority)
+
+    # d is never queued. Then b and a are shed, a being older than f.
+    queue = stream_buffer._queue
+    assert [queue.popleft() for _ in range(len(queue))] == ["c", "e", "f"]
+    assert stream_buffer.stats() == (6, 3, {"Priority": 3})
+    assert stream_buffer.stats() == (0, 0, {})
+
+
+def test_priority_drop_policy_after_consume():
+    stream_buffer = StreamBuffer(2, drop_policy="priority")
+    queue = stream_buffer._queue
+
+    stream_buffer.put("a", priority=0.1)
+    stream_buffer.put("b", priority=0.2)
+    assert queue.popleft() == "a"
+
+    # The consumed item is not counted against the queue or shed again.
+    stream_buffer.put("c", priority=0.5)
+    stream_buffer.put("d", priority=0.9)
+
+    assert [queue.popleft() for _ in range(len(queue))] == ["c", "d"]
+    assert stream_buffer.stats() == (4, 3, {"Priority": 1})
+
+
+def test_priority_drop_policy_bounded():
+    stream_buffer = StreamBuffer(10, drop_policy="priority")
+    queue = stream_buffer._queue
+
+    # Shed items must not be held on to while nothing consumes the queue.
+    for i in range(1000):
+        stream_buffer.put(i, priority=float(i))
+
+    assert len(queue) == 10
+    assert len(queue._heap) <= 20
+    assert len(queue._entries) <= 20
+    assert [queue.popleft() for _ in range(len(queue))] == list(range(990, 1000))
+
+
+def test_oldest_drop_policy():
+    stream_buffer = StreamBuffer(3)
+
+    for name in "abcde":
+        stream_buffer.put(name, priority=2.0)
+
+    assert list(stream_buffer._queue) == ["c", "d", "e"]
+    assert stream_buffer.stats() == (5, 3, {"QueueFull": 2})
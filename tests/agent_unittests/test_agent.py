@@ -73,3 +73,42 @@ def test_agent_final_harvest(agent):
 
     assert agent._applications['fake'].harvest_flexible == 1
     assert agent._applications['fake'].harvest_default == 1
+
+
+class BlockingApplication(FakeApplication):
+    def __init__(self, name, started, release):
+        super(BlockingApplication, self).__init__()
+        self.name = name
+        self.started = started
+        self.release = release
+        self.harvest_start = None
+
+    def harvest(self, shutdown=False, flexible=False, harvest_start=None):
+        # Each application can only complete its harvest once the other
+        # one has started, which requires them to be run in parallel.
+        self.started.set()
+        assert self.release.wait(5.0)
+        self.harvest_start = harvest_start
+        super(BlockingApplication, self).harvest(shutdown, flexible)
+
+
+@override_generic_settings(SETTINGS, {'harvest_executor.max_workers': 2})
+def test_agent_parallel_harvest():
+    import threading
+
+    agent = FakeAgent(SETTINGS)
+    first, second = threading.Event(), threading.Event()
+    agent._applications = {
+        'first': BlockingApplication('first', first, second),
+        'second': BlockingApplication('second', second, first),
+    }
+
+    agent._harvest_default()
+
+    for application in agent._applications.values():
+        assert application.harvest_default == 1
+        assert application.harvest_start == agent._last_default_harvest
+
+    assert agent._harvest_executor is not None
+    agent._harvest_default(shutdown=True)
+    assert agent._harvest_executor is None
@@ -22,7 +22,11 @@ import pytest
 
 from newrelic.common import certs, system_info
 from newrelic.common.agent_http import DeveloperModeClient
-from newrelic.common.encoding_utils import json_decode, serverless_payload_decode
+from newrelic.common.encoding_utils import (
+    json_decode,
+    json_encode,
+    serverless_payload_decode,
+)
 from newrelic.common.utilization import CommonUtilization
 from newrelic.core.agent_protocol import AgentProtocol, ServerlessModeProtocol
 from newrelic.core.config import finalize_application_settings, global_settings
@@ -205,6 +209,29 @@ def test_send(status_code):
     assert protocol.finalize() is None
 
 
+def test_send_streaming_payload():
+    class StreamingClientRecorder(HttpClientRecorder):
+        STREAMING_PAYLOADS = True
+
+    HttpClientRecorder.STATUS_CODE = 202
+    settings = finalize_application_settings(
+        {
+            "streaming_payload_encoder.enabled": True,
+            "streaming_payload_encoder.chunk_size": 16,
+        }
+    )
+    protocol = AgentProtocol(settings, client_cls=StreamingClientRecorder)
+    payload = ("RUN_TOKEN", 1.0, 2.0, (({"name": "metric-%d" % i}, [i, 1.5]) for i in range(10)))
+    protocol.send("metric_data", payload)
+
+    request = HttpClientRecorder.SENT[-1]
+    chunks = list(request.payload)
+    assert len(chunks) > 1
+
+    payload = ("RUN_TOKEN", 1.0, 2.0, [({"name": "metric-%d" % i}, [i, 1.5]) for i in range(10)])
+    assert b"".join(chunks) == json_encode(payload).encode("utf-8")
+
+
 @pytest.mark.parametrize(
     "status_code,expected_exc,log_level",
     (
@@ -0,0 +1,158 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import namedtuple
+
+import pytest
+
+from newrelic.core.aggregate_node import AggregateNode, aggregate_child
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.datastore_node import DatastoreNode
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.stats_engine import StatsEngine
+
+Root = namedtuple("Root", ["path", "type"])
+
+ROOT = Root(path="WebTransaction/Function/root", type="WebTransaction")
+
+
+def function_node(name, start_time, duration, children=(), rollup=None):
+    return FunctionNode(
+        group="Function",
+        name=name,
+        children=list(children),
+        start_time=start_time,
+        end_time=start_time + duration,
+        duration=duration,
+        exclusive=duration,
+        label=None,
+        params=None,
+        rollup=rollup,
+        guid="%016x" % int(start_time * 1000),
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def datastore_node(operation, start_time, duration):
+    return DatastoreNode(
+        product="Redis",
+        target=None,
+        operation=operation,
+        children=[],
+        start_time=start_time,
+        end_time=start_time + duration,
+        duration=duration,
+        exclusive=duration,
+        host="redis-host",
+        port_path_or_id="6379",
+        database_name=None,
+        guid="%016x" % int(start_time * 1000),
+        agent_attributes={},
+        user_attributes={},
+    )
+
+
+def add_children(nodes):
+    children = []
+    for node in nodes:
+        if not aggregate_child(children, node):
+            children.append(node)
+    return children
+
+
+def stats_table(nodes, compact):
+    settings = finalize_application_settings()
+    settings.compact_metric_table.enabled = compact
+
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+
+    for node in nodes:
+        stats.record_time_metrics(node.time_metrics(stats, ROOT, None))
+
+    return dict(((key["name"], key["scope"]), list(value)) for key, value in stats.metric_data())
+
+
+def test_consecutive_siblings_aggregated():
+    nodes = [
+        function_node("a", 1.0, 0.1),
+        function_node("a", 1.1, 0.3),
+        function_node("a", 1.4, 0.2),
+        function_node("b", 1.6, 0.1),
+        function_node("a", 1.7, 0.1),
+    ]
+
+    children = add_children(nodes)
+
+    assert [type(child) for child in children] == [AggregateNode, FunctionNode, FunctionNode]
+
+    aggregate = children[0]
+    assert aggregate.name == "a"
+    assert aggregate.guid == nodes[0].guid
+    assert aggregate.count == 3
+    assert aggregate.start_time == 1.0
+    assert aggregate.end_time == pytest.approx(1.6)
+    assert aggregate.duration == pytest.approx(0.6)
+    assert aggregate.min_duration == 0.1
+    assert aggregate.max_duration == 0.3
+
+
+@pytest.mark.parametrize(
+    "nodes",
+    (
+        [function_node("a", 1.0, 0.1), function_node("a", 1.1, 0.1, rollup="Function/all")],
+        [function_node("a", 1.0, 0.1, [function_node("c", 1.0, 0.1)]), function_node("a", 1.1, 0.1)],
+        [function_node("a", 1.0, 0.1), function_node("a", 1.1, 0.1, [function_node("c", 1.1, 0.1)])],
+        [datastore_node("get", 1.0, 0.1), datastore_node("set", 1.1, 0.1)],
+    ),
+)
+def test_siblings_not_aggregated(nodes):
+    assert add_children(nodes) == nodes
+
+
+@pytest.mark.parametrize("compact", (False, True))
+@pytest.mark.parametrize(
+    "nodes",
+    (
+        [function_node("a", 1.0 + i / 10.0, 0.01 * (i + 1), rollup="Custom/all") for i in range(10)],
+        [datastore_node("get", 1.0 + i / 10.0, 0.01 * (i + 1)) for i in range(10)],
+    ),
+)
+def test_time_metrics_preserved(nodes, compact):
+    children = add_children(nodes)
+    assert len(children) == 1
+
+    expected = stats_table(nodes, compact)
+    actual = stats_table(children, compact)
+
+    assert sorted(actual) == sorted(expected)
+    for key, value in expected.items():
+        assert actual[key] == pytest.approx(value)
+
+
+def test_aggregate_span_event():
+    settings = finalize_application_settings()
+    nodes = [function_node("a", 1.0, 0.1), function_node("a", 1.1, 0.3)]
+    aggregate = add_children(nodes)[0]
+
+    i_attrs, _, a_attrs = aggregate.span_event(settings, parent_guid="parent")
+
+    assert i_attrs["name"] == "Function/a"
+    assert i_attrs["guid"] == nodes[0].guid
+    assert i_attrs["parentId"] == "parent"
+    assert i_attrs["duration"] == pytest.approx(0.4)
+    assert a_attrs["aggregate.count"] == 2
+    assert a_attrs["aggregate.minDuration"] == 0.1
+    assert a_attrs["aggregate.maxDuration"] == 0.3
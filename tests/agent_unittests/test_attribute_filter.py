@@ -0,0 +1,116 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+import itertools
+
+import pytest
+
+from newrelic.core.attribute import AttributeDestinationCache
+from newrelic.core.attribute_filter import (
+    DST_ALL,
+    DST_ERROR_COLLECTOR,
+    DST_SPAN_EVENTS,
+    DST_TRANSACTION_EVENTS,
+    AttributeFilter,
+)
+
+SETTINGS = {
+    "attributes.enabled": True,
+    "attributes.include": ["request.*", "request.headers.accept"],
+    "attributes.exclude": ["request.headers.*", "*", "user"],
+    "transaction_events.attributes.enabled": True,
+    "transaction_events.attributes.include": ["user*", "request.headers.*"],
+    "transaction_events.attributes.exclude": ["request.headers.cookie"],
+    "error_collector.attributes.enabled": True,
+    "error_collector.attributes.exclude": ["request.*"],
+    "span_events.attributes.enabled": True,
+    "span_events.attributes.include": ["request.uri"],
+}
+
+NAMES = (
+    "",
+    "user",
+    "user.id",
+    "request",
+    "request.uri",
+    "request.headers",
+    "request.headers.accept",
+    "request.headers.cookie",
+    "request.headers.host",
+    "response.status",
+    "other",
+)
+
+
+def apply_rules(attribute_filter, name, default_destinations):
+    # Linear application of the sorted rules, as per the attributes spec.
+    destinations = attribute_filter.enabled_destinations & default_destinations
+    for rule in attribute_filter.rules:
+        if rule.name_match(name):
+            if rule.is_include:
+                destinations |= rule.destinations & attribute_filter.enabled_destinations
+            else:
+                destinations &= ~rule.destinations
+    return destinations
+
+
+@pytest.mark.parametrize(
+    "name,default_destinations",
+    itertools.product(NAMES, (DST_ALL, DST_TRANSACTION_EVENTS | DST_ERROR_COLLECTOR, DST_SPAN_EVENTS)),
+)
+def test_apply_matches_rules(name, default_destinations):
+    attribute_filter = AttributeFilter(SETTINGS)
+    expected = apply_rules(attribute_filter, name, default_destinations)
+
+    assert attribute_filter.apply(name, default_destinations) == expected
+    assert attribute_filter.apply(name, default_destinations) == expected
+
+
+def test_apply_cache_is_bounded():
+    settings = dict(SETTINGS)
+    settings["attributes.filter_cache_size"] = 4
+    attribute_filter = AttributeFilter(settings)
+
+    for i in range(10):
+        attribute_filter.apply("custom.%d" % i, DST_ALL)
+
+    assert len(attribute_filter.cache) == 4
+    assert attribute_filter.cache.stats() == (0, 10, 6)
+
+
+def test_copy_resets_cache():
+    attribute_filter = AttributeFilter(SETTINGS)
+    attribute_filter.apply("user", DST_ALL)
+
+    copied = copy.deepcopy(attribute_filter)
+
+    assert len(copied.cache) == 0
+    assert copied.apply("user", DST_ALL) == attribute_filter.apply("user", DST_ALL)
+
+
+def test_destination_cache():
+    attribute_filter = AttributeFilter(SETTINGS)
+    destination_cache = AttributeDestinationCache(attribute_filter)
+
+    for _ in range(3):
+        for name in NAMES:
+            assert destination_cache.apply(name, DST_ALL) == attribute_filter.apply(name, DST_ALL)
+
+    # Only the first lookup of each name through the destination cache
+    # reaches the attribute filter.
+    attribute_filter.cache.stats()
+    for name in NAMES:
+        destination_cache.apply(name, DST_ALL)
+    assert attribute_filter.cache.stats() == (0, 0, 0)
@@ -0,0 +1,104 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import copy
+
+import pytest
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.metric import ApdexMetric, TimeMetric
+from newrelic.core.stats_engine import (
+    ApdexStats,
+    CompactMetricTable,
+    StatsEngine,
+    TimeStats,
+)
+
+
+def create_stats_engine(compact):
+    settings = finalize_application_settings()
+    settings.compact_metric_table.enabled = compact
+
+    stats = StatsEngine()
+    stats.reset_stats(settings)
+    return stats
+
+
+def record_metrics(stats, offset=0):
+    for i in range(10):
+        duration = (i + offset) / 10.0
+        stats.record_time_metric(TimeMetric(name="Function/%d" % (i % 4), scope="", duration=duration, exclusive=None))
+        stats.record_time_metric(
+            TimeMetric(name="Function/%d" % (i % 3), scope="WebTransaction/foo", duration=duration, exclusive=0.0)
+        )
+        stats.record_apdex_metric(
+            ApdexMetric(name="Apdex", satisfying=i % 2, tolerating=1 - i % 2, frustrating=0, apdex_t=0.1 * (i + 1))
+        )
+        stats.record_custom_metric("Custom/Value", i + offset)
+        stats.record_custom_metric("Custom/Count", {"count": 2})
+
+
+def metric_data(stats, normalizer=None):
+    return sorted(
+        ((key["name"], key["scope"]), list(value)) for key, value in stats.metric_data(normalizer=normalizer)
+    )
+
+
+@pytest.mark.parametrize("normalizer", (None, lambda name: (name.rsplit("/", 1)[0], False)))
+def test_compact_metric_table_metric_data(normalizer):
+    results = []
+
+    for compact in (False, True):
+        stats = create_stats_engine(compact)
+        record_metrics(stats)
+
+        other = create_stats_engine(compact)
+        record_metrics(other, offset=5)
+        other.record_time_metric(TimeMetric(name="Function/other", scope="", duration=1.0, exclusive=None))
+
+        stats.merge_metric_stats(other)
+        stats.merge_custom_metrics([("Custom/Merged", TimeStats(1, 2.0, 2.0, 2.0, 2.0, 4.0))])
+
+        assert isinstance(stats.stats_table, CompactMetricTable) is compact
+
+        results.append(metric_data(stats, normalizer))
+
+    assert results[0] == results[1]
+
+
+def test_compact_metric_table_mapping():
+    table = CompactMetricTable()
+    table[("Function/foo", "")] = TimeStats(1, 1.0, 0.5, 1.0, 1.0, 1.0)
+    table[("Apdex", "")] = ApdexStats(1, 0, 0, 0.5)
+
+    assert len(table) == 2
+    assert ("Function/foo", "") in table
+    assert table.get(("Function/bar", "")) is None
+
+    stats = table[("Function/foo", "")]
+    stats.merge_raw_time_metric(2.0)
+
+    assert stats.call_count == 2
+    assert stats.total_call_time == 3.0
+    assert stats.max_call_time == 2.0
+
+    # Copies are detached from the table.
+    snapshot = copy.copy(stats)
+    stats.merge_raw_time_metric(2.0)
+
+    assert isinstance(snapshot, TimeStats)
+    assert snapshot.call_count == 2
+    assert table[("Function/foo", "")].call_count == 3
+
+    assert table[("Apdex", "")] == [1, 0, 0, 0.5, 0.5, 0]
@@ -0,0 +1,61 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+import pytest
+
+import newrelic.common.entry_points as entry_points
+from newrelic.common.entry_points import EntryPoint, iter_entry_points
+
+ENTRY_POINTS_TXT = """\
+[newrelic.hooks]
+mylib = mylib_newrelic.hooks
+mylib.client = mylib_newrelic.hooks:instrument_client
+mylib.extra = mylib_newrelic.hooks:Hooks.instrument [extra]
+
+[newrelic.extension]
+mylib = mylib_newrelic.extension
+"""
+
+
+@pytest.fixture
+def distribution(tmpdir, monkeypatch):
+    # Two copies of the same distribution reachable from sys.path.
+
+    for name in ("first", "second"):
+        dist_info = tmpdir.mkdir(name).mkdir("mylib_newrelic-1.0.dist-info")
+        dist_info.join("METADATA").write("Metadata-Version: 2.1\nName: mylib_newrelic\nVersion: 1.0\n")
+        dist_info.join("entry_points.txt").write(ENTRY_POINTS_TXT)
+        monkeypatch.syspath_prepend(str(tmpdir.join(name)))
+
+    monkeypatch.setattr(entry_points, "_importlib_entry_points_cache", None)
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires importlib.metadata")
+def test_iter_entry_points(distribution):
+    assert sorted(iter_entry_points("newrelic.hooks")) == [
+        EntryPoint("mylib", "mylib_newrelic.hooks", ()),
+        EntryPoint("mylib.client", "mylib_newrelic.hooks", ("instrument_client",)),
+        EntryPoint("mylib.extra", "mylib_newrelic.hooks", ("Hooks", "instrument")),
+    ]
+    assert list(iter_entry_points("newrelic.extension")) == [EntryPoint("mylib", "mylib_newrelic.extension", ())]
+    assert list(iter_entry_points("newrelic.unknown")) == []
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8), reason="Requires importlib.metadata")
+def test_pkg_resources_not_imported(distribution, monkeypatch):
+    monkeypatch.delitem(sys.modules, "pkg_resources", raising=False)
+    list(iter_entry_points("newrelic.hooks"))
+    assert "pkg_resources" not in sys.modules
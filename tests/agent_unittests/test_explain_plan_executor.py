@@ -0,0 +1,203 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from newrelic.core import stats_engine as stats_engine_module
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.database_node import SlowSqlNode
+from newrelic.core.database_utils import ExplainPlanExecutor
+from newrelic.core.stats_engine import StatsEngine
+
+
+class DatabaseModule(object):
+    """Stands in for an instrumented DBAPI2 module, where each connection
+    takes a while to be made and is counted.
+
+    """
+
+    __name__ = "sqlite3"
+
+    _nr_database_product = "SQLite"
+    _nr_quoting_style = "single"
+    _nr_explain_query = "EXPLAIN QUERY PLAN"
+    _nr_explain_stmts = ("select",)
+
+    NotSupportedError = sqlite3.NotSupportedError
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.connects = 0
+        self.lock = threading.Lock()
+
+    def connect(self, *args, **kwargs):
+        with self.lock:
+            self.connects += 1
+        time.sleep(self.latency)
+        kwargs["check_same_thread"] = False
+        return sqlite3.connect(*args, **kwargs)
+
+
+def slow_sql_node(dbapi2_module, sql, connect_params=((":memory:",), {})):
+    return SlowSqlNode(
+        duration=1.0,
+        path="WebTransaction/Function/orders",
+        request_uri="/orders",
+        sql=sql,
+        sql_format="raw",
+        metric="Datastore/statement/SQLite/sqlite_master/select",
+        dbapi2_module=dbapi2_module,
+        stack_trace=None,
+        connect_params=connect_params,
+        cursor_params=None,
+        sql_parameters=None,
+        execute_params=None,
+        host=None,
+        port_path_or_id=None,
+        database_name=None,
+        params={},
+    )
+
+
+@pytest.fixture
+def executor():
+    executor = ExplainPlanExecutor(max_workers=2, max_connections=4, cache_ttl=60.0)
+    yield executor
+    executor.shutdown()
+
+
+def test_explain_plan(executor):
+    node = slow_sql_node(DatabaseModule(), "SELECT * FROM sqlite_master")
+
+    columns, rows = executor.explain_plan(node, timeout=5.0)
+
+    assert "detail" in columns
+    assert rows
+    assert executor.cache_stats() == (1, 0)
+
+
+def test_explain_plan_cached(executor):
+    dbapi2_module = DatabaseModule()
+    node = slow_sql_node(dbapi2_module, "SELECT * FROM sqlite_master")
+
+    expected = executor.explain_plan(node, timeout=5.0)
+    executor.submit(node)
+
+    assert executor.explain_plan(node) == expected
+    assert dbapi2_module.connects == 1
+    assert executor.cache_stats() == (2, 0)
+
+
+def test_explain_plan_cache_expires():
+    executor = ExplainPlanExecutor(max_workers=1, max_connections=1, cache_ttl=0.0)
+    dbapi2_module = DatabaseModule()
+    node = slow_sql_node(dbapi2_module, "SELECT * FROM sqlite_master")
+
+    expected = executor.explain_plan(node, timeout=5.0)
+    (thread,) = executor._threads
+
+    # The expired explain plan is still returned while it is run again in
+    # the background, reusing the connection kept by the worker thread.
+
+    assert executor.explain_plan(node) == expected
+
+    executor.shutdown()
+    thread.join(5.0)
+
+    assert not executor._pending
+    assert dbapi2_module.connects == 1
+
+
+def test_explain_plan_not_ready(executor):
+    node = slow_sql_node(DatabaseModule(latency=0.5), "SELECT * FROM sqlite_master")
+
+    start = time.time()
+    assert executor.explain_plan(node, timeout=0.0) is None
+    assert time.time() - start < 0.25
+
+    assert executor.explain_plan(node, timeout=5.0)
+    assert executor.cache_stats() == (1, 1)
+
+
+def test_explain_plans_run_concurrently(executor):
+    dbapi2_module = DatabaseModule(latency=0.5)
+    nodes = [
+        slow_sql_node(dbapi2_module, "SELECT * FROM sqlite_master"),
+        slow_sql_node(dbapi2_module, "SELECT name FROM sqlite_master"),
+    ]
+
+    start = time.time()
+    for node in nodes:
+        executor.submit(node)
+    for node in nodes:
+        assert executor.explain_plan(node, timeout=5.0)
+
+    assert time.time() - start < 0.9
+    assert dbapi2_module.connects == 2
+
+
+def test_explain_plan_after_fork(executor, monkeypatch):
+    node = slow_sql_node(DatabaseModule(), "SELECT * FROM sqlite_master")
+
+    # Mimic the state left in a forked child process, where the worker
+    # threads of the parent no longer exist, along with any explain plan
+    # they were running.
+
+    thread = threading.Thread(target=lambda: None)
+    thread.start()
+    thread.join()
+
+    executor._threads = [thread, thread]
+    executor._pending.add((node.identifier, node.sql_format))
+    monkeypatch.setattr(executor, "_pid", -1)
+
+    assert executor.explain_plan(node, timeout=5.0)
+    assert thread not in executor._threads
+
+
+def test_record_slow_sql_node_submits(monkeypatch):
+    submitted = []
+
+    class Executor(object):
+        def submit(self, node):
+            submitted.append(node)
+
+    monkeypatch.setattr(stats_engine_module, "explain_plan_executor", Executor)
+
+    stats = StatsEngine()
+    stats.reset_stats(finalize_application_settings())
+
+    node = slow_sql_node(DatabaseModule(), "SELECT * FROM sqlite_master")
+    stats.record_slow_sql_node(node)
+    stats.record_slow_sql_node(node)
+
+    assert submitted == [node]
+
+
+@pytest.mark.parametrize(
+    "sql,connect_params",
+    (
+        ("SELECT * FROM sqlite_master", None),
+        ("DELETE FROM orders", ((":memory:",), {})),
+    ),
+)
+def test_explain_plan_not_supported(executor, sql, connect_params):
+    node = slow_sql_node(DatabaseModule(), sql, connect_params)
+
+    assert executor.explain_plan(node, timeout=5.0) is None
+    assert not executor._threads
@@ -14,6 +14,7 @@
 
 import random
 import tempfile
+import threading
 import time
 
 import pytest
@@ -158,6 +159,7 @@ def transaction_node(request):
         root_span_guid=None,
         trace_id="4485b89db608aece",
         loop_time=0.0,
+        event_rollups={},
     )
     return node
 
@@ -410,6 +412,44 @@ def test_application_harvest_with_span_streaming(span_queue_size, spans_to_send,
     _test()
 
 
+@pytest.mark.parametrize(
+    "drop_policy, dropped_metric",
+    (
+        ("oldest", "Supportability/InfiniteTracing/Span/Dropped/QueueFull"),
+        ("priority", "Supportability/InfiniteTracing/Span/Dropped/Priority"),
+    ),
+)
+def test_application_harvest_with_span_streaming_dropped(drop_policy, dropped_metric):
+    @override_generic_settings(
+        settings,
+        {
+            "developer_mode": True,
+            "distributed_tracing.enabled": True,
+            "span_events.enabled": True,
+            "infinite_tracing._trace_observer_host": "x",
+            "infinite_tracing.span_queue_size": 7,
+            "infinite_tracing.drop_policy": drop_policy,
+        },
+    )
+    @validate_metric_payload(
+        metrics=[
+            ("Supportability/InfiniteTracing/Span/Seen", 10),
+            ("Supportability/InfiniteTracing/Span/Sent", 7),
+            (dropped_metric, 3),
+        ],
+        endpoints_called=[],
+    )
+    def _test():
+        app = Application("Python Agent Test (Harvest Loop)")
+        app.connect_to_data_collector(None)
+
+        for i in range(10):
+            app._stats_engine.span_stream.put(None, priority=i / 10.0)
+        app.harvest()
+
+    _test()
+
+
 @failing_endpoint("metric_data")
 @pytest.mark.parametrize("span_events_enabled", (True, False))
 def test_failed_spans_harvest(span_events_enabled):
@@ -472,6 +512,61 @@ def test_transaction_count(transaction_node):
     assert app._transaction_count == 0
 
 
+@override_generic_settings(
+    settings,
+    {
+        "developer_mode": True,
+        "license_key": "**NOT A LICENSE KEY**",
+        "feature_flag": set(),
+        "collect_custom_events": False,
+        "application_logging.forwarding.enabled": False,
+        "stats_shards.enabled": True,
+    },
+)
+def test_stats_shards(transaction_node):
+    app = Application("Python Agent Test (Harvest Loop)")
+    app.connect_to_data_collector(None)
+
+    def record_transactions():
+        for _ in range(5):
+            app.record_transaction(transaction_node)
+
+    threads = [threading.Thread(target=record_transactions) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    app.record_transaction(transaction_node)
+
+    # Transactions are recorded into a shard per thread and not into
+    # the application stats engine until a harvest is performed.
+    assert len(app._stats_shards) == 5
+    assert app._transaction_count == 0
+    assert app._stats_engine.transaction_events.num_seen == 0
+
+    app._merge_stats_shards()
+
+    assert app._transaction_count == 21
+    assert app._stats_engine.transaction_events.num_seen == 21
+
+    stats = app._stats_engine.stats_table[("OtherTransaction/Function/main", "")]
+    assert stats.call_count == 21
+
+    # Shards for threads which have exited are discarded.
+    assert len(app._stats_shards) == 1
+
+    app.harvest()
+
+    assert app._transaction_count == 0
+
+    app.record_transaction(transaction_node)
+    app.harvest()
+
+    assert app._transaction_count == 0
+    assert len(app._stats_shards) == 1
+
+
 @override_generic_settings(
     settings,
     {
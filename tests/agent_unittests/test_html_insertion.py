@@ -0,0 +1,93 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.api.html_insertion import HTMLInsertionScanner, insert_html_snippet
+
+SNIPPET = b"<!-- NREUM -->"
+
+_documents = (
+    (b"<html><body><p>RESPONSE</p></body></html>", b"<html><!-- NREUM --><body>"),
+    (b"<html><head></head><body></body></html>", b"<html><head><!-- NREUM --></head>"),
+    (
+        b'<html><head lang="en"><title>Page</title><meta charset="utf-8">'
+        b'<meta http-equiv="X-UA-Compatible" content="IE=edge"></head>'
+        b'<body class="page"><p>RESPONSE</p></body></html>',
+        b'content="IE=edge"><!-- NREUM --></head>',
+    ),
+    (
+        b'<html><head><meta http-equiv="X-UA-Compatible" content="IE=edge">'
+        b'<meta charset="utf-8"></head><body></body></html>',
+        b'<meta charset="utf-8"><!-- NREUM --></head>',
+    ),
+    (
+        b"<html><head></head><body><meta charset='utf-8'></body></html>",
+        b"<head><!-- NREUM --></head>",
+    ),
+    (
+        b'<html><head><meta http-equiv="content-disposition" content="attachment; filename=x.html">'
+        b"</head><body></body></html>",
+        None,
+    ),
+)
+
+
+def chunked(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("data,expected", _documents)
+def test_insert_html_snippet(data, expected):
+    result = insert_html_snippet(data, lambda: SNIPPET)
+
+    if expected is None:
+        assert result == data
+    else:
+        assert expected in result
+        assert result.replace(SNIPPET, b"") == data
+
+
+@pytest.mark.parametrize("data,expected", _documents)
+def test_scanner_matches_across_chunks(data, expected):
+    result = insert_html_snippet(data, lambda: SNIPPET)
+    index = result.find(SNIPPET) if result != data else None
+
+    # Every possible split of the response into chunks of the one size
+    # must find the same insertion point, including where the tags are
+    # split across chunks.
+
+    for size in range(1, len(data) + 1):
+        scanner = HTMLInsertionScanner()
+
+        for chunk in chunked(data, size):
+            if scanner.scan(chunk):
+                break
+
+        assert scanner.body is not None, size
+        assert scanner.insertion_point() == index, size
+
+
+def test_scanner_search_limit():
+    data = 64 * b" " + b"<body></body>"
+
+    scanner = HTMLInsertionScanner(search_limit=64)
+
+    assert not scanner.scan(data[:32])
+    assert scanner.scan(data[32:])
+    assert scanner.body is None
+    assert scanner.insertion_point() is None
+
+    assert insert_html_snippet(data, lambda: SNIPPET, search_limit=64) == data
+    assert insert_html_snippet(data[:40], lambda: SNIPPET, search_limit=64) is None
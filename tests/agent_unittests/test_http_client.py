@@ -32,7 +32,11 @@ from newrelic.common.agent_http import (
     InsecureHttpClient,
     ServerlessModeClient,
 )
-from newrelic.common.encoding_utils import ensure_str
+from newrelic.common.encoding_utils import (
+    ensure_str,
+    json_encode,
+    json_encode_chunks,
+)
 from newrelic.common.object_names import callable_name
 from newrelic.core.internal_metrics import InternalTraceContext
 from newrelic.core.stats_engine import CustomMetrics
@@ -342,6 +346,63 @@ def test_http_payload_compression(server, client_cls, method, threshold):
     assert sent_payload == payload
 
 
+@pytest.mark.parametrize(
+    "method,threshold",
+    (
+        ("gzip", 0),
+        ("gzip", 1000),
+        ("deflate", 0),
+        ("deflate", 1000),
+    ),
+)
+@pytest.mark.parametrize("audit_log", (False, True))
+def test_http_chunked_payload_compression(server, method, threshold, audit_log):
+    # Chunks are joined for the audit log, but are still compressed the
+    # same as when streamed through the compressor.
+
+    payload = [[i, "*" * 20] for i in range(20)]
+    expected_payload = json_encode(payload).encode("utf-8")
+
+    internal_metrics = CustomMetrics()
+    audit_log_fp = StringIO() if audit_log else None
+
+    with ApplicationModeClient(
+        "localhost",
+        server.port,
+        disable_certificate_validation=True,
+        compression_method=method,
+        compression_threshold=threshold,
+        audit_log_fp=audit_log_fp,
+    ) as client:
+        with InternalTraceContext(internal_metrics):
+            status, data = client.send_request(
+                payload=json_encode_chunks(payload, chunk_size=64),
+                params={"method": "test"},
+            )
+
+    assert status == 200
+    data = data.split(b"\n")
+    sent_payload = data[-1]
+
+    internal_metrics = dict(internal_metrics.metrics())
+    assert internal_metrics["Supportability/Python/Collector/Output/Bytes/test"][:2] == [1, len(sent_payload)]
+
+    if threshold < len(expected_payload):
+        assert internal_metrics["Supportability/Python/Collector/ZLIB/Bytes/test"][:2] == [1, len(expected_payload)]
+        sent_payload = zlib.decompressobj(31 if method == "gzip" else 15).decompress(sent_payload)
+        expected_content_encoding = method.encode("utf-8")
+    else:
+        assert "Supportability/Python/Collector/ZLIB/Bytes/test" not in internal_metrics
+        expected_content_encoding = b"Identity"
+
+    headers = dict(h.split(b":", 1) for h in data[1:-1])
+    assert headers[b"content-encoding"].strip() == expected_content_encoding
+    assert sent_payload == expected_payload
+
+    if audit_log:
+        assert "DATA: [[0, '%s']," % ("*" * 20) in audit_log_fp.getvalue()
+
+
 def test_cert_path(server):
     with HttpClient("localhost", server.port, ca_bundle_path=SERVER_CERT) as client:
         status, data = client.send_request()
@@ -492,6 +553,27 @@ def test_max_payload_does_not_send(insecure_server):
     assert not data
 
 
+def test_max_payload_stops_chunked_encoding(insecure_server):
+    consumed = []
+
+    def chunks():
+        for i in range(100):
+            consumed.append(i)
+            yield os.urandom(1024)
+
+    with InsecureHttpClient(
+        "localhost",
+        insecure_server.port,
+        compression_threshold=0,
+        max_payload_size_in_bytes=10 * 1024,
+    ) as client:
+        status, data = client.send_request(payload=chunks())
+
+    assert status == 413
+    assert not data
+    assert len(consumed) < 100
+
+
 @pytest.mark.parametrize(
     "method",
     (
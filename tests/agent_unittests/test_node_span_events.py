@@ -0,0 +1,127 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import sys
+
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.function_node import FunctionNode
+from newrelic.core.root_node import RootNode
+
+
+def function_node(guid, children=(), agent_attributes=None, user_attributes=None):
+    return FunctionNode(
+        group="Function",
+        name=guid,
+        children=list(children),
+        start_time=1.0,
+        end_time=2.0,
+        duration=1.0,
+        exclusive=1.0,
+        label=None,
+        params=None,
+        rollup=None,
+        guid=guid,
+        agent_attributes=agent_attributes or {},
+        user_attributes=user_attributes or {},
+    )
+
+
+def root_node(children):
+    return RootNode(
+        name="Function/root",
+        children=list(children),
+        start_time=1.0,
+        end_time=2.0,
+        exclusive=1.0,
+        duration=1.0,
+        guid="root",
+        agent_attributes={},
+        user_attributes={},
+        path="WebTransaction/Function/root",
+        trusted_parent_span=None,
+        tracing_vendors=None,
+    )
+
+
+def test_span_events_depth_first_order():
+    root = root_node(
+        [
+            function_node("a", [function_node("a1"), function_node("a2", [function_node("a21")])]),
+            function_node("b"),
+        ]
+    )
+
+    settings = finalize_application_settings()
+    base_attrs = {"transactionId": "txn"}
+
+    events = list(root.span_events(settings, base_attrs, parent_guid="parent"))
+
+    assert [(i["guid"], i.get("parentId")) for i, _, _ in events] == [
+        ("root", "parent"),
+        ("a", "root"),
+        ("a1", "a"),
+        ("a2", "a"),
+        ("a21", "a2"),
+        ("b", "root"),
+    ]
+
+    for i_attrs, _, _ in events:
+        assert i_attrs["transactionId"] == "txn"
+
+    assert base_attrs == {"transactionId": "txn"}
+
+
+def test_span_events_deeply_nested():
+    depth = sys.getrecursionlimit() * 2
+
+    node = function_node("leaf")
+    for i in range(depth):
+        node = function_node("node%d" % i, [node])
+
+    settings = finalize_application_settings()
+    events = list(root_node([node]).span_events(settings))
+
+    assert len(events) == depth + 2
+    assert events[-1][0]["guid"] == "leaf"
+
+
+def test_span_events_attributes():
+    settings = finalize_application_settings()
+
+    root = root_node([function_node("a", agent_attributes={"code.function": "a"}, user_attributes={"user": 1})])
+    events = list(root.span_events(settings))
+
+    _, u_attrs, a_attrs = events[0]
+    assert u_attrs == {}
+    assert a_attrs == {}
+
+    _, u_attrs, a_attrs = events[1]
+    assert u_attrs == {"user": 1}
+    assert a_attrs == {"code.function": "a"}
+
+
+def test_span_events_without_guid():
+    child = function_node("child")
+    parent = function_node(None, [child])
+
+    settings = finalize_application_settings()
+    events = list(root_node([parent]).span_events(settings))
+
+    # A node for a trace whose guid was never read is given one for its
+    # span event, which its children then use as their parent.
+
+    guid = events[1][0]["guid"]
+    assert len(guid) == 16
+    assert events[2][0]["parentId"] == guid
+    assert parent.span_guid == guid
@@ -0,0 +1,177 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+
+import pytest
+
+from newrelic.common.agent_http import HttpClient
+from newrelic.core.agent_protocol import AgentProtocol
+from newrelic.core.config import finalize_application_settings
+from newrelic.core.data_collector import Session
+from newrelic.core.internal_metrics import InternalTraceContext
+from newrelic.core.stats_engine import CustomMetrics
+from newrelic.network.exceptions import (
+    DiscardDataForRequest,
+    ForceAgentRestart,
+    PayloadTooLargeForRequest,
+    RetryDataForRequest,
+)
+
+
+class FakeProtocol(object):
+    MAX_SAMPLES = 3
+    FAIL_ON = None
+
+    def __init__(self, settings):
+        self.configuration = settings
+        self.sent = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, app_name, linked_applications, environment, settings, client_cls):
+        return cls(settings)
+
+    def send(self, method, payload):
+        run_id, sampling_info, samples = payload
+        if len(samples) > self.MAX_SAMPLES:
+            raise PayloadTooLargeForRequest()
+        if self.FAIL_ON and self.FAIL_ON[0] in samples:
+            raise self.FAIL_ON[1]()
+        with self.lock:
+            self.sent.append((method, sampling_info, list(samples)))
+
+
+class FakeSession(Session):
+    PROTOCOL = FakeProtocol
+
+
+def create_session(**overrides):
+    settings = {"agent_run_id": "RUN_TOKEN"}
+    settings.update(overrides)
+    return FakeSession("app", [], {}, finalize_application_settings(settings))
+
+
+@pytest.mark.parametrize("max_concurrency", (1, 4))
+def test_payload_split_on_413(max_concurrency):
+    session = create_session(**{"payload_splitting.max_concurrency": max_concurrency})
+    sampling_info = {"reservoir_size": 100, "events_seen": 20}
+    internal_metrics = CustomMetrics()
+
+    with InternalTraceContext(internal_metrics):
+        session.send_transaction_events(sampling_info, list(range(10)))
+
+    sent = session._protocol.sent
+    assert sorted(s for _, _, samples in sent for s in samples) == list(range(10))
+    assert all(len(samples) <= FakeProtocol.MAX_SAMPLES for _, _, samples in sent)
+    assert sum(info["events_seen"] for _, info, _ in sent) == 20
+    assert sum(info["reservoir_size"] for _, info, _ in sent) == 100
+
+    metrics = dict(internal_metrics.metrics())
+    assert metrics["Supportability/Python/Collector/PayloadSplit/analytic_event_data"][0] > 0
+
+    # The learned size is used to split the next payload up front.
+    assert session._max_samples["analytic_event_data"] <= FakeProtocol.MAX_SAMPLES
+    del sent[:]
+    session.send_transaction_events(sampling_info, list(range(10)))
+    assert len(sent) == 5
+
+
+def test_payload_split_disabled():
+    session = create_session(**{"payload_splitting.enabled": False})
+    with pytest.raises(PayloadTooLargeForRequest):
+        session.send_span_events({}, list(range(10)))
+
+
+def test_payload_split_single_sample_too_large(monkeypatch):
+    monkeypatch.setattr(FakeProtocol, "MAX_SAMPLES", 0)
+    session = create_session()
+    with pytest.raises(PayloadTooLargeForRequest):
+        session.send_span_events({}, list(range(10)))
+    assert not session._protocol.sent
+
+
+@pytest.mark.parametrize(
+    "exc,expected",
+    (
+        (RetryDataForRequest, DiscardDataForRequest),
+        (ForceAgentRestart, ForceAgentRestart),
+    ),
+)
+def test_payload_split_partial_failure(monkeypatch, exc, expected):
+    monkeypatch.setattr(FakeProtocol, "FAIL_ON", (9, exc))
+    session = create_session()
+    with pytest.raises(expected):
+        session.send_span_events({}, list(range(10)))
+
+
+def test_payload_split_concurrency_limit(monkeypatch):
+    monkeypatch.setattr(FakeProtocol, "MAX_SAMPLES", 1)
+
+    in_flight = [0, 0]
+    send = FakeProtocol.send
+
+    def counting_send(self, method, payload):
+        with self.lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        try:
+            time.sleep(0.01)
+            return send(self, method, payload)
+        finally:
+            with self.lock:
+                in_flight[0] -= 1
+
+    monkeypatch.setattr(FakeProtocol, "send", counting_send)
+
+    session = create_session(**{"payload_splitting.max_concurrency": 2})
+    internal_metrics = CustomMetrics()
+
+    # Every bisected part is too large again until only single samples
+    # remain, yet no more than two requests are ever in flight.
+
+    with InternalTraceContext(internal_metrics):
+        session.send_span_events({}, list(range(16)))
+
+    assert sorted(s for _, _, samples in session._protocol.sent for s in samples) == list(range(16))
+    assert in_flight[1] == 2
+
+    # Two parts are recorded for each of the 15 bisections, whichever
+    # worker made them.
+    metrics = dict(internal_metrics.metrics())
+    assert metrics["Supportability/Python/Collector/PayloadSplit/span_event_data"][0] == 30
+
+
+@pytest.mark.parametrize(
+    "enabled,audit_log_file,maxsize",
+    (
+        (True, None, 3),
+        (False, None, None),
+        (True, "audit.log", None),
+    ),
+)
+def test_payload_split_connection_pool_size(tmpdir, enabled, audit_log_file, maxsize):
+    settings = finalize_application_settings(
+        {
+            "payload_splitting.enabled": enabled,
+            "payload_splitting.max_concurrency": 3,
+            "audit_log_file": audit_log_file and str(tmpdir.join(audit_log_file)),
+        }
+    )
+
+    protocol = AgentProtocol(settings, client_cls=HttpClient)
+
+    assert protocol.client._connection_kwargs.get("maxsize") == maxsize
+    assert protocol.client._connection_kwargs.get("block") == (maxsize and True)
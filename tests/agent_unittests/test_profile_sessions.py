@@ -0,0 +1,183 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import base64
+import json
+import sys
+import threading
+import zlib
+
+import pytest
+
+import newrelic.core.profile_sessions as profile_sessions
+from newrelic.core.profile_sessions import (
+    ProfileSession,
+    ProfileSessionManager,
+    SessionState,
+    collect_stack_traces,
+)
+
+
+def outer(event, ready):
+    return inner(event, ready)
+
+
+def inner(event, ready):
+    ready.set()
+    event.wait()
+
+
+class ActiveThreads(object):
+    def __init__(self, threads):
+        self.threads = threads
+
+    def active_threads(self):
+        frames = sys._current_frames()
+        for category, thread in self.threads:
+            yield None, thread.ident, category, frames[thread.ident]
+
+
+@pytest.fixture
+def blocked_threads(monkeypatch):
+    event = threading.Event()
+    threads = []
+
+    for category in ("REQUEST", "REQUEST", "BACKGROUND", "AGENT"):
+        ready = threading.Event()
+        thread = threading.Thread(target=outer, args=(event, ready))
+        thread.start()
+        ready.wait()
+        threads.append((category, thread))
+
+    cache = ActiveThreads(threads)
+    monkeypatch.setattr(profile_sessions, "trace_cache", lambda: cache)
+
+    yield threads
+
+    event.set()
+    for _, thread in threads:
+        thread.join()
+
+
+def call_trees(session):
+    session.state = SessionState.FINISHED
+    encoded_tree = session.profile_data()[0][4]
+    return json.loads(zlib.decompress(base64.standard_b64decode(encoded_tree)))
+
+
+def normalize(nodes):
+    return sorted(
+        [tuple(method_data), call_count, normalize(children)] for method_data, call_count, _, children in nodes
+    )
+
+
+@pytest.mark.parametrize("include_nr_threads", (False, True))
+def test_folded_stacks_same_call_tree(blocked_threads, include_nr_threads):
+    call_tree_session = ProfileSession(1, 0)
+    folded_session = ProfileSession(1, 0, folded=True)
+
+    for _ in range(3):
+        for category, stack in collect_stack_traces(include_nr_threads):
+            call_tree_session.update_call_tree(category, stack)
+        folded_session.update_folded_stacks(include_nr_threads)
+
+    assert len(folded_session.folded_stacks) == (include_nr_threads and 3 or 2)
+    assert folded_session.transaction_count == call_tree_session.transaction_count
+
+    expected = call_trees(call_tree_session)
+    actual = call_trees(folded_session)
+
+    assert sorted(actual) == sorted(expected)
+    for category in expected:
+        assert normalize(actual[category]) == normalize(expected[category])
+
+    assert folded_session.folded_stacks == {}
+
+
+class Frame(object):
+    def __init__(self, code, back=None):
+        self.f_code = code
+        self.f_lineno = code.co_firstlineno
+        self.f_back = back
+
+
+def test_folded_stacks_agent_frames_only(monkeypatch):
+    # A stack consisting only of frames for the agent is neither recorded
+    # nor counted, the same as when building the call tree.
+
+    frame = Frame(collect_stack_traces.__code__, Frame(profile_sessions.format_folded_stack.__code__))
+
+    class Cache(object):
+        def active_threads(self):
+            yield None, 1, "REQUEST", frame
+
+    monkeypatch.setattr(profile_sessions, "trace_cache", Cache)
+
+    call_tree_session = ProfileSession(1, 0)
+    folded_session = ProfileSession(1, 0, folded=True)
+
+    for _ in range(2):
+        for category, stack in collect_stack_traces():
+            call_tree_session.update_call_tree(category, stack)
+        folded_session.update_folded_stacks()
+
+    assert call_tree_session.transaction_count == 0
+    assert folded_session.transaction_count == 0
+    assert folded_session.folded_stacks == {}
+
+
+def test_folded_stack_lines(blocked_threads):
+    session = ProfileSession(1, 0, folded=True)
+    session.update_folded_stacks()
+    session.update_folded_stacks()
+
+    lines = sorted(session.folded_stack_lines())
+
+    assert len(lines) == 2
+    assert lines[0].startswith("BACKGROUND;")
+    assert lines[0].endswith(" 2")
+    assert lines[1].startswith("REQUEST;")
+    assert lines[1].endswith(" 4")
+
+    names = [frame.split(":")[-2] for frame in lines[1].rsplit(" ", 1)[0].split(";")[1:]]
+    index = names.index("outer")
+    assert names[index : index + 3] == ["outer", "inner", "wait"]
+
+
+@pytest.mark.parametrize(
+    "budget,overhead,expected",
+    (
+        (None, 0.5, 0.1),
+        (0.05, 0.001, 0.1),
+        (0.05, 0.01, 0.19),
+    ),
+)
+def test_sample_wait_time(budget, overhead, expected):
+    manager = ProfileSessionManager()
+    manager.sample_period_s = 0.1
+    manager.overhead_budget = budget
+
+    assert manager.sample_wait_time(overhead) == pytest.approx(expected)
+
+
+def test_record_sample_overhead():
+    session = ProfileSession(1, 0)
+
+    session.record_sample_overhead(0.001, 0.005)
+    session.record_sample_overhead(0.01, 0.005)
+    session.record_sample_overhead(0.002, None)
+
+    assert session.sample_cpu_time == pytest.approx(0.013)
+    assert session.max_sample_cpu_time == 0.01
+    assert session.over_budget_count == 1
@@ -0,0 +1,103 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.common.lru_cache import LRUCache
+from newrelic.core.rules_engine import RulesEngine
+
+
+def make_rule(match_expression, replacement="*", **kwargs):
+    rule = {
+        "match_expression": match_expression,
+        "replacement": replacement,
+        "ignore": False,
+        "eval_order": 0,
+        "terminate_chain": False,
+        "each_segment": False,
+        "replace_all": False,
+    }
+    rule.update(kwargs)
+    return rule
+
+
+RULES = [
+    make_rule(r"^[0-9][0-9a-f_,.-]*$", each_segment=True, eval_order=1),
+    make_rule(r"^(.*)/admin/.*$", r"\1/admin", eval_order=2, terminate_chain=True),
+    make_rule(r"\.(css|js|gif|png)$", ignore=True, eval_order=3),
+]
+
+
+@pytest.mark.parametrize(
+    "name,expected",
+    (
+        ("/users/1234/orders", ("/users/*/orders", False)),
+        ("/site/admin/settings/42", ("/site/admin", False)),
+        ("/static/style.css", ("/static/style*", True)),
+        ("/nothing/matches/here", ("/nothing/matches/here", False)),
+        (b"/users/99", ("/users/*", False)),
+    ),
+)
+@pytest.mark.parametrize("cache_size", (0, 16))
+def test_normalize(name, expected, cache_size):
+    engine = RulesEngine(RULES, cache_size)
+    assert engine._prefilter
+    assert engine.normalize(name) == expected
+    assert engine.normalize(name) == expected
+
+
+@pytest.mark.parametrize(
+    "match_expression,name,expected",
+    (
+        (r"(ab)\1", "/abab/1", ("/x/*", False)),
+        (r"^/(a)?(?(1)b|c)$", "/ab", ("x", False)),
+        (r"^/(?P<a>a)?(?(a)b|c)$", "/c", ("x", False)),
+    ),
+)
+def test_normalize_uncombinable_rules(match_expression, name, expected):
+    rules = RULES + [make_rule(match_expression, "x", eval_order=4)]
+    engine = RulesEngine(rules)
+    assert not engine._prefilter
+    assert engine.normalize(name) == expected
+
+
+def test_normalize_cache_stats():
+    engine = RulesEngine(RULES, 2)
+    for name in ("/a/1", "/a/1", "/b/2", "/c/3", "/a/1"):
+        engine.normalize(name)
+
+    assert engine.cache_stats() == (1, 4)
+    assert engine.cache_stats() == (0, 0)
+
+
+def test_normalize_without_rules():
+    engine = RulesEngine([])
+    assert engine.normalize("/a/1") == ("/a/1", False)
+    assert engine.cache_stats() == (0, 0)
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    assert cache.stats() == (3, 1, 1)
@@ -0,0 +1,100 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+
+import pytest
+
+from newrelic.core.stats_engine import SampledDataSet
+
+
+def expected_samples(entries, capacity):
+    # Highest priorities win, with the earliest sample winning on a tie.
+    ordered = sorted(enumerate(entries), key=lambda e: (-e[1][0], e[0]))
+    return sorted(sample for _, (_, sample) in ordered[:capacity])
+
+
+@pytest.mark.parametrize("capacity", (1, 7, 100))
+def test_add_keeps_highest_priorities(capacity):
+    rng = random.Random(capacity)
+    entries = [(rng.choice((0.25, 0.5, rng.random())), i) for i in range(1000)]
+
+    data_set = SampledDataSet(capacity)
+    for priority, sample in entries:
+        data_set.add(sample, priority)
+
+    assert data_set.num_samples == capacity
+    assert sorted(data_set) == expected_samples(entries, capacity)
+    assert data_set.sampling_info == {"reservoir_size": capacity, "events_seen": 1000}
+    assert data_set.pq[0][0] == min(p for p, _, _ in data_set.pq)
+
+
+def test_add_under_capacity():
+    data_set = SampledDataSet(10)
+    for i in range(5):
+        assert data_set.should_sample(0.0)
+        data_set.add(i, 0.0)
+
+    assert list(data_set) == list(range(5))
+    assert data_set.should_sample(0.0)
+
+
+def test_should_sample_when_full():
+    data_set = SampledDataSet(2)
+    data_set.add("a", 0.5)
+    data_set.add("b", 0.7)
+
+    assert not data_set.should_sample(0.5)
+    assert data_set.should_sample(0.6)
+
+
+@pytest.mark.parametrize("priority", (None, 0.9))
+def test_merge(priority):
+    rng = random.Random(0)
+    capacity = 50
+    first = [(rng.random(), i) for i in range(120)]
+    second = [(rng.random(), i) for i in range(120, 200)]
+
+    data_set = SampledDataSet(capacity)
+    for p, sample in first:
+        data_set.add(sample, p)
+
+    other = SampledDataSet(capacity)
+    for p, sample in second:
+        other.add(sample, p)
+
+    # The merge is equivalent to adding the retained samples of the other
+    # data set, in the order they were seen, to this one.
+    entries = [(p, sample) for p, _, sample in sorted(data_set.pq, key=lambda e: e[1])]
+    for p, _, sample in sorted(other.pq, key=lambda e: e[1]):
+        entries.append((p if priority is None else max(priority, p), sample))
+
+    data_set.merge(other, priority)
+
+    assert sorted(data_set) == expected_samples(entries, capacity)
+    assert data_set.num_seen == 200
+    assert data_set.num_samples == capacity
+
+
+def test_zero_capacity():
+    data_set = SampledDataSet(0)
+    data_set.add("a", 1.0)
+
+    other = SampledDataSet(5)
+    other.add("b", 1.0)
+    data_set.merge(other)
+
+    assert data_set.num_samples == 0
+    assert list(data_set) == []
+    assert data_set.sampling_info == {"reservoir_size": 0, "events_seen": 2}
@@ -22,7 +22,10 @@ from testing_support.fixtures import override_generic_settings
 from newrelic.core.config import global_settings
 from newrelic.packages import six
 from newrelic.samplers.cpu_usage import cpu_usage_data_source
-from newrelic.samplers.gc_data import garbage_collector_data_source
+from newrelic.samplers.gc_data import (
+    garbage_collector_data_source,
+    object_type_counts,
+)
 from newrelic.samplers.memory_usage import memory_usage_data_source
 
 settings = global_settings()
@@ -133,6 +136,47 @@ def test_gc_metrics_config(gc_data_source, enabled):
     _test()
 
 
+class A(object):
+    pass
+
+
+class B(object):
+    pass
+
+
+class C(object):
+    pass
+
+
+class D(object):
+    pass
+
+
+OBJECTS = (
+    [A() for _ in range(100000)] + [B() for _ in range(60000)] + [C() for _ in range(30000)] + [D() for _ in range(10000)]
+)
+
+
+def test_object_type_counts_exact():
+    assert object_type_counts(OBJECTS, 3) == [(A, 100000), (B, 60000), (C, 30000)]
+    assert object_type_counts(OBJECTS, 3, sample_size=len(OBJECTS)) == [(A, 100000), (B, 60000), (C, 30000)]
+
+
+def test_object_type_counts_sampled():
+    sample_size = 10000
+
+    # The standard error of an extrapolated count is at most this.
+
+    error = len(OBJECTS) / (2.0 * sample_size**0.5)
+
+    counts = object_type_counts(OBJECTS, 4, sample_size=sample_size)
+
+    assert [obj_type for obj_type, _ in counts] == [A, B, C, D]
+
+    for (_, count), expected in zip(counts, (100000, 60000, 30000, 10000)):
+        assert abs(count - expected) < 5 * error
+
+
 EXPECTED_CPU_METRICS = (
     "CPU/User Time",
     "CPU/User/Utilization",
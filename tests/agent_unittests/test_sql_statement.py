@@ -0,0 +1,119 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from newrelic.core import database_utils
+from newrelic.core.config import global_settings
+from newrelic.core.database_utils import (
+    SQLDatabase,
+    SQLStatement,
+    sql_statement,
+    sql_statement_cache_stats,
+)
+
+
+class DatabaseModule(object):
+    def __init__(self, product, quoting_style="single"):
+        self._nr_database_product = product
+        self._nr_quoting_style = quoting_style
+
+
+class DummyDB(object):
+    def __init__(self, quoting_style):
+        self.quoting_style = quoting_style
+
+
+SQL = "SELECT * FROM orders WHERE id IN (1, 2, 3) AND status = 'shipped'"
+
+
+@pytest.fixture
+def statement_cache(monkeypatch):
+    monkeypatch.setattr(global_settings().sql_obfuscation, "cache_size", 16)
+    monkeypatch.setattr(database_utils, "_sql_statement_values", None)
+    yield
+    database_utils._sql_statement_values = None
+
+
+@pytest.mark.parametrize(
+    "sql,quoting_style,expected",
+    (
+        ("SELECT * FROM t WHERE a = 0X1F AND b = 1E5", "single", "SELECT * FROM t WHERE a = ? AND b = ?"),
+        ("SELECT * FROM t WHERE a = TRUE OR b IS Null", "single", "SELECT * FROM t WHERE a = ? OR b IS ?"),
+        ("SELECT * FROM t WHERE a = '1' AND b = \"2\"", "single+double", "SELECT * FROM t WHERE a = ? AND b = ?"),
+        ("SELECT * FROM t WHERE a = $x$1$x$ AND b = 2", "single+dollar", "SELECT * FROM t WHERE a = ? AND b = ?"),
+        ("SELECT * FROM t WHERE a = trueq'[x]'", "single+oracle", "SELECT * FROM t WHERE a = ??"),
+        ("SELECT * FROM t WHERE a = Q'[x]'", "single+oracle", "SELECT * FROM t WHERE a = Q?"),
+        ("SELECT * FROM t WHERE a = :1 AND b = 'x", "single", "?"),
+    ),
+)
+def test_obfuscate_sql(sql, quoting_style, expected):
+    assert SQLStatement(sql, DummyDB(quoting_style)).obfuscated == expected
+
+
+def test_derived_values_shared_between_statements(statement_cache):
+    module = DatabaseModule("Postgres")
+
+    first = sql_statement(SQL, module)
+    assert first.obfuscated == "SELECT * FROM orders WHERE id IN (?, ?, ?) AND status = ?"
+    assert first.operation == "select"
+    assert first.target == "orders"
+    identifier = first.identifier
+
+    # Statements no longer referenced drop out of the weak cache of
+    # statements, but the derived values should be retained.
+
+    del first
+
+    second = sql_statement(SQL, module)
+    values = second._values
+
+    assert values.obfuscated == "SELECT * FROM orders WHERE id IN (?, ?, ?) AND status = ?"
+    assert values.operation == "select"
+    assert values.target == "orders"
+    assert values.identifier == identifier
+    assert second.identifier == identifier
+
+    hits, misses, evictions = sql_statement_cache_stats()
+    assert (hits, misses, evictions) == (1, 1, 0)
+    assert sql_statement_cache_stats() == (0, 0, 0)
+
+
+def test_derived_values_keyed_by_database(statement_cache):
+    sql = "SELECT * FROM t WHERE a = \"x\""
+
+    mysql = sql_statement(sql, DatabaseModule("MySQL", "single+double"))
+    sqlite = sql_statement(sql, DatabaseModule("SQLite"))
+
+    assert mysql._values is not sqlite._values
+    assert mysql.obfuscated == "SELECT * FROM t WHERE a = ?"
+    assert sqlite.obfuscated == sql
+
+
+def test_derived_values_cache_disabled(monkeypatch):
+    monkeypatch.setattr(global_settings().sql_obfuscation, "cache_size", 0)
+    monkeypatch.setattr(database_utils, "_sql_statement_values", None)
+
+    statement = sql_statement(SQL, DatabaseModule("Postgres"))
+
+    assert statement._values is None
+    assert statement.operation == "select"
+    assert sql_statement_cache_stats() == (0, 0, 0)
+
+
+def test_statement_without_shared_values():
+    statement = SQLStatement(SQL, SQLDatabase(DatabaseModule("Postgres")))
+
+    assert statement._values is None
+    assert statement.target == "orders"
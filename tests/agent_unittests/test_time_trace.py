@@ -0,0 +1,86 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import weakref
+
+import pytest
+
+from newrelic.api.database_trace import DatabaseTrace
+from newrelic.api.datastore_trace import DatastoreTrace
+from newrelic.api.external_trace import ExternalTrace
+from newrelic.api.function_trace import FunctionTrace
+
+
+@pytest.mark.parametrize(
+    "create",
+    (
+        lambda: FunctionTrace("name"),
+        lambda: DatastoreTrace("Postgres", "table", "select"),
+        lambda: DatabaseTrace("SELECT 1"),
+        lambda: ExternalTrace("library", "http://localhost/"),
+    ),
+)
+def test_trace_attributes_in_slots(create):
+    trace = create()
+
+    # None of the attributes set on creating the trace should have needed
+    # the instance dictionary to be used.
+
+    assert not trace.__dict__
+
+    # Attributes not listed in slots can still be added.
+
+    trace._nr_extra = 1
+    assert trace.__dict__ == {"_nr_extra": 1}
+
+    assert weakref.ref(trace)() is trace
+
+
+def test_trace_lazy_allocation():
+    trace = FunctionTrace("name")
+    other = FunctionTrace("other")
+
+    # Nothing has been allocated for the children, attributes or guid.
+
+    assert trace.children == ()
+    assert trace._guid is None
+    assert trace._agent_attributes is None
+    assert trace._user_attributes is None
+
+    # The nodes for traces without attributes share the same empty ones.
+
+    node = trace.create_node()
+    other_node = other.create_node()
+
+    assert node.guid is None
+    assert node.agent_attributes is other_node.agent_attributes
+    assert node.user_attributes is other_node.user_attributes
+
+    # Once read, the guid and attributes are held by the trace.
+
+    guid = trace.guid
+    trace._add_agent_attribute("key", "value")
+
+    assert trace.guid == guid
+    assert len(guid) == 16
+
+    node = trace.create_node()
+
+    assert node.guid == guid
+    assert node.agent_attributes == {"key": "value"}
+    assert not other_node.agent_attributes
+
+
+def test_external_trace_settings_before_enter():
+    assert ExternalTrace("library", "http://localhost/").settings is None
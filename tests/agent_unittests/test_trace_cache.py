@@ -0,0 +1,231 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import gc
+import threading
+
+import pytest
+
+from newrelic.core import trace_cache as trace_cache_module
+from newrelic.core.trace_cache import (
+    ContextVarTraceCache,
+    TraceCache,
+    TraceCacheActiveTraceError,
+    trace_cache,
+    use_trace_cache_backend,
+)
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+requires_contextvars = pytest.mark.skipif(contextvars is None, reason="contextvars not available")
+
+
+class Transaction(object):
+    background_task = True
+    _greenlet = None
+
+
+class Trace(object):
+    def __init__(self, cache, parent=None):
+        self.parent = parent
+        self.root = parent and parent.root or self
+        self.transaction = Transaction()
+        self.exited = False
+        self.thread_id = cache.current_thread_id()
+
+
+@pytest.fixture(params=["thread", pytest.param("contextvars", marks=requires_contextvars)])
+def cache(request):
+    cache = {"thread": TraceCache, "contextvars": ContextVarTraceCache}[request.param]()
+    cache.asyncio = False
+    cache.greenlet = False
+    return cache
+
+
+def test_save_pop_complete(cache):
+    root = Trace(cache)
+    cache.save_trace(root)
+    assert cache.current_trace() is root
+    assert cache.current_transaction() is root.transaction
+    assert root._greenlet is None
+
+    child = Trace(cache, root)
+    cache.save_trace(child)
+    assert cache.current_trace() is child
+
+    cache.pop_current(child)
+    assert cache.current_trace() is root
+
+    cache.complete_root(root)
+    assert cache.current_trace() is None
+    assert not cache._cache
+
+
+class FakeGreenlet(object):
+    def __init__(self, parent=None):
+        self.parent = parent
+
+
+class FakeGreenletModule(object):
+    def __init__(self):
+        self.current = FakeGreenlet(parent=FakeGreenlet())
+
+    def getcurrent(self):
+        return self.current
+
+
+class FakeThreadModule(object):
+    # Mimics the thread module once monkey patched by gevent or eventlet,
+    # where get_ident() returns the identifier of the current greenlet.
+
+    def __init__(self, greenlet):
+        self.greenlet = greenlet
+
+    def get_ident(self):
+        return id(self.greenlet.getcurrent())
+
+
+def test_save_trace_monkey_patched_greenlet(cache, monkeypatch):
+    greenlet = FakeGreenletModule()
+    cache.greenlet = greenlet
+    monkeypatch.setattr(trace_cache_module, "thread", FakeThreadModule(greenlet))
+
+    root = Trace(cache)
+    assert root.thread_id == id(greenlet.current)
+
+    cache.save_trace(root)
+    assert root._greenlet is not None
+    assert root._greenlet() is greenlet.current
+
+
+def test_save_trace_already_active(cache):
+    cache.save_trace(Trace(cache))
+
+    with pytest.raises(TraceCacheActiveTraceError):
+        cache.save_trace(Trace(cache))
+
+
+def test_swap_trace(cache):
+    root = Trace(cache)
+    other = Trace(cache)
+    cache.save_trace(root)
+
+    previous = cache.swap_trace(root.thread_id, other)
+    assert previous is root
+    assert cache.current_trace() is other
+
+    assert cache.swap_trace(root.thread_id, None) is other
+    assert cache.current_trace() is None
+    assert not cache._cache
+
+
+def test_traces_isolated_between_threads(cache):
+    root = Trace(cache)
+    cache.save_trace(root)
+
+    results = []
+
+    def run():
+        results.append(cache.current_trace())
+        trace = Trace(cache)
+        cache.save_trace(trace)
+        results.append(cache.current_trace() is trace)
+        results.append(len(list(t for _, t, _, _ in cache.active_threads() if t == trace.thread_id)))
+        cache.complete_root(trace)
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+
+    assert results == [None, True, 1]
+    assert cache.current_trace() is root
+
+
+@requires_contextvars
+def test_context_var_holds_weak_reference():
+    cache = ContextVarTraceCache()
+    cache.greenlet = False
+    cache.asyncio = False
+
+    root = Trace(cache)
+    cache.save_trace(root)
+
+    context = contextvars.copy_context()
+    cache._cache.clear()
+    del root
+    gc.collect()
+
+    assert context.run(cache.current_trace) is None
+
+
+@requires_contextvars
+def test_context_var_copied_after_exit():
+    cache = ContextVarTraceCache()
+    cache.greenlet = False
+    cache.asyncio = False
+
+    root = Trace(cache)
+    cache.save_trace(root)
+    child = Trace(cache, root)
+    cache.save_trace(child)
+
+    # The context as copied into a task created while the child trace was
+    # current, which the trace then exits outside of.
+
+    context = contextvars.copy_context()
+
+    child.exited = True
+    cache.pop_current(child)
+    root.exited = True
+    cache.complete_root(root)
+
+    assert context.run(cache.current_trace) is None
+    assert cache.current_trace() is None
+
+
+@pytest.mark.parametrize("backend", ["thread", pytest.param("contextvars", marks=requires_contextvars)])
+def test_use_trace_cache_backend(monkeypatch, backend):
+    monkeypatch.setattr(trace_cache_module, "_trace_cache", TraceCache())
+
+    use_trace_cache_backend(backend)
+
+    expected = {"thread": TraceCache, "contextvars": ContextVarTraceCache}[backend]
+    assert type(trace_cache()) is expected
+
+
+def test_use_trace_cache_backend_unknown(monkeypatch):
+    original = TraceCache()
+    monkeypatch.setattr(trace_cache_module, "_trace_cache", original)
+
+    use_trace_cache_backend("unknown")
+
+    assert trace_cache() is original
+
+
+def test_use_trace_cache_backend_active_traces(monkeypatch):
+    original = TraceCache()
+    monkeypatch.setattr(trace_cache_module, "_trace_cache", original)
+
+    # Registered against an ID other than that of the current thread, so
+    # that logging of the warning doesn't see it as current.
+
+    trace = Trace(original)
+    original._cache[0] = trace
+
+    use_trace_cache_backend("contextvars")
+
+    assert trace_cache() is original
@@ -0,0 +1,167 @@
+# Copyright 2010 New Relic, Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+import redis
+
+from newrelic.api.background_task import background_task
+
+from testing_support.fixtures import (validate_transaction_metrics,
+    override_application_settings)
+from testing_support.db_settings import redis_settings
+from testing_support.util import instance_hostname
+from testing_support.validators.validate_span_events import (
+        validate_span_events)
+
+DB_SETTINGS = redis_settings()[0]
+
+# Settings
+
+_enable_instance_settings = {
+    'datastore_tracer.instance_reporting.enabled': True,
+    'distributed_tracing.enabled': True,
+    'span_events.enabled': True,
+}
+_disable_instance_settings = {
+    'datastore_tracer.instance_reporting.enabled': False,
+    'distributed_tracing.enabled': True,
+    'span_events.enabled': True,
+}
+
+# Metrics
+
+_base_scoped_metrics = (
+        ('Datastore/operation/Redis/pipeline', 1),
+        ('Datastore/operation/Redis/set', None),
+        ('Datastore/operation/Redis/get', None),
+)
+
+_base_rollup_metrics = (
+        ('Datastore/all', 1),
+        ('Datastore/allOther', 1),
+        ('Datastore/Redis/all', 1),
+        ('Datastore/Redis/allOther', 1),
+        ('Datastore/operation/Redis/pipeline', 1),
+)
+
+_host = instance_hostname(DB_SETTINGS['host'])
+_port = DB_SETTINGS['port']
+
+_instance_metric_name = 'Datastore/instance/Redis/%s/%s' % (_host, _port)
+
+_enable_rollup_metrics = list(_base_rollup_metrics)
+_enable_rollup_metrics.append((_instance_metric_name, 1))
+
+_disable_rollup_metrics = list(_base_rollup_metrics)
+_disable_rollup_metrics.append((_instance_metric_name, None))
+
+_pipeline_agents = {
+    'db.operation.batch.size': 4,
+    'redis.pipeline.commands': 'get:1,set:3',
+}
+
+
+def exercise_redis_pipeline(client, transaction):
+    pipeline = client.pipeline(transaction=transaction)
+    pipeline.set('pipeline-1', 1)
+    pipeline.set('pipeline-2', 2)
+    pipeline.set('pipeline-3', 3)
+    pipeline.get('pipeline-1')
+    assert pipeline.execute() == [True, True, True, b'1']
+
+
+@pytest.mark.parametrize('transaction', (False, True))
+def test_redis_pipeline_enable(transaction):
+    @override_application_settings(_enable_instance_settings)
+    @validate_transaction_metrics(
+            'test_pipeline:test_redis_pipeline_enable.<locals>._test',
+            scoped_metrics=_base_scoped_metrics,
+            rollup_metrics=_enable_rollup_metrics,
+            background_task=True)
+    @validate_span_events(
+            exact_intrinsics={'name': 'Datastore/operation/Redis/pipeline'},
+            exact_agents=_pipeline_agents)
+    @background_task()
+    def _test():
+        client = redis.Redis(host=DB_SETTINGS['host'],
+                port=DB_SETTINGS['port'], db=0)
+        exercise_redis_pipeline(client, transaction)
+
+    _test()
+
+
+@override_application_settings(_disable_instance_settings)
+@validate_transaction_metrics(
+        'test_pipeline:test_redis_pipeline_disable',
+        scoped_metrics=_base_scoped_metrics,
+        rollup_metrics=_disable_rollup_metrics,
+        background_task=True)
+@background_task()
+def test_redis_pipeline_disable():
+    client = redis.Redis(host=DB_SETTINGS['host'],
+            port=DB_SETTINGS['port'], db=0)
+    exercise_redis_pipeline(client, False)
+
+
+@override_application_settings(_enable_instance_settings)
+@validate_transaction_metrics(
+        'test_pipeline:test_redis_pipeline_empty',
+        scoped_metrics=(('Datastore/operation/Redis/pipeline', None),),
+        rollup_metrics=(('Datastore/all', None),),
+        background_task=True)
+@background_task()
+def test_redis_pipeline_empty():
+    client = redis.Redis(host=DB_SETTINGS['host'],
+            port=DB_SETTINGS['port'], db=0)
+    assert client.pipeline().execute() == []
+
+
+class ClusterNode(object):
+    redis_connection = None
+
+
+class NodesManager(object):
+    himport_registry = None
+    default_node = ClusterNode()
+
+
+class CommandsParser(object):
+    def get_keys(self, redis_conn, *args):
+        return [args[1]]
+
+
+@pytest.mark.skipif(not hasattr(redis, 'cluster'),
+        reason='redis.cluster not available')
+@pytest.mark.parametrize('transaction', (False, True))
+def test_redis_cluster_pipeline_queues_commands(transaction):
+    # A cluster pipeline has a command stack but, unlike a pipeline for a
+    # single server, cannot watch keys. Commands are only queued, so no
+    # server is needed for the cluster.
+
+    @validate_transaction_metrics(
+            'test_pipeline:test_redis_cluster_pipeline_queues_commands.<locals>._test',
+            scoped_metrics=(('Datastore/operation/Redis/set', None),
+                    ('Datastore/operation/Redis/get', None)),
+            rollup_metrics=(('Datastore/all', None),),
+            background_task=True)
+    @background_task()
+    def _test():
+        pipeline = redis.cluster.ClusterPipeline(
+                nodes_manager=NodesManager(),
+                commands_parser=CommandsParser(),
+                transaction=transaction)
+        pipeline.set('pipeline-1', 1)
+        pipeline.get('pipeline-1')
+
+    _test()
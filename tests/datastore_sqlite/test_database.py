@@ -13,15 +13,22 @@
 # limitations under the License.
 
 import sqlite3 as database
+import collections
 import os
 import sys
 
 is_pypy = hasattr(sys, 'pypy_version_info')
 
-from testing_support.fixtures import validate_transaction_metrics
+import pytest
+from testing_support.fixtures import (override_application_settings,
+        validate_transaction_metrics)
 from testing_support.validators.validate_database_trace_inputs import validate_database_trace_inputs
+from testing_support.validators.validate_span_events import validate_span_events
 
 from newrelic.api.background_task import background_task
+from newrelic.api.transaction import current_transaction
+from newrelic.common.object_wrapper import transient_function_wrapper
+from newrelic.hooks.database_dbapi2 import peek_parameters
 
 DATABASE_DIR = os.environ.get('TOX_ENVDIR', '.')
 DATABASE_NAME = ':memory:'
@@ -219,3 +226,114 @@ def test_rollback_on_exception():
             raise RuntimeError('error')
     except RuntimeError:
         pass
+
+
+def _rows(count):
+    for i in range(count):
+        yield (i, float(i), str(i))
+
+
+@pytest.mark.parametrize('rows,count', (
+    (lambda: [(1, 1.0, '1.0'), (2, 2.2, '2.2')], 2),
+    (lambda: collections.deque([(1, 1.0, '1.0'), (2, 2.2, '2.2')]), 2),
+    (lambda: _rows(1000), 1000),
+    (lambda: _rows(0), 0),
+))
+@pytest.mark.parametrize('via_connection', (False, True))
+def test_executemany_batch_size(rows, count, via_connection):
+    # A generator of rows is passed on to executemany() without first
+    # being read into memory, and so is only counted once consumed.
+
+    @override_application_settings({
+        'distributed_tracing.enabled': True,
+        'span_events.enabled': True,
+    })
+    @validate_span_events(
+        exact_intrinsics={'name': 'Datastore/statement/SQLite/datastore_sqlite/insert'},
+        exact_agents={'db.operation.batch.size': count})
+    @background_task()
+    def _test():
+        current_transaction()._sampled = True
+
+        with database.connect(DATABASE_NAME) as connection:
+            connection.execute("""create table datastore_sqlite (a, b, c)""")
+
+            if via_connection:
+                target = connection
+            else:
+                target = connection.cursor()
+
+            target.executemany(
+                    """insert into datastore_sqlite values (?, ?, ?)""", rows())
+
+            cursor = connection.execute("""select count(*) from datastore_sqlite""")
+            assert cursor.fetchone()[0] == count
+
+    _test()
+
+
+class _Rows(object):
+    def __iter__(self):
+        return _rows(2)
+
+
+@pytest.mark.parametrize('via_connection', (False, True))
+def test_executemany_batch_size_unknown(via_connection):
+    # An iterable without a length is passed on unchanged, and as it
+    # can't be counted has no batch size recorded, not even as None.
+
+    nodes = []
+
+    @transient_function_wrapper('newrelic.api.database_trace',
+            'DatabaseTrace.create_node')
+    def _capture_nodes(wrapped, instance, args, kwargs):
+        node = wrapped(*args, **kwargs)
+        nodes.append(node)
+        return node
+
+    @override_application_settings({
+        'distributed_tracing.enabled': True,
+        'span_events.enabled': True,
+    })
+    @validate_span_events(
+        exact_intrinsics={'name': 'Datastore/statement/SQLite/datastore_sqlite/insert'},
+        unexpected_agents=['db.operation.batch.size'])
+    @background_task()
+    @_capture_nodes
+    def _test():
+        current_transaction()._sampled = True
+
+        with database.connect(DATABASE_NAME) as connection:
+            connection.execute("""create table datastore_sqlite (a, b, c)""")
+
+            if via_connection:
+                target = connection
+            else:
+                target = connection.cursor()
+
+            target.executemany(
+                    """insert into datastore_sqlite values (?, ?, ?)""", _Rows())
+
+            cursor = connection.execute("""select count(*) from datastore_sqlite""")
+            assert cursor.fetchone()[0] == 2
+
+    _test()
+
+    inserts = [node for node in nodes if node.sql.startswith('insert')]
+    assert len(inserts) == 1
+    assert 'db.operation.batch.size' not in inserts[0].agent_attributes
+
+
+@pytest.mark.parametrize('seq_of_parameters', (
+    collections.deque([(1, 1.0, '1.0'), (2, 2.2, '2.2')]),
+    {(1, 1.0, '1.0'): None},
+))
+def test_peek_parameters_iterable(seq_of_parameters):
+    # Only an iterator has the first set of parameters chained back on to
+    # it, other iterables are passed through unchanged.
+
+    parameters, passed, count = peek_parameters(seq_of_parameters)
+
+    assert parameters == (1, 1.0, '1.0')
+    assert passed is seq_of_parameters
+    assert count() == len(seq_of_parameters)
@@ -2047,7 +2047,7 @@ def validate_error_event_sample_data(required_attrs=None, required_user_attrs=Tr
 
             transaction = _bind_params(*args, **kwargs)
 
-            error_events = transaction.error_events(instance.stats_table)
+            error_events = transaction.error_events()
             assert len(error_events) == num_errors
             for sample in error_events:
 